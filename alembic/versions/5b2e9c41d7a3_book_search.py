@@ -0,0 +1,38 @@
+"""book_search
+
+Revision ID: 5b2e9c41d7a3
+Revises: 304594115bd6
+Create Date: 2026-10-18 10:12:44.218903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from db.search_index import create_search_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e9c41d7a3'
+down_revision: Union[str, None] = '304594115bd6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_reviews_book_id'), 'reviews', ['book_id'], unique=False)
+    create_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.drop_index('ix_reviews_search', table_name='reviews')
+        op.drop_index('ix_books_search', table_name='books')
+    else:
+        for trigger in ('books_fts_insert', 'books_fts_update', 'books_fts_delete',
+                        'reviews_fts_insert', 'reviews_fts_update', 'reviews_fts_delete'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS books_fts')
+    op.drop_index(op.f('ix_reviews_book_id'), table_name='reviews')
@@ -0,0 +1,43 @@
+"""book_rating_stats
+
+Revision ID: a41f7d0c9e62
+Revises: 5b2e9c41d7a3
+Create Date: 2026-10-18 11:03:27.554120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f7d0c9e62'
+down_revision: Union[str, None] = '5b2e9c41d7a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ['review_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('books') as batch_op:
+        for column in COLUMNS:
+            batch_op.add_column(sa.Column(column, sa.Integer(), nullable=False, server_default='0'))
+    # Backfill from existing reviews.
+    op.execute("""
+        UPDATE books SET
+            review_count = (SELECT count(*) FROM reviews WHERE reviews.book_id = books.id),
+            rating_sum = (SELECT coalesce(sum(rating), 0) FROM reviews WHERE reviews.book_id = books.id),
+            rating_1 = (SELECT count(*) FROM reviews WHERE reviews.book_id = books.id AND rating = 1),
+            rating_2 = (SELECT count(*) FROM reviews WHERE reviews.book_id = books.id AND rating = 2),
+            rating_3 = (SELECT count(*) FROM reviews WHERE reviews.book_id = books.id AND rating = 3),
+            rating_4 = (SELECT count(*) FROM reviews WHERE reviews.book_id = books.id AND rating = 4),
+            rating_5 = (SELECT count(*) FROM reviews WHERE reviews.book_id = books.id AND rating = 5)
+    """)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('books') as batch_op:
+        for column in reversed(COLUMNS):
+            batch_op.drop_column(column)
@@ -0,0 +1,30 @@
+"""row_versions
+
+Revision ID: c7d3a9e15b40
+Revises: a41f7d0c9e62
+Create Date: 2026-10-18 12:41:09.318224
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d3a9e15b40'
+down_revision: Union[str, None] = 'a41f7d0c9e62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in ('books', 'reviews'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    for table in ('reviews', 'books'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('version')
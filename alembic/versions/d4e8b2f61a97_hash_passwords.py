@@ -0,0 +1,29 @@
+"""hash_passwords
+
+Revision ID: d4e8b2f61a97
+Revises: c7d3a9e15b40
+Create Date: 2026-10-18 16:05:37.512804
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from security.passwords import hash_plaintext_passwords
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e8b2f61a97'
+down_revision: Union[str, None] = 'c7d3a9e15b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Rows written before registration hashed passwords still hold the plaintext.
+    hash_plaintext_passwords(op.get_bind())
+
+
+def downgrade() -> None:
+    # Hashes cannot be turned back into passwords; hashed rows stay as they are.
+    pass
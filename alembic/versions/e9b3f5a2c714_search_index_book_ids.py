@@ -0,0 +1,29 @@
+"""search_index_book_ids
+
+Revision ID: e9b3f5a2c714
+Revises: d4e8b2f61a97
+Create Date: 2026-10-18 18:42:09.306127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from db.search_index import create_search_index, drop_search_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9b3f5a2c714'
+down_revision: Union[str, None] = 'd4e8b2f61a97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Replaces an index keyed on books.rowid and rebuilds it from books and reviews.
+    create_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    # Older code recreates and refills its own layout on startup.
+    drop_search_index(op.get_bind())
@@ -0,0 +1,76 @@
+# Run with: python -m benchmarks.export_benchmark [books]   (default 200,000)
+import asyncio
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from db import database
+from db.models import Base
+from schemas.book_export import export_catalog, gzip_chunks
+
+BATCH = 50_000
+
+
+def seed(url, size):
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for offset in range(0, size, BATCH):
+            books = [{"id": str(uuid.uuid4()), "title": f"Title {i}", "author": f"Author {i % 997}"}
+                     for i in range(offset, min(size, offset + BATCH))]
+            conn.execute(text("INSERT INTO books (id, title, author) VALUES (:id, :title, :author)"), books)
+            reviews = [{"id": str(uuid.uuid4()), "book_id": book["id"], "rating": 4, "content": "Solid read"}
+                       for book in books for _ in range(2)]
+            conn.execute(text("INSERT INTO reviews (id, book_id, rating, content) "
+                              "VALUES (:id, :book_id, :rating, :content)"), reviews)
+    engine.dispose()
+
+
+async def drain(chunks):
+    total = 0
+    async for chunk in chunks:
+        total += len(chunk)
+    return total
+
+
+def export(export_format, compress):
+    chunks = export_catalog(export_format)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+async def measure(url, size):
+    engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+    database.SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+    for label, export_format, compress in (("ndjson", "ndjson", False), ("csv", "csv", False),
+                                           ("ndjson.gz", "ndjson", True)):
+        start = time.perf_counter()
+        written = await drain(export(export_format, compress))
+        elapsed = time.perf_counter() - start
+        # tracemalloc slows allocation down a lot, so memory gets its own pass.
+        tracemalloc.start()
+        await drain(export(export_format, compress))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{size:>9,} books {label:>10}: {written / 1e6:>7.1f} MB in {elapsed:5.1f}s "
+              f"({size / elapsed:>8,.0f} books/s), peak Python memory {peak / 1e6:5.1f} MB")
+    await engine.dispose()
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    # Peak memory should not move when the catalog grows fourfold.
+    for books in (size // 4, size):
+        with tempfile.TemporaryDirectory() as directory:
+            url = f"sqlite:///{Path(directory) / 'export.db'}"
+            seed(url, books)
+            asyncio.run(measure(url, books))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Run with: python -m benchmarks.import_benchmark [books]   (default 100,000)
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from db.models import Base
+from db.search_index import create_search_index
+from schemas import book_import, book_schema
+from schemas.pydantic_models.book_model import BookCreate
+
+ONE_BY_ONE = 2_000
+
+
+def prepare(url):
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        create_search_index(conn)
+    engine.dispose()
+
+
+async def body(size):
+    for offset in range(0, size, 1_000):
+        yield "".join(json.dumps({"title": f"Title {i}", "author": f"Author {i % 997}"}) + "\n"
+                      for i in range(offset, min(size, offset + 1_000))).encode()
+
+
+async def run(url, size):
+    engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    start = time.perf_counter()
+    async with session_factory() as db:
+        for i in range(ONE_BY_ONE):
+            await book_schema.create_book(db, BookCreate(title=f"Single {i}", author="Someone"))
+            await db.commit()
+    per_row = ONE_BY_ONE / (time.perf_counter() - start)
+    print(f"create_book + commit per row: {per_row:>10,.0f} rows/s")
+
+    async with session_factory() as db:
+        records = book_import.iter_ndjson(book_import.iter_lines(body(size)))
+        report = await book_import.import_books(db, records)
+    print(f"streamed NDJSON import:       {report.rows_per_second:>10,.0f} rows/s "
+          f"({report.imported:,} rows in {report.seconds:.1f}s, {report.rows_per_second / per_row:.0f}x)")
+    await engine.dispose()
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{Path(directory) / 'import.db'}"
+        prepare(url)
+        asyncio.run(run(url, size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Run with: python -m benchmarks.json_benchmark [books]   (default 10,000)
+import asyncio
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from config import settings
+from db.models import Base, Book
+from schemas import book_schema, fast_json
+from schemas.fieldsets import FULL, dump_books
+from schemas.pydantic_models.book_model import BookResponse
+
+REVIEWS_PER_BOOK = 3
+ROUNDS = 5
+
+
+def seed(url, size):
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    books = [{"id": str(uuid.uuid4()), "title": f"Title {i:06d}", "author": f"Author {i % 997}"} for i in range(size)]
+    reviews = [{"id": str(uuid.uuid4()), "book_id": book["id"], "rating": j % 5 + 1, "content": f"Review {j}"}
+               for book in books for j in range(REVIEWS_PER_BOOK)]
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO books (id, title, author) VALUES (:id, :title, :author)"), books)
+        conn.execute(text("INSERT INTO reviews (id, book_id, rating, content) "
+                          "VALUES (:id, :book_id, :rating, :content)"), reviews)
+    engine.dispose()
+
+
+async def pydantic_models(db):
+    # What read_books used to do: a model per book, then FastAPI validating
+    # the list again against response_model before json.dumps.
+    page = await book_schema.get_books(db)
+    content = [BookResponse.model_validate(book) for book in page.items]
+    field = create_response_field("Response_read_books", List[BookResponse])
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+async def type_adapter(db):
+    page = await book_schema.get_books(db)
+    return dump_books(FULL, page.items)
+
+
+async def core_rows(db):
+    page = await book_schema.get_book_rows(db, FULL.columns(Book.id, Book.title))
+    reviews = await book_schema.get_review_rows(db, [row.id for row in page.items])
+    return fast_json.encode_books(page.items, FULL, reviews)
+
+
+async def measure(url, size):
+    engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    print(f"{'strategy':>16} {'ms':>8} {'books/s':>10} {'MB':>6}")
+    for name, strategy in (("pydantic models", pydantic_models), ("type adapter", type_adapter),
+                           ("core rows", core_rows)):
+        timings = []
+        for _ in range(ROUNDS):
+            async with session_factory() as db:
+                start = time.perf_counter()
+                body = await strategy(db)
+                timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f"{name:>16} {best * 1000:>8.1f} {size / best:>10,.0f} {len(body) / 1e6:>6.1f}")
+    await engine.dispose()
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    # One page holding the whole payload.
+    settings.PAGE_SIZE_DEFAULT = settings.PAGE_SIZE_MAX = size
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{Path(directory) / 'json.db'}"
+        seed(url, size)
+        asyncio.run(measure(url, size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Run with: python -m benchmarks.listing_benchmark
+import asyncio
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.future import select
+
+from config import settings
+from db.models import Base, Book, Review
+from schemas import book_schema
+from schemas.pydantic_models.book_model import BookResponse, ReviewResponse
+
+SIZES = [100, 1_000, 10_000]
+REVIEWS_PER_BOOK = 3
+
+
+async def seed(session_factory, size):
+    async with session_factory() as db:
+        for i in range(size):
+            book = Book(title=f"Book {i:06d}", author=f"Author {i % 100}")
+            book.reviews = [Review(content=f"Review {j}", rating=j % 5 + 1) for j in range(REVIEWS_PER_BOOK)]
+            db.add(book)
+        await db.commit()
+
+
+async def per_book_queries(db):
+    responses = []
+    for book in (await db.execute(select(Book))).scalars().all():
+        reviews = (await db.execute(select(Review).filter_by(book_id=book.id))).scalars().all()
+        responses.append(BookResponse(id=book.id, title=book.title, author=book.author,
+                                      reviews=[ReviewResponse.model_validate(review) for review in reviews]))
+    return responses
+
+
+async def grouped_fetch(db):
+    # Walk every page so the amount of work matches the unpaginated loop.
+    responses, cursor = [], None
+    while True:
+        page = await book_schema.get_books(db, cursor=cursor, limit=settings.PAGE_SIZE_MAX)
+        responses.extend(BookResponse.model_validate(book) for book in page.items)
+        if page.next_cursor is None:
+            return responses
+        cursor = page.next_cursor
+
+
+async def measure(session_factory, engine, listing):
+    queries = 0
+
+    def count(*args):
+        nonlocal queries
+        queries += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    async with session_factory() as db:
+        start = time.perf_counter()
+        await listing(db)
+        elapsed = time.perf_counter() - start
+    event.remove(engine.sync_engine, "before_cursor_execute", count)
+    return queries, elapsed
+
+
+async def main():
+    print(f"{'books':>8} {'strategy':>15} {'queries':>8} {'ms':>10}")
+    for size in SIZES:
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        await seed(session_factory, size)
+        for name, listing in (("per-book", per_book_queries), ("grouped fetch", grouped_fetch)):
+            queries, elapsed = await measure(session_factory, engine, listing)
+            print(f"{size:>8} {name:>15} {queries:>8} {elapsed * 1000:>10.1f}")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
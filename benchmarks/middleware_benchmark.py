@@ -0,0 +1,65 @@
+# Run with: python -m benchmarks.middleware_benchmark
+import asyncio
+import logging
+import time
+
+import httpx
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from cookies_middleware import CookiesMiddleware
+from middleware import LoggingMiddleware
+
+REQUESTS = 5_000
+
+
+class BaseHTTPLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        logging.info(f"Request - Method: {request.method}, Path: {request.url.path}")
+        response = await call_next(request)
+        logging.info(f"Response - Status Code: {response.status_code}")
+        return response
+
+
+class BaseHTTPCookiesMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.set_cookie(key="session_id", value="unique_session_id")
+        return response
+
+
+def build_app(*middleware):
+    app = FastAPI()
+
+    @app.get("/")
+    async def root():
+        return {"message": "Welcome to the Book Catalog API"}
+
+    for middleware_class in middleware:
+        app.add_middleware(middleware_class)
+    return app
+
+
+async def requests_per_second(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/")
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            await client.get("/")
+        return REQUESTS / (time.perf_counter() - start)
+
+
+async def main():
+    variants = {
+        "no middleware": build_app(),
+        "BaseHTTPMiddleware": build_app(BaseHTTPLoggingMiddleware, BaseHTTPCookiesMiddleware),
+        "pure ASGI": build_app(LoggingMiddleware, CookiesMiddleware),
+    }
+    print(f"{'stack':>20} {'req/s':>10}")
+    for name, app in variants.items():
+        print(f"{name:>20} {await requests_per_second(app):>10,.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
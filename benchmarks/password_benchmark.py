@@ -0,0 +1,81 @@
+# Run with: python -m benchmarks.password_benchmark [logins]   (default 64)
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from config import settings
+from db.models import Base, User
+from security import auth
+from security.passwords import PasswordHasher
+
+COST_LEVELS = [2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15, 2 ** 16]
+CONCURRENCY = 16
+
+
+async def loop_lag(stop: asyncio.Event) -> float:
+    # Longest stretch the event loop went without running this ticker.
+    worst, last = 0.0, time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.001)
+        now = time.perf_counter()
+        worst, last = max(worst, now - last), now
+    return worst
+
+
+async def measure(session_factory, logins):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def login():
+        async with semaphore, session_factory() as db:
+            assert await auth.authenticate_user(db, "reader", "correct horse")
+
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return elapsed, await ticker
+
+
+def seed(engine, hasher):
+    with Session(engine) as db:
+        db.query(User).delete()
+        db.add(User(username="reader", email="reader@example.com", password=hasher.hash_sync("correct horse"),
+                    is_active=True))
+        db.commit()
+
+
+async def run(url, logins):
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+    session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    print(f"{'n':>7} {'workers':>8} {'logins/s':>9} {'ms/login':>9} {'max loop lag ms':>16}")
+    for n in COST_LEVELS:
+        hasher = PasswordHasher(n=n, r=settings.PASSWORD_SCRYPT_R, p=settings.PASSWORD_SCRYPT_P,
+                                workers=settings.PASSWORD_HASH_WORKERS)
+        seed(engine, hasher)
+        auth.password_hasher = hasher
+        elapsed, lag = await measure(session_factory, logins)
+        hasher.shutdown()
+        print(f"{n:>7} {hasher.workers:>8} {logins / elapsed:>9.1f} {elapsed / logins * 1000:>9.1f} "
+              f"{lag * 1000:>16.1f}")
+    await async_engine.dispose()
+    engine.dispose()
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(f"sqlite:///{Path(directory) / 'passwords.db'}", logins))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Run with: python -m benchmarks.recommender_benchmark [users] [books]   (default 50,000 x 20,000)
+import random
+import sys
+import time
+
+import numpy as np
+
+from schemas.recommender import Recommender
+
+GENRES = 40
+RATINGS_PER_USER = 30
+TOP_N = 10
+
+
+def synthesize(users, books, seed=42):
+    """Users mostly rate books from two favourite genres; one rating each is held out."""
+    rng = random.Random(seed)
+    by_genre = [list(range(genre, books, GENRES)) for genre in range(GENRES)]
+    popularity = [1 / (rank + 1) for rank in range(books // GENRES + 1)]
+    train, held_out = [], {}
+    for user in range(users):
+        favourites = rng.sample(range(GENRES), 2)
+        rated = set()
+        while len(rated) < RATINGS_PER_USER:
+            genre = rng.choice(favourites) if rng.random() < 0.8 else rng.randrange(GENRES)
+            shelf = by_genre[genre]
+            rated.add(shelf[rng.choices(range(len(shelf)), popularity[:len(shelf)])[0]])
+        rated = list(rated)
+        rng.shuffle(rated)
+        held_out[f"u{user}"] = f"b{rated[0]}"
+        for book in rated[1:]:
+            liked = (book % GENRES) in favourites
+            train.append((f"u{user}", f"b{book}", rng.randint(4, 5) if liked else rng.randint(1, 3)))
+    return train, held_out
+
+
+def recall(recommend, held_out, sample):
+    hits = sum(held_out[user] in {book for book, _ in recommend(user)} for user in sample)
+    return hits / len(sample)
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    books = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    train, held_out = synthesize(users, books)
+    print(f"{users:,} users x {books:,} books, {len(train):,} ratings")
+
+    recommender = Recommender(neighbours=50)
+    start = time.perf_counter()
+    recommender.load_ratings(train)
+    print(f"full build: {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(1)
+    for writes in (1, 10, 100):
+        start = time.perf_counter()
+        for _ in range(writes):
+            recommender.rate(f"u{rng.randrange(users)}", f"b{rng.randrange(books)}", rng.randint(1, 5))
+        recomputed = recommender.refresh()
+        print(f"incremental refresh after {writes:>3} writes: {(time.perf_counter() - start) * 1000:>6.0f}ms "
+              f"({recomputed:,} of {books:,} lists recomputed)")
+
+    sample = random.Random(2).sample(sorted(held_out), 2_000)
+    latencies = []
+    for user in sample:
+        start = time.perf_counter()
+        recommender.recommend(user, TOP_N)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"recommend latency: p50 {np.percentile(latencies, 50):.2f}ms p99 {np.percentile(latencies, 99):.2f}ms")
+
+    popular = recommender.recommend("cold-start-user", TOP_N)
+    print(f"recall@{TOP_N}: item-item {recall(lambda user: recommender.recommend(user, TOP_N), held_out, sample):.3f}"
+          f", most-popular baseline {recall(lambda user: popular, held_out, sample):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Run with: python -m benchmarks.search_benchmark [books]   (default 1,000,000)
+import asyncio
+import random
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from db.models import Base
+from db.search_index import create_search_index
+from schemas.book_search import search_books
+
+SYLLABLES = ["dra", "mor", "kel", "zan", "tor", "vey", "lum", "qua", "gon", "ith",
+             "ara", "oss", "enn", "ux", "ial", "orn", "et", "ax", "bri", "sol"]
+# 8,000 distinct words so terms are about as selective as in a real catalog.
+WORDS = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+QUERIES = ["dragonith", "morkelzan", "torvey", "zanoss tormor", "lumqua solbri"]
+BATCH = 50_000
+
+
+def seed(url, size):
+    rng = random.Random(42)
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        create_search_index(conn)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for offset in range(0, size, BATCH):
+            books = [{"id": str(uuid.uuid4()),
+                      "title": " ".join(rng.choices(WORDS, k=3)),
+                      "author": " ".join(rng.choices(WORDS, k=2))}
+                     for _ in range(min(BATCH, size - offset))]
+            conn.execute(text("INSERT INTO books (id, title, author) VALUES (:id, :title, :author)"), books)
+            reviews = [{"id": str(uuid.uuid4()), "book_id": book["id"], "rating": 3,
+                        "content": " ".join(rng.choices(WORDS, k=8))}
+                       for book in books if rng.random() < 0.3]
+            conn.execute(text("INSERT INTO reviews (id, book_id, rating, content) "
+                              "VALUES (:id, :book_id, :rating, :content)"), reviews)
+    engine.dispose()
+    return time.perf_counter() - start
+
+
+async def time_queries(url):
+    engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    print(f"{'query':>16} {'LIKE scan ms':>14} {'FTS5 ms':>10} {'hits':>6}")
+    async with session_factory() as db:
+        for query in QUERIES:
+            like = " AND ".join(f"(title LIKE :p{i} OR author LIKE :p{i})" for i in range(len(query.split())))
+            params = {f"p{i}": f"%{term}%" for i, term in enumerate(query.split())}
+            start = time.perf_counter()
+            await db.execute(text(f"SELECT id FROM books WHERE {like} ORDER BY title LIMIT 50"), params)
+            like_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            page = await search_books(db, query, limit=50)
+            fts_ms = (time.perf_counter() - start) * 1000
+            print(f"{query:>16} {like_ms:>14.1f} {fts_ms:>10.1f} {len(page.items):>6}")
+    await engine.dispose()
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{Path(directory) / 'search.db'}"
+        print(f"seeded {size:,} books (with index triggers) in {seed(url, size):.1f}s")
+        asyncio.run(time_queries(url))
+
+
+if __name__ == "__main__":
+    main()
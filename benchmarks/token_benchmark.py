@@ -0,0 +1,51 @@
+# Run with: python -m benchmarks.token_benchmark
+import time
+
+from security.tokens import TokenService
+
+SECRET = "benchmark-secret-benchmark-secret-0123"
+CLAIMS = {"sub": "benchmark-user", "role": "user"}
+ROUNDS = 20_000
+
+
+def ops_per_second(func, rounds=ROUNDS):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return rounds / (time.perf_counter() - start)
+
+
+def implementations():
+    service = TokenService({"primary": SECRET}, active_kid="primary")
+    yield "token_service", lambda: service.encode(CLAIMS), service.decode
+    try:
+        import jwt as pyjwt
+    except ImportError:
+        pass
+    else:
+        yield ("pyjwt", lambda: pyjwt.encode(dict(CLAIMS, exp=int(time.time()) + 1800), SECRET, algorithm="HS256"),
+               lambda token: pyjwt.decode(token, SECRET, algorithms=["HS256"]))
+    try:
+        from jose import jwt as jose_jwt
+    except ImportError:
+        pass
+    else:
+        yield ("python-jose", lambda: jose_jwt.encode(dict(CLAIMS, exp=int(time.time()) + 1800), SECRET, algorithm="HS256"),
+               lambda token: jose_jwt.decode(token, SECRET, algorithms=["HS256"]))
+
+
+def main():
+    print(f"{'implementation':>15} {'encode ops/s':>14} {'decode ops/s':>14}")
+    for name, encode, decode in implementations():
+        token = encode()
+        print(f"{name:>15} {ops_per_second(encode):>14,.0f} {ops_per_second(lambda: decode(token)):>14,.0f}")
+
+    # security.auth.decode_token verifies each token once and then serves its claims from token_cache.
+    from security.auth import create_access_token, decode_token, token_service
+    token = create_access_token({"sub": "benchmark-user"})
+    print(f"{'decode cache':>15} {'':>14} {ops_per_second(lambda: token_service.decode(token)):>14,.0f} uncached")
+    print(f"{'decode cache':>15} {'':>14} {ops_per_second(lambda: decode_token(token)):>14,.0f} cached")
+
+
+if __name__ == "__main__":
+    main()
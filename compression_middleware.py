@@ -0,0 +1,88 @@
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+from utilities.compression import compressor, negotiate_encoding
+
+
+class CompressionMiddleware:
+    """Compresses responses with brotli or gzip, whichever the client prefers.
+
+    Only responses whose content type is in ``content_types`` and whose body
+    reaches ``minimum_size`` are compressed; smaller bodies are not worth the
+    CPU. Streaming bodies are compressed chunk by chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None,
+                 content_types: Optional[Iterable[str]] = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MINIMUM_SIZE if minimum_size is None else minimum_size
+        self.content_types = frozenset(settings.COMPRESSION_CONTENT_TYPES if content_types is None else content_types)
+
+    def compressible(self, message: Message) -> bool:
+        headers = Headers(raw=message["headers"])
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return (message["status"] not in (204, 206, 304) and content_type in self.content_types
+                and "content-encoding" not in headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        level = settings.COMPRESSION_BROTLI_QUALITY if encoding == "br" else settings.COMPRESSION_GZIP_LEVEL
+
+        start: Optional[Message] = None
+        codec = None
+        pending = b""
+
+        async def send_compressed(message: Message):
+            nonlocal start, codec, pending
+            if message["type"] == "http.response.start":
+                if self.compressible(message):
+                    MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                    start = message
+                else:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or (start is None and codec is None):
+                await send(message)
+                return
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if codec is not None:
+                body = codec.compress(body) + (codec.flush() if more_body else codec.finish())
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            # Hold the start message until the body is known to reach the threshold.
+            pending += body
+            if more_body and len(pending) < self.minimum_size:
+                return
+            if len(pending) < self.minimum_size:
+                await send(start)
+                await send({"type": "http.response.body", "body": pending})
+                return
+
+            codec = compressor(encoding, level)
+            body = codec.compress(pending) + (codec.flush() if more_body else codec.finish())
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = encoding
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            # The compressed bytes differ from the identity ones, so a strong
+            # validator would no longer be accurate.
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            await send(start)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,3 +1,5 @@
+from typing import Dict, List, Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,6 +7,20 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    JWT_ACTIVE_KID: str = "primary"
+    # Retired signing keys by kid, still accepted when decoding, e.g. '{"2024-01": "old-secret"}'
+    JWT_PREVIOUS_KEYS: Dict[str, str] = {}
+    # scrypt cost; stored hashes made with other values are upgraded on the next login
+    PASSWORD_SCRYPT_N: int = 2 ** 14
+    PASSWORD_SCRYPT_R: int = 8
+    PASSWORD_SCRYPT_P: int = 1
+    PASSWORD_HASH_WORKERS: int = 4
+    # Only for databases that have not run the hash_passwords migration yet
+    PASSWORD_ACCEPT_PLAINTEXT: bool = False
+    USER_CACHE_MAX_SIZE: int = 1024
+    USER_CACHE_TTL_SECONDS: int = 60
+    TOKEN_CACHE_MAX_SIZE: int = 4096
+    TOKEN_CACHE_TTL_SECONDS: int = 300
 
     # Email settings
     MAIL_USERNAME: str
@@ -14,6 +30,16 @@ class Settings(BaseSettings):
     MAIL_SERVER: str
     MAIL_TLS: bool
     MAIL_SSL: bool
+    # "smtp", "file" (writes .eml files to MAIL_FILE_DIR) or "memory"
+    MAIL_TRANSPORT: str = "smtp"
+    MAIL_FILE_DIR: str = "outbox"
+    MAIL_BATCH_SIZE: int = 20
+    MAIL_MAX_RETRIES: int = 5
+    MAIL_RETRY_BACKOFF_SECONDS: float = 1.0
+    MAIL_IDLE_TIMEOUT_SECONDS: float = 30
+    MAIL_QUEUE_MAX_SIZE: int = 10000
+    # How long shutdown waits for queued email to go out
+    MAIL_SHUTDOWN_TIMEOUT_SECONDS: float = 10
 
     # Database settings
     DB_USER: str
@@ -21,6 +47,72 @@ class Settings(BaseSettings):
     DB_HOST: str
     DB_PORT: str
     DB_NAME: str
+    DATABASE_URL: str = "sqlite+aiosqlite:///./test1.db"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Access log settings
+    ACCESS_LOG_FILE: str = "access.log"
+    REQUEST_LOG_FILE: str = "api_requests.log"
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
+    ACCESS_LOG_SLOW_MS: float = 500
+
+    # Autocomplete settings
+    AUTOCOMPLETE_MAX_BOOKS: int = 500_000
+    AUTOCOMPLETE_MAX_RESULTS: int = 20
+
+    # Pagination settings
+    PAGE_SIZE_DEFAULT: int = 50
+    PAGE_SIZE_MAX: int = 500
+
+    # HTTP caching settings
+    HTTP_CACHE_CONTROL: str = "private, max-age=0, must-revalidate"
+
+    # Response compression settings
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_CONTENT_TYPES: List[str] = [
+        "application/json", "application/x-ndjson", "application/javascript", "text/css", "text/csv",
+        "text/html", "text/javascript", "text/plain", "image/svg+xml",
+    ]
+
+    # Static asset settings; hashed asset URLs are cached for STATIC_MAX_AGE_SECONDS.
+    # STATIC_PRECOMPRESS writes .br/.gz siblings into STATIC_DIRECTORY at startup; otherwise
+    # precompress at build time with `python -m utilities.static_assets`.
+    STATIC_DIRECTORY: str = "static"
+    STATIC_PRECOMPRESS: bool = False
+    STATIC_MAX_AGE_SECONDS: int = 365 * 24 * 3600
+
+    # Template settings; auto-reload re-renders pages when their files change (development only).
+    # The bytecode cache defaults to a per-user directory under the system temp dir.
+    TEMPLATES_AUTO_RELOAD: bool = False
+    TEMPLATES_BYTECODE_CACHE_DIR: Optional[str] = None
+
+    # Response cache settings ("memory", "redis" or "none"); "memory" is per process, so only
+    # use it with a single worker; with more, other workers serve stale bodies until the TTL.
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10_000
+    RESPONSE_CACHE_TTL_SECONDS: int = 60
+    RESPONSE_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Batch API settings
+    BATCH_MAX_ITEMS: int = 1000
+
+    # Bulk import settings
+    IMPORT_CHUNK_SIZE: int = 1000
+    IMPORT_MAX_ERRORS: int = 1000
+
+    # Export settings
+    EXPORT_BATCH_SIZE: int = 1000
+    EXPORT_FLUSH_BYTES: int = 64 * 1024
+
+    # Recommendation settings
+    RECOMMENDER_NEIGHBOURS: int = 50
+    RECOMMENDER_MAX_RESULTS: int = 50
 
     class Config:
         env_file = ".env"
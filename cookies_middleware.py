@@ -1,11 +1,28 @@
 # middleware.py
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from http.cookies import SimpleCookie
 
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-class CookiesMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        response: Response = await call_next(request)
-        response.set_cookie(key="session_id", value="unique_session_id")
-        return response
+
+class CookiesMiddleware:
+    def __init__(self, app: ASGIApp, key: str = "session_id", value: str = "unique_session_id"):
+        self.app = app
+        cookie = SimpleCookie()
+        cookie[key] = value
+        cookie[key]["path"] = "/"
+        cookie[key]["samesite"] = "lax"
+        # The cookie never changes, so its header is rendered once up front.
+        self.header = (b"set-cookie", cookie.output(header="").strip().encode("latin-1"))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), self.header]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
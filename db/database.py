@@ -1,29 +1,156 @@
-from sqlalchemy.orm import sessionmaker, declarative_base
-from contextlib import asynccontextmanager
-from sqlalchemy import create_engine
+import time
+from collections import Counter
+from contextvars import ContextVar
 
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from config import settings
 from db.models import Base
+from db.search_index import create_search_index
+from utilities.metrics import CallbackCounter, CallbackGauge, registry
+from utilities.request_stats import current_request_stats
+
+DATABASE_URL = settings.DATABASE_URL
+
+engine = create_async_engine(
+    DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
+
+
+class CommitHookSession(AsyncSession):
+    """AsyncSession whose commit also awaits the callbacks registered with ``after_commit_async``."""
+
+    async def commit(self):
+        await super().commit()
+        for callback in self.sync_session.info.pop("after_commit_async", []):
+            await callback()
+
+
+SessionLocal = async_sessionmaker(engine, class_=CommitHookSession, autoflush=False, expire_on_commit=False)
+
+_request_checkouts: ContextVar = ContextVar("request_checkouts", default=None)
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkouts = 0
+        self.requests = 0
+        self.checkouts_per_request = Counter()
+
+    def record_checkout(self):
+        self.checkouts += 1
+        counter = _request_checkouts.get()
+        if counter is not None:
+            counter[0] += 1
+
+    def record_request(self, checkouts: int):
+        self.requests += 1
+        self.checkouts_per_request[checkouts] += 1
+
+    def reset(self):
+        self.__init__()
+
+    def snapshot(self):
+        return {
+            "checkouts": self.checkouts,
+            "requests": self.requests,
+            "checkouts_per_request": dict(self.checkouts_per_request),
+            "pool": engine.pool.status(),
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.db_time += elapsed
+        stats.db_statements += 1
+
+
+def pool_gauges():
+    pool = engine.pool
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            yield (name,), getattr(pool, name)()
+
+
+registry.register(CallbackGauge("db_pool_connections", "Connection pool state of the main engine.",
+                                pool_gauges, ("state",)))
+registry.register(CallbackCounter("db_pool_checkouts_total", "Connections checked out of the pool.",
+                                  lambda: [((), pool_metrics.checkouts)]))
+
+
+def instrument_engine(target):
+    event.listen(target.sync_engine, "checkout", lambda *args: pool_metrics.record_checkout())
+    event.listen(target.sync_engine, "before_cursor_execute", _start_query_timer)
+    event.listen(target.sync_engine, "after_cursor_execute", _record_query_time)
+
+
+instrument_engine(engine)
+
+
+def after_commit(session, callback):
+    # Runs callback once the session's current transaction commits; dropped on rollback.
+    # Accepts an AsyncSession or, from Session event listeners, a plain Session.
+    session = getattr(session, "sync_session", session)
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+def after_commit_async(session, callback):
+    # Like after_commit, but awaited before the session's commit() returns;
+    # for work the next request must see, such as shared cache invalidation.
+    session.sync_session.info.setdefault("after_commit_async", []).append(callback)
+
 
-# Use 'sqlite+aiosqlite' for SQLite with async support
-DATABASE_URL = "sqlite:///./test1.db"
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session):
+    for callback in session.info.pop("after_commit", []):
+        callback()
 
-engine = create_engine(DATABASE_URL)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit(session):
+    session.info.pop("after_commit", None)
+    session.info.pop("after_commit_async", None)
 
 
-def get_db():
-    db = SessionLocal()
+async def get_session():
+    # One session and one transaction per request, shared by auth and the
+    # routes; committed when the request succeeds, rolled back otherwise.
+    checkouts = [0]
+    _request_checkouts.set(checkouts)
     try:
-        yield db
+        async with SessionLocal() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
     finally:
-        db.close()
+        _request_checkouts.set(None)
+        pool_metrics.record_request(checkouts[0])
 
 
-def get_session():
-    with SessionLocal() as session:
-        return session
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_search_index)
 
 
-def init_db():
-    Base.metadata.create_all(engine)
+async def disconnect():
+    await engine.dispose()
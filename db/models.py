@@ -23,8 +23,26 @@ class Book(Base):
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     title = Column(String, index=True)
     author = Column(String, index=True)
+    # Rating aggregates maintained by book_schema alongside review writes.
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_1 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_2 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_3 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_4 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_5 = Column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped by every write that changes the book's response, reviews included; drives its ETag.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     reviews = relationship("Review", back_populates="book")
 
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.review_count if self.review_count else None
+
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f"rating_{star}") or 0 for star in range(1, 6)}
+
 class Review(Base):
     __tablename__ = "reviews"
 
@@ -32,6 +50,7 @@ class Review(Base):
     content = Column(String)
     rating = Column(Integer)
     user_id = Column(String, ForeignKey("users.id"))
-    book_id = Column(String, ForeignKey("books.id"))
+    book_id = Column(String, ForeignKey("books.id"), index=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     user = relationship("User", back_populates="reviews")
     book = relationship("Book", back_populates="reviews")
@@ -0,0 +1,99 @@
+# Full-text search structures for books. SQLite keeps a FTS5 table in step with
+# books and reviews through triggers; Postgres uses GIN indexes on tsvector
+# expressions instead. FTS5 rows are keyed through books_fts_ids, whose explicit
+# INTEGER PRIMARY KEY survives VACUUM and table recreates, unlike books.rowid.
+
+BOOK_FTS_ROWID = "(SELECT rowid FROM books_fts_ids WHERE book_id = {})"
+
+
+def _reviews_of(book_id: str) -> str:
+    return (f"UPDATE books_fts SET reviews = (\n"
+            f"            SELECT coalesce(group_concat(content, ' '), '') FROM reviews WHERE book_id = {book_id}\n"
+            f"        ) WHERE rowid = {BOOK_FTS_ROWID.format(book_id)};")
+
+
+SQLITE_TRIGGERS = ("books_fts_insert", "books_fts_update", "books_fts_delete",
+                   "reviews_fts_insert", "reviews_fts_update", "reviews_fts_delete")
+
+SQLITE_SEARCH_DDL = [
+    "CREATE TABLE IF NOT EXISTS books_fts_ids (rowid INTEGER PRIMARY KEY, book_id VARCHAR NOT NULL UNIQUE)",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, author, reviews, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts_ids (book_id) VALUES (new.id);
+        INSERT INTO books_fts (rowid, title, author, reviews)
+            VALUES ({BOOK_FTS_ROWID.format("new.id")}, new.title, new.author, '');
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author ON books BEGIN
+        UPDATE books_fts SET title = new.title, author = new.author WHERE rowid = {BOOK_FTS_ROWID.format("new.id")};
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+        DELETE FROM books_fts WHERE rowid = {BOOK_FTS_ROWID.format("old.id")};
+        DELETE FROM books_fts_ids WHERE book_id = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS reviews_fts_insert AFTER INSERT ON reviews BEGIN
+        {_reviews_of("new.book_id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS reviews_fts_update AFTER UPDATE OF content, book_id ON reviews BEGIN
+        {_reviews_of("old.book_id")}
+        {_reviews_of("new.book_id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS reviews_fts_delete AFTER DELETE ON reviews BEGIN
+        {_reviews_of("old.book_id")}
+    END""",
+]
+
+SQLITE_REBUILD = [
+    "DELETE FROM books_fts",
+    "DELETE FROM books_fts_ids",
+    "INSERT INTO books_fts_ids (book_id) SELECT id FROM books",
+    """INSERT INTO books_fts (rowid, title, author, reviews)
+       SELECT books_fts_ids.rowid, books.title, books.author,
+              coalesce((SELECT group_concat(content, ' ') FROM reviews WHERE book_id = books.id), '')
+       FROM books JOIN books_fts_ids ON books_fts_ids.book_id = books.id""",
+]
+
+BOOK_VECTOR = "to_tsvector('simple', coalesce(books.title, '') || ' ' || coalesce(books.author, ''))"
+REVIEW_VECTOR = "to_tsvector('simple', coalesce(reviews.content, ''))"
+
+POSTGRES_SEARCH_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_books_search ON books USING GIN ({BOOK_VECTOR})",
+    f"CREATE INDEX IF NOT EXISTS ix_reviews_search ON reviews USING GIN ({REVIEW_VECTOR})",
+]
+
+
+def create_search_index(connection):
+    if connection.dialect.name == "postgresql":
+        for statement in POSTGRES_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+        return
+    existing = {name for (name,) in connection.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    if "books_fts" in existing and "books_fts_ids" not in existing:
+        # Built when the index was keyed on books.rowid.
+        drop_search_index(connection)
+        existing = set()
+    for statement in SQLITE_SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+    # Recreating books (e.g. Alembic batch_alter_table) drops its triggers, so
+    # writes made since never reached the index; rebuild whenever one was missing.
+    if not existing.issuperset(SQLITE_TRIGGERS):
+        rebuild_search_index(connection)
+
+
+def drop_search_index(connection):
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("DROP INDEX IF EXISTS ix_reviews_search")
+        connection.exec_driver_sql("DROP INDEX IF EXISTS ix_books_search")
+        return
+    for trigger in SQLITE_TRIGGERS:
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+    connection.exec_driver_sql("DROP TABLE IF EXISTS books_fts")
+    connection.exec_driver_sql("DROP TABLE IF EXISTS books_fts_ids")
+
+
+def rebuild_search_index(connection):
+    if connection.dialect.name == "sqlite":
+        for statement in SQLITE_REBUILD:
+            connection.exec_driver_sql(statement)
@@ -1,22 +1,36 @@
 from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.openapi.utils import get_openapi
 from fastapi.responses import JSONResponse
-import asyncio
+from typing import List
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from db import database
 from sqlalchemy.ext.asyncio import AsyncSession
 from middleware import LoggingMiddleware
-from db.database import init_db
+from compression_middleware import CompressionMiddleware
+from config import settings
+from db.database import get_session, init_db
+from db.models import User
 from cookies_middleware import CookiesMiddleware
+from schemas.autocomplete import autocomplete_index
+from schemas import book_schema
 from schemas.book_routes import router
+from schemas.pydantic_models.book_model import BookRecommendation
+from schemas.recommender import recommender
+from security.auth import get_current_user
 from security.auth_routes import auth_router
+from security.passwords import password_hasher
+from utilities.mailer import mail_queue
+from utilities.metrics import registry
+from utilities.pages import PageCache, create_environment
+from utilities.static_assets import AssetFiles
 app = FastAPI()
 
+# Innermost, so the access log records the bytes actually sent.
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(LoggingMiddleware)
 app.add_middleware(CookiesMiddleware)
 app.include_router(router, prefix="/books", tags=["books"])
@@ -66,14 +80,21 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 
 @app.on_event("startup")
-def startup():
-    init_db()
+async def startup():
+    await init_db()
+    async with database.SessionLocal() as db:
+        await autocomplete_index.load(db)
+        await recommender.load(db)
+    pages.warm(PAGES)
     print("Starting up the FastAPI application...")
 
 
 @app.on_event("shutdown")
-def shutdown():
-    database.disconnect()
+async def shutdown():
+    # Draining the mail queue can wait on SMTP, so keep it off the event loop.
+    await run_in_threadpool(mail_queue.stop, settings.MAIL_SHUTDOWN_TIMEOUT_SECONDS)
+    password_hasher.shutdown()
+    await database.disconnect()
 
 
 @app.get("/")
@@ -86,10 +107,24 @@ def root_head():
     return JSONResponse(status_code=200, content=None)
 
 
-@app.get("/recommendations")
-def get_recommendations():
-    asyncio.sleep(5)
-    return {"message": "Here are some book recommendations"}
+@app.get("/db/stats")
+def db_stats():
+    return database.pool_metrics.snapshot()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/recommendations", response_model=List[BookRecommendation])
+async def get_recommendations(limit: int = 10, db: AsyncSession = Depends(get_session),
+                              current_user: User = Depends(get_current_user)):
+    await recommender.ensure_fresh()
+    ranked = recommender.recommend(current_user.id, max(1, min(limit, settings.RECOMMENDER_MAX_RESULTS)))
+    books = await book_schema.get_books_by_id(db, [book_id for book_id, _ in ranked])
+    return [BookRecommendation(id=book_id, title=books[book_id].title, author=books[book_id].author, score=score)
+            for book_id, score in ranked if book_id in books]
 
 
 @app.exception_handler(HTTPException)
@@ -101,29 +136,35 @@ def http_exception_handler(request: Request, exc: HTTPException):
 
 
 # Serve static files (CSS, JS)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+static_files = AssetFiles(directory=settings.STATIC_DIRECTORY)
+app.mount("/static", static_files, name="static")
 
-# Set up Jinja2 templates
-templates = Jinja2Templates(directory="templates")
+# Set up Jinja2 templates. They take no per-request data, so each page is
+# rendered once and served from memory.
+templates = create_environment("templates", auto_reload=settings.TEMPLATES_AUTO_RELOAD,
+                               bytecode_cache_dir=settings.TEMPLATES_BYTECODE_CACHE_DIR)
+templates.globals["static_url"] = lambda path: app.url_path_for("static", path=static_files.asset_path(path))
+pages = PageCache(templates)
+PAGES = ("index.html", "login.html", "verify.html", "books.html")
 
 
 @app.get("/register", response_class=HTMLResponse)
 async def register(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return pages.response(request, "index.html")
 
 
 @app.get("/login", response_class=HTMLResponse)
 async def login(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
+    return pages.response(request, "login.html")
 
 
 @app.get("/verify", response_class=HTMLResponse)
 async def verify(request: Request):
-    return templates.TemplateResponse("verify.html", {"request": request})
+    return pages.response(request, "verify.html")
 
 @app.get("/books", response_class=HTMLResponse)
 async def books_page(request: Request):
-    return templates.TemplateResponse("books.html", {"request": request})
+    return pages.response(request, "books.html")
 
 
 if __name__ == "__main__":
@@ -1,13 +1,77 @@
+import atexit
+import json
 import logging
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-
-logging.basicConfig(filename='api_requests.log', level=logging.INFO, format='%(asctime)s - %(message)s')
-
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        logging.info(f"Request - Method: {request.method}, Path: {request.url.path}")
-        response = await call_next(request)
-        logging.info(f"Response - Status Code: {response.status_code}")
-        return response
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+from utilities.request_stats import RequestStats, current_request_stats
+
+# Request handlers only enqueue log records; a listener thread does the file I/O.
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+# Opened on the first record, so tests can point them elsewhere beforehand.
+_file_handler = logging.FileHandler(settings.REQUEST_LOG_FILE, delay=True)
+_file_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+_file_handler.addFilter(lambda record: record.name != "access")
+_access_handler = logging.FileHandler(settings.ACCESS_LOG_FILE, delay=True)
+_access_handler.setFormatter(logging.Formatter('%(message)s'))
+_access_handler.addFilter(logging.Filter("access"))
+log_listener = QueueListener(_log_queue, _file_handler, _access_handler)
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(_log_queue)])
+log_listener.start()
+atexit.register(log_listener.stop)
+
+access_logger = logging.getLogger("access")
+
+
+class LoggingMiddleware:
+    """Writes one JSON line per request with timing, DB usage and response size.
+
+    Successful fast requests are sampled at ``sample_rate``; server errors and
+    requests slower than ``slow_ms`` are always logged.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float = None, slow_ms: float = None):
+        self.app = app
+        self.sample_rate = settings.ACCESS_LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow_ms = settings.ACCESS_LOG_SLOW_MS if slow_ms is None else slow_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        current_request_stats.set(stats)
+        status_code = 500
+        response_bytes = 0
+        start = time.perf_counter()
+
+        async def send_with_logging(message: Message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_logging)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if status_code >= 500 or duration_ms >= self.slow_ms or random.random() < self.sample_rate:
+                access_logger.info(json.dumps({
+                    "ts": time.time(),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(duration_ms, 3),
+                    "db_ms": round(stats.db_time * 1000, 3),
+                    "db_statements": stats.db_statements,
+                    "response_bytes": response_bytes,
+                    "user_id": stats.user_id,
+                }))
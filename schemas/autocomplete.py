@@ -0,0 +1,175 @@
+import heapq
+import re
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import settings
+from db import models
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _WORD.findall((text or "").lower())
+
+
+def trigrams(term: str) -> set:
+    # Only the start is padded: queries are prefixes of the terms they target.
+    padded = "^" + term
+    return {padded[i:i + 3] for i in range(max(1, len(padded) - 2))}
+
+
+def prefix_edit_distance(token: str, term: str, limit: int) -> int:
+    """Smallest edit distance between ``token`` and any prefix of ``term``, capped at ``limit + 1``."""
+    previous = list(range(len(term) + 1))
+    for i, char in enumerate(token, 1):
+        current = [i]
+        for j, term_char in enumerate(term, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != term_char)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(min(previous), limit + 1)
+
+
+class AutocompleteIndex:
+    """In-memory prefix and trigram index over book titles and authors.
+
+    Documents live in slot-indexed lists and every term maps to an ``array``
+    of slots, so the index costs a few bytes per (term, book) pair. Deleted
+    books leave a tombstone slot until more than half the slots are dead, at
+    which point the index is rebuilt. At most ``max_books`` books are indexed.
+    """
+
+    def __init__(self, max_books: int, max_expansions: int = 64):
+        self.max_books = max_books
+        self.max_expansions = max_expansions
+        self.clear()
+
+    def clear(self):
+        self._books: List[Optional[Tuple[str, str, str]]] = []
+        self._slots: Dict[str, int] = {}
+        self._terms: Dict[str, int] = {}
+        self._term_text: List[str] = []
+        self._postings: List[array] = []
+        self._sorted_terms: List[str] = []
+        self._trigrams: Dict[str, array] = {}
+        self._tombstones = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._terms.get(term)
+        if term_id is None:
+            term_id = self._terms[term] = len(self._term_text)
+            self._term_text.append(term)
+            self._postings.append(array("I"))
+            insort(self._sorted_terms, term)
+            for gram in trigrams(term):
+                self._trigrams.setdefault(gram, array("I")).append(term_id)
+        return term_id
+
+    def add(self, book_id: str, title: str, author: str) -> bool:
+        if book_id in self._slots:
+            self.remove(book_id)
+        if len(self._slots) >= self.max_books:
+            return False
+        slot = len(self._books)
+        self._books.append((book_id, title, author))
+        self._slots[book_id] = slot
+        for term in set(tokenize(title)) | set(tokenize(author)):
+            self._postings[self._term_id(term)].append(slot)
+        return True
+
+    def remove(self, book_id: str):
+        slot = self._slots.pop(book_id, None)
+        if slot is None:
+            return
+        self._books[slot] = None
+        self._tombstones += 1
+        if self._tombstones * 2 > len(self._books):
+            self._compact()
+
+    def _compact(self):
+        live = [book for book in self._books if book is not None]
+        self.clear()
+        for book in live:
+            self.add(*book)
+
+    def _prefix_terms(self, token: str) -> Dict[int, int]:
+        """Term ids starting with ``token``: 3 for the exact word, 2 for a longer one."""
+        matches: Dict[int, int] = {}
+        start = bisect_left(self._sorted_terms, token)
+        for term in self._sorted_terms[start:start + self.max_expansions]:
+            if not term.startswith(token):
+                break
+            matches[self._terms[term]] = 3 if term == token else 2
+        return matches
+
+    def _fuzzy_terms(self, token: str, exclude: Dict[int, int]) -> Dict[int, int]:
+        """Term ids whose prefix is within the typo budget of ``token``, scored 1."""
+        matches: Dict[int, int] = {}
+        if len(token) < 4:
+            return matches
+        max_typos = 1 if len(token) < 7 else 2
+        grams = trigrams(token)
+        overlap: Dict[int, int] = {}
+        for gram in grams:
+            for term_id in self._trigrams.get(gram, ()):
+                overlap[term_id] = overlap.get(term_id, 0) + 1
+        threshold = max(1, len(grams) - 3 * max_typos)
+        candidates = sorted((term_id for term_id, count in overlap.items()
+                             if count >= threshold and term_id not in exclude),
+                            key=lambda term_id: -overlap[term_id])
+        for term_id in candidates[:self.max_expansions]:
+            term = self._term_text[term_id][:len(token) + max_typos]
+            if prefix_edit_distance(token, term, max_typos) <= max_typos:
+                matches[term_id] = 1
+        return matches
+
+    def suggest(self, query: str, limit: int = 10) -> List[Tuple[str, str, str]]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        per_token = []
+        for token in tokens:
+            scores: Dict[int, int] = {}
+            terms = self._prefix_terms(token)
+            self._score(terms, scores)
+            # Typo tolerance only kicks in when exact prefixes come up short.
+            if len(scores) < limit:
+                self._score(self._fuzzy_terms(token, terms), scores)
+            per_token.append(scores)
+
+        per_token.sort(key=len)
+        totals = dict(per_token[0])
+        for scores in per_token[1:]:
+            totals = {slot: total + scores[slot] for slot, total in totals.items() if slot in scores}
+
+        ranked = []
+        for slot, total in totals.items():
+            book = self._books[slot]
+            if book is not None:
+                ranked.append((-total, len(book[1] or ""), book[1] or "", slot))
+        return [self._books[entry[3]] for entry in heapq.nsmallest(limit, ranked)]
+
+    def _score(self, terms: Dict[int, int], scores: Dict[int, int]):
+        for term_id, score in terms.items():
+            for slot in self._postings[term_id]:
+                if scores.get(slot, 0) < score:
+                    scores[slot] = score
+
+    async def load(self, db: AsyncSession):
+        self.clear()
+        result = await db.stream(select(models.Book.id, models.Book.title, models.Book.author))
+        async for book_id, title, author in result:
+            if not self.add(book_id, title, author):
+                break
+
+
+autocomplete_index = AutocompleteIndex(max_books=settings.AUTOCOMPLETE_MAX_BOOKS)
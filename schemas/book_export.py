@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator
+
+from sqlalchemy.future import select
+
+from config import settings
+from db import database, models
+
+CSV_COLUMNS = ["book_id", "title", "author", "review_id", "rating", "content", "user_id"]
+
+
+def catalog_query():
+    # Books outer-joined to their reviews in book order, so each book's rows
+    # arrive together and can be emitted as soon as the next book starts.
+    return (
+        select(models.Book.id, models.Book.title, models.Book.author, models.Book.review_count,
+               models.Book.rating_sum, models.Review.id, models.Review.rating, models.Review.content,
+               models.Review.user_id)
+        .outerjoin(models.Review, models.Review.book_id == models.Book.id)
+        .order_by(models.Book.id, models.Review.id)
+        .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+    )
+
+
+async def _rows():
+    # StreamingResponse runs after request dependencies have exited, so the
+    # export holds its own session for as long as the cursor is open.
+    async with database.SessionLocal() as db:
+        result = await db.stream(catalog_query())
+        async for partition in result.partitions():
+            for row in partition:
+                yield row
+
+
+async def _ndjson_lines() -> AsyncIterator[str]:
+    book = None
+    async for book_id, title, author, review_count, rating_sum, review_id, rating, content, user_id in _rows():
+        if book is None or book["id"] != book_id:
+            if book is not None:
+                yield json.dumps(book) + "\n"
+            book = {"id": book_id, "title": title, "author": author, "review_count": review_count,
+                    "average_rating": rating_sum / review_count if review_count else None, "reviews": []}
+        if review_id is not None:
+            book["reviews"].append({"id": review_id, "rating": rating, "content": content, "user_id": user_id})
+    if book is not None:
+        yield json.dumps(book) + "\n"
+
+
+async def _csv_lines() -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    async for book_id, title, author, _, _, review_id, rating, content, user_id in _rows():
+        writer.writerow((book_id, title, author, review_id, rating, content, user_id))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def export_catalog(export_format: str) -> AsyncIterator[bytes]:
+    """Serialized catalog in chunks of roughly ``EXPORT_FLUSH_BYTES``."""
+    lines = _csv_lines() if export_format == "csv" else _ndjson_lines()
+    pending, size = [], 0
+    async for line in lines:
+        pending.append(line)
+        size += len(line)
+        if size >= settings.EXPORT_FLUSH_BYTES:
+            yield "".join(pending).encode()
+            pending, size = [], 0
+    if pending:
+        yield "".join(pending).encode()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
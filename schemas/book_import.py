@@ -0,0 +1,148 @@
+import csv
+import json
+import time
+import uuid
+from typing import AsyncIterator, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from db import models
+from db.database import after_commit
+from schemas.autocomplete import autocomplete_index
+from schemas.pydantic_models.book_model import BookCreate, BookImportError, BookImportReport
+from utilities.metrics import Counter, Histogram, registry
+
+import_rows = registry.register(Counter("book_import_rows_total", "Rows processed by bulk book imports.",
+                                        ("status",)))
+import_throughput = registry.register(Histogram("book_import_rows_per_second", "Throughput of bulk book imports.",
+                                                buckets=(100, 1_000, 5_000, 10_000, 25_000, 50_000, 100_000)))
+
+
+def _decode(line: bytes) -> Union[str, ValueError]:
+    try:
+        return line.decode("utf-8-sig")
+    except UnicodeDecodeError as exc:
+        return ValueError(f"invalid UTF-8 at byte {exc.start}")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Union[str, ValueError]]:
+    """Re-split a streamed body into text lines, keeping their line endings.
+
+    A line that is not valid UTF-8 comes through as a ValueError, so it is
+    reported against its row instead of failing the whole import.
+    """
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield _decode(line + b"\n")
+    if pending:
+        yield _decode(pending)
+
+
+async def iter_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    row = 0
+    async for line in lines:
+        row += 1
+        if isinstance(line, Exception):
+            yield row, line
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield row, json.loads(line)
+        except ValueError as exc:
+            yield row, exc
+
+
+async def iter_csv(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    header: Optional[List[str]] = None
+    record = ""
+    row = 0
+    async for line in lines:
+        if isinstance(line, Exception):
+            if header is None:
+                yield row, ValueError(f"header: {line}")
+                return
+            record = ""
+            row += 1
+            yield row, line
+            continue
+        record += line
+        # A quoted field may span lines; wait until its closing quote arrives.
+        if record.count('"') % 2:
+            continue
+        values = next(csv.reader([record]), [])
+        record = ""
+        if not values:
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, ValueError(f"expected {len(header)} columns, got {len(values)}")
+        else:
+            yield row, dict(zip(header, values))
+    if record.strip():
+        yield row + 1, ValueError("unterminated quoted field")
+
+
+def _validate(report: BookImportReport, rows: List[Tuple[int, object]]) -> Iterator[dict]:
+    for row, value in rows:
+        try:
+            if isinstance(value, Exception):
+                raise value
+            book = BookCreate.model_validate(value)
+        except (ValidationError, ValueError) as exc:
+            report.failed += 1
+            if len(report.errors) < settings.IMPORT_MAX_ERRORS:
+                if isinstance(exc, ValidationError):
+                    message = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors())
+                else:
+                    message = str(exc)
+                report.errors.append(BookImportError(row=row, error=message))
+            continue
+        yield {"id": str(uuid.uuid4()), **book.model_dump()}
+
+
+def _index_books(books: List[dict]):
+    for book in books:
+        autocomplete_index.add(book["id"], book["title"], book["author"])
+
+
+async def _flush(db: AsyncSession, report: BookImportReport, rows: List[Tuple[int, object]]):
+    books = list(_validate(report, rows))
+    if books:
+        # Invalid rows were dropped above, so each chunk is a single
+        # executemany and a single commit.
+        await db.execute(insert(models.Book.__table__), books)
+        after_commit(db, lambda: _index_books(books))
+        await db.commit()
+        report.imported += len(books)
+    report.rows += len(rows)
+
+
+async def import_books(db: AsyncSession, records: AsyncIterator[Tuple[int, object]],
+                       chunk_size: Optional[int] = None) -> BookImportReport:
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    report = BookImportReport()
+    started = time.perf_counter()
+    rows: List[Tuple[int, object]] = []
+    async for record in records:
+        rows.append(record)
+        if len(rows) >= chunk_size:
+            await _flush(db, report, rows)
+            rows = []
+    await _flush(db, report, rows)
+    report.seconds = round(time.perf_counter() - started, 3)
+    report.rows_per_second = round(report.rows / report.seconds, 1) if report.seconds else 0.0
+    import_rows.inc("imported", amount=report.imported)
+    import_rows.inc("failed", amount=report.failed)
+    import_throughput.observe(report.rows_per_second)
+    return report
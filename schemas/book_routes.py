@@ -1,97 +1,258 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
 from db.models import User, Book, Review
-from schemas import book_schema
-from schemas.pydantic_models.book_model import BookCreate, ReviewCreate, ReviewResponse, BookResponse
+from schemas import book_export, book_import, book_schema, book_search, fast_json
+from schemas.fieldsets import Fieldset, dump_book, dump_books, parse_fieldset
+from schemas.http_cache import (cached_response, collection_etag, etag_matches, json_response, not_modified,
+                                pack_response, row_etag, set_cache_headers)
+from schemas.pagination import Page
+from schemas.autocomplete import autocomplete_index
+from schemas.pydantic_models.book_model import (BookCreate, ReviewCreate, ReviewResponse, BookResponse, BookSuggestion,
+                                               BookImportReport, BookBatch, ReviewBatch, BatchItemResult)
 from schemas.pydantic_models.user_schema import UserCreate
-from db.database import get_session, get_db
-from security.auth import get_current_user
-from utilities.utils import create_access_token
+from db.database import get_session
+from security.auth import get_current_active_admin_user, get_current_user
+from utilities.metrics import MetricsRoute
+from utilities.response_cache import response_cache
 
-router = APIRouter()
+router = APIRouter(route_class=MetricsRoute)
 
 
 @router.post("/books/", response_model=BookCreate)
-def create_book(book: BookCreate, db: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    return book_schema.create_book(db=db, book=book)
+async def create_book(book: BookCreate, db: AsyncSession = Depends(get_session),
+                      current_user: User = Depends(get_current_user)):
+    return await book_schema.create_book(db=db, book=book)
+
+
+@router.post("/books/import", response_model=BookImportReport)
+async def import_books(request: Request, import_format: Optional[str] = Query(None, alias="format"),
+                       db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
+    if import_format is None:
+        import_format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    if import_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    lines = book_import.iter_lines(request.stream())
+    records = book_import.iter_csv(lines) if import_format == "csv" else book_import.iter_ndjson(lines)
+    return await book_import.import_books(db, records)
+
+
+@router.get("/books/export")
+async def export_books(export_format: str = Query("ndjson", alias="format"), gzip: bool = False,
+                       current_user: User = Depends(get_current_user)):
+    if export_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    filename = f"catalog.{export_format}"
+    body = book_export.export_catalog(export_format)
+    if gzip:
+        body, media_type, filename = book_export.gzip_chunks(body), "application/gzip", filename + ".gz"
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+def check_batch_size(batch):
+    if len(batch.create) + len(batch.update) + len(batch.delete) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_ITEMS} operations per batch")
+
+
+def batch_results(op: str, ids, found, status_name: str):
+    return [BatchItemResult(op=op, index=index, id=item_id, status=status_name if ok else "not_found")
+            for index, (item_id, ok) in enumerate(zip(ids, found))]
+
+
+# Batches run creates, then updates, then deletes, all in the request's single transaction.
+@router.post("/books/batch", response_model=List[BatchItemResult])
+async def batch_books(batch: BookBatch, db: AsyncSession = Depends(get_session),
+                      current_user: User = Depends(get_current_user)):
+    check_batch_size(batch)
+    created = await book_schema.create_books(db, batch.create)
+    updated = await book_schema.update_books(db, batch.update)
+    deleted = await book_schema.delete_books(db, batch.delete)
+    return (batch_results("create", created, [True] * len(created), "created")
+            + batch_results("update", [book.id for book in batch.update], updated, "updated")
+            + batch_results("delete", batch.delete, deleted, "deleted"))
+
+
+@router.post("/reviews/batch", response_model=List[BatchItemResult])
+async def batch_reviews(batch: ReviewBatch, db: AsyncSession = Depends(get_session),
+                        current_user: User = Depends(get_current_user)):
+    check_batch_size(batch)
+    created = await book_schema.create_reviews(db, batch.create, user_id=current_user.id)
+    updated = await book_schema.update_reviews(db, batch.update)
+    deleted = await book_schema.delete_reviews(db, batch.delete)
+    return (batch_results("create", created, [review_id is not None for review_id in created], "created")
+            + batch_results("update", [review.id for review in batch.update], updated, "updated")
+            + batch_results("delete", batch.delete, deleted, "deleted"))
+
+
+def get_fieldset(fields: Optional[str], include: Optional[str]) -> Fieldset:
+    try:
+        return parse_fieldset(fields, include)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def set_page_headers(response: Response, page: Page):
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    if page.prev_cursor:
+        response.headers["X-Prev-Cursor"] = page.prev_cursor
 
 
 @router.get("/books/books/", response_model=List[BookResponse])
-def read_books(db: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    books = db.query(Book).all()
-    book_responses = []
-    for book in books:
-        reviews = db.query(Review).filter_by(book_id=book.id).all()
-        review_responses = [
-            ReviewResponse(id=review.id, content=review.content, rating=review.rating, book_id=review.book_id)
-            for review in reviews
-        ]
-        book_responses.append(BookResponse(id=book.id, title=book.title, author=book.author, reviews=review_responses))
-    return book_responses
+async def read_books(request: Request, cursor: Optional[str] = None, limit: Optional[int] = None,
+                     fields: Optional[str] = None, include: Optional[str] = None,
+                     db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
+    fieldset = get_fieldset(fields, include)
+    try:
+        page = await book_schema.get_book_rows(db, fieldset.columns(Book.id, Book.title), cursor=cursor, limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    etag = collection_etag("books", page, fieldset.variant)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    reviews = None
+    if fieldset.include_reviews:
+        reviews = await book_schema.get_review_rows(db, [row.id for row in page.items])
+    # Pre-encoded, so FastAPI skips validating the rows against response_model.
+    response = Response(content=fast_json.encode_books(page.items, fieldset, reviews), media_type="application/json")
+    set_page_headers(response, page)
+    set_cache_headers(response, etag)
+    return response
+
+
+@router.get("/search", response_model=List[BookResponse])
+async def search_books(response: Response, q: str, cursor: Optional[str] = None, limit: Optional[int] = None,
+                       fields: Optional[str] = None, include: Optional[str] = None,
+                       db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
+    fieldset = get_fieldset(fields, include)
+    columns = None if fieldset.is_full else fieldset.columns()
+    try:
+        page = await book_search.search_books(db, q, cursor=cursor, limit=limit,
+                                              with_reviews=fieldset.include_reviews, columns=columns)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not fieldset.is_full:
+        response = Response(content=dump_books(fieldset, page.items), media_type="application/json")
+    set_page_headers(response, page)
+    if not fieldset.is_full:
+        return response
+    return [BookResponse.model_validate(book) for book in page.items]
+
+
+@router.get("/autocomplete", response_model=List[BookSuggestion])
+async def autocomplete(q: str, limit: int = 10, current_user: User = Depends(get_current_user)):
+    limit = max(1, min(limit, settings.AUTOCOMPLETE_MAX_RESULTS))
+    return [BookSuggestion(id=book_id, title=title, author=author)
+            for book_id, title, author in autocomplete_index.suggest(q, limit)]
 
 
 @router.get("/books/{book_id}", response_model=BookResponse)
-def read_book(book_id: str, db: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    db_book = db.query(Book).filter_by(id=book_id).first()
-    if db_book is None:
+async def read_book(book_id: str, request: Request, fields: Optional[str] = None, include: Optional[str] = None,
+                    db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
+    fieldset = get_fieldset(fields, include)
+    if not fieldset.is_full:
+        # Projections are cheap single-row reads, so only the full response is cached.
+        db_book = await book_schema.get_book(db, book_id, with_reviews=fieldset.include_reviews,
+                                             columns=fieldset.columns())
+        if db_book is None:
+            raise HTTPException(status_code=404, detail="Book not found")
+        return json_response(request, row_etag("book", db_book, fieldset.variant), dump_book(fieldset, db_book))
+
+    async def load():
+        db_book = await book_schema.get_book(db, book_id)
+        if db_book is None:
+            return None
+        return pack_response(row_etag("book", db_book), BookResponse.model_validate(db_book).model_dump_json().encode())
+
+    cached = await response_cache.get_or_load(book_schema.book_cache_key(book_id), load)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    return db_book
+    return cached_response(request, cached)
 
 
 @router.put("/books/{book_id}", response_model=BookResponse)
-def update_book(book_id: str, book: BookCreate, db: Session = Depends(get_session),
-                current_user: User = Depends(get_current_user)):
-    db_book = db.query(Book).filter_by(id=book_id).first()
+async def update_book(book_id: str, book: BookCreate, db: AsyncSession = Depends(get_session),
+                      current_user: User = Depends(get_current_user)):
+    db_book = await book_schema.get_book(db, book_id)
     if db_book is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    return book_schema.update_book(db=db, book_id=db_book.id, book=book)
+    return await book_schema.update_book(db=db, book_id=db_book.id, book=book)
 
 
 @router.delete("/books/{book_id}")
-def delete_book(book_id: str, db: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    db_book = db.query(Book).filter_by(id=book_id).first()
+async def delete_book(book_id: str, db: AsyncSession = Depends(get_session),
+                      current_user: User = Depends(get_current_user)):
+    db_book = await book_schema.get_book(db, book_id)
     if db_book is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    return book_schema.delete_book(db=db, book_id=db_book.id)
+    return await book_schema.delete_book(db=db, book_id=db_book.id)
 
 
 @router.post("/books/{book_id}/reviews/", response_model=ReviewResponse)
-def create_review_for_book(book_id: str, review: ReviewCreate, db: Session = Depends(get_session),
-                           current_user: User = Depends(get_current_user)):
-    db_book = db.query(Book).filter_by(id=current_user.id).first()
+async def create_review_for_book(book_id: str, review: ReviewCreate, db: AsyncSession = Depends(get_session),
+                                 current_user: User = Depends(get_current_user)):
+    db_book = await book_schema.get_book(db, book_id)
     if db_book is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    return book_schema.create_review(db=db, review=review, book_id=book_id)
+    return await book_schema.create_review(db=db, review=review, book_id=book_id, user_id=current_user.id)
 
 
 @router.get("/reviews/", response_model=List[ReviewResponse])
-def read_reviews(db: Session = Depends(get_session),
-                 current_user: User = Depends(get_current_user)):
-    reviews = db.query(Review).join(Book).all()
-    return reviews
+async def read_reviews(request: Request, response: Response, cursor: Optional[str] = None,
+                       limit: Optional[int] = None, db: AsyncSession = Depends(get_session),
+                       current_user: User = Depends(get_current_user)):
+    try:
+        page = await book_schema.get_reviews(db, cursor=cursor, limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    etag = collection_etag("reviews", page)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_page_headers(response, page)
+    set_cache_headers(response, etag)
+    return page.items
 
 
 @router.get("/reviews/{review_id}", response_model=ReviewResponse)
-def read_review(review_id: str, db: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    db_review = db.query(Review).join(Book).filter(Review.id == review_id).first()
-    if db_review is None:
+async def read_review(review_id: str, request: Request, db: AsyncSession = Depends(get_session),
+                      current_user: User = Depends(get_current_user)):
+    async def load():
+        db_review = await book_schema.get_review(db, review_id)
+        if db_review is None:
+            return None
+        return pack_response(row_etag("review", db_review),
+                             ReviewResponse.model_validate(db_review).model_dump_json().encode())
+
+    cached = await response_cache.get_or_load(book_schema.review_cache_key(review_id), load)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Review not found")
-    return db_review
+    return cached_response(request, cached)
 
 
 @router.put("/reviews/{review_id}", response_model=ReviewResponse)
-def update_review(review_id: str, review: ReviewCreate, db: Session = Depends(get_session),
-                  current_user: User = Depends(get_current_user)):
-    db_review = db.query(Review).join(Book).filter(Review.id == review_id).first()
+async def update_review(review_id: str, review: ReviewCreate, db: AsyncSession = Depends(get_session),
+                        current_user: User = Depends(get_current_user)):
+    db_review = await book_schema.get_review(db, review_id)
     if db_review is None:
         raise HTTPException(status_code=404, detail="Review not found")
-    return book_schema.update_review(db=db, review_id=review_id, review=review)
+    return await book_schema.update_review(db=db, review_id=review_id, review=review)
 
 
 @router.delete("/reviews/{review_id}")
-def delete_review(review_id: str, db: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    db_review = db.query(Review).join(Book).filter(Review.id == review_id).first()
+async def delete_review(review_id: str, db: AsyncSession = Depends(get_session),
+                        current_user: User = Depends(get_current_user)):
+    db_review = await book_schema.get_review(db, review_id)
     if db_review is None:
         raise HTTPException(status_code=404, detail="Review not found")
-    return book_schema.delete_review(db=db, review_id=review_id)
+    return await book_schema.delete_review(db=db, review_id=review_id)
+
+
+@router.post("/admin/reconcile-ratings")
+async def reconcile_ratings(db: AsyncSession = Depends(get_session),
+                            current_user: User = Depends(get_current_active_admin_user)):
+    books_with_reviews = await book_schema.reconcile_rating_stats(db)
+    return {"books_with_reviews": books_with_reviews}
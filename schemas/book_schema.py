@@ -1,88 +1,393 @@
+from collections import defaultdict
+from typing import List, Optional
 from uuid import uuid4
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update as sqlalchemy_update, delete as sqlalchemy_delete
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, case, func, insert, update as sqlalchemy_update, delete as sqlalchemy_delete
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.attributes import set_committed_value
 
 from db import models
-from schemas.pydantic_models.book_model import BookCreate, ReviewCreate
+from db.database import after_commit, after_commit_async
+from schemas.autocomplete import autocomplete_index
+from schemas.pagination import Page, paginate
+from schemas.recommender import recommender
+from utilities.response_cache import response_cache
+from schemas.pydantic_models.book_model import (BookBatchUpdate, BookCreate, ReviewBatchCreate, ReviewBatchUpdate,
+                                               ReviewCreate)
 
+RATING_COLUMNS = ["review_count", "rating_sum"] + [f"rating_{star}" for star in range(1, 6)]
 
-def get_book(db, book_id: str):
-    result = db.execute(select(models.Book).filter(models.Book.id == book_id))
-    return result.scalars().first()
+
+def book_cache_key(book_id: str) -> str:
+    return f"book:{book_id}"
+
+
+def review_cache_key(review_id: str) -> str:
+    return f"review:{review_id}"
+
+
+def invalidate_cached(db: AsyncSession, keys):
+    keys = list(keys)
+    after_commit_async(db, lambda: response_cache.invalidate(*keys))
+
+
+def select_books(columns=None):
+    # ``columns`` narrows the SELECT to a sparse fieldset; the primary key is always loaded.
+    stmt = select(models.Book)
+    return stmt.options(load_only(*columns)) if columns else stmt
+
+
+async def get_book(db: AsyncSession, book_id: str, with_reviews: bool = True, columns=None):
+    result = await db.execute(select_books(columns).filter(models.Book.id == book_id))
+    book = result.scalars().first()
+    if book is not None and with_reviews:
+        await load_reviews(db, [book])
+    return book
+
+
+async def get_books(db: AsyncSession, cursor: Optional[str] = None, limit: Optional[int] = None,
+                    with_reviews: bool = True, columns=None) -> Page:
+    page = await paginate(db, select_books(columns), (models.Book.title, models.Book.id), cursor, limit)
+    if with_reviews:
+        await load_reviews(db, page.items)
+    return page
+
+
+async def get_book_rows(db: AsyncSession, columns, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    """Book listing as plain rows of ``columns``, skipping ORM identity-map bookkeeping."""
+    return await paginate(db, select(*columns), (models.Book.title, models.Book.id), cursor, limit, scalars=False)
+
+
+async def get_review_rows(db: AsyncSession, book_ids) -> dict:
+    reviews_by_book = defaultdict(list)
+    if book_ids:
+        review_stmt = select(models.Review.id, models.Review.book_id, models.Review.content, models.Review.rating)
+        for review in await db.execute(review_stmt.where(models.Review.book_id.in_(book_ids))):
+            reviews_by_book[review.book_id].append(review)
+    return reviews_by_book
 
 
-def get_books(db):
-    result = db.execute(select(models.Book))
-    books = result.scalars().all()
+async def load_reviews(db: AsyncSession, books):
+    # One grouped fetch for every review of the selected books, so listing
+    # costs two queries no matter how many books come back.
+    if not books:
+        return books
+    review_stmt = select(models.Review).where(models.Review.book_id.in_([book.id for book in books]))
+    reviews_by_book = defaultdict(list)
+    for review in (await db.execute(review_stmt)).scalars():
+        reviews_by_book[review.book_id].append(review)
+    for book in books:
+        set_committed_value(book, "reviews", reviews_by_book[book.id])
     return books
 
 
-def create_book(db: Session, book: BookCreate):
+async def create_book(db: AsyncSession, book: BookCreate):
     db_book = models.Book(**book.dict())
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    await db.flush()
+    after_commit(db, lambda: autocomplete_index.add(db_book.id, db_book.title, db_book.author))
     return db_book
 
 
-def update_book(db, book_id: str, book: BookCreate):
+async def update_book(db: AsyncSession, book_id: str, book: BookCreate):
     stmt = (
         sqlalchemy_update(models.Book)
         .where(models.Book.id == book_id)
-        .values(**book.dict())
+        .values(**book.dict(), version=models.Book.version + 1)
         .execution_options(synchronize_session="fetch")
     )
-    db.execute(stmt)
-    db.commit()
-    return get_book(db, book_id)
+    await db.execute(stmt)
+    after_commit(db, lambda: autocomplete_index.add(book_id, book.title, book.author))
+    invalidate_cached(db, [book_cache_key(book_id)])
+    return await get_book(db, book_id)
 
 
-def delete_book(db, book_id: str):
+async def _review_keys(db: AsyncSession, book_ids) -> List[str]:
+    # Cached reviews outlive their book otherwise: get_review joins Book,
+    # but a cached body is served without running it.
+    result = await db.execute(select(models.Review.id).where(models.Review.book_id.in_(book_ids)))
+    return [review_cache_key(review_id) for review_id in result.scalars()]
+
+
+async def delete_book(db: AsyncSession, book_id: str):
+    review_keys = await _review_keys(db, [book_id])
     stmt = (
         sqlalchemy_delete(models.Book)
         .where(models.Book.id == book_id)
         .execution_options(synchronize_session="fetch")
     )
-    db.execute(stmt)
+    await db.execute(stmt)
+    after_commit(db, lambda: autocomplete_index.remove(book_id))
+    after_commit(db, lambda: recommender.remove_book(book_id))
+    invalidate_cached(db, [book_cache_key(book_id), *review_keys])
     return "book is deleted succesfully"
 
 
-def get_review(db: AsyncSession, review_id: str):
-    result = db.execute(select(models.Review).filter(models.Review.id == review_id))
+async def get_books_by_id(db: AsyncSession, book_ids):
+    result = await db.execute(select(models.Book).where(models.Book.id.in_(book_ids)))
+    return {book.id: book for book in result.scalars()}
+
+
+async def existing_ids(db: AsyncSession, model, ids):
+    if not ids:
+        return set()
+    return set((await db.execute(select(model.id).where(model.id.in_(set(ids))))).scalars())
+
+
+def _index_books(rows):
+    for row in rows:
+        autocomplete_index.add(row["id"], row["title"], row["author"])
+
+
+def _unindex_books(book_ids):
+    for book_id in book_ids:
+        autocomplete_index.remove(book_id)
+        recommender.remove_book(book_id)
+
+
+async def create_books(db: AsyncSession, books: List[BookCreate]) -> List[str]:
+    rows = [{"id": str(uuid4()), **book.dict()} for book in books]
+    if rows:
+        await db.execute(insert(models.Book.__table__), rows)
+        after_commit(db, lambda: _index_books(rows))
+    return [row["id"] for row in rows]
+
+
+async def update_books(db: AsyncSession, books: List[BookBatchUpdate]) -> List[bool]:
+    found = await existing_ids(db, models.Book, [book.id for book in books])
+    rows = [book.dict() for book in books if book.id in found]
+    if rows:
+        table = models.Book.__table__
+        stmt = (
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(title=bindparam("title"), author=bindparam("author"), version=table.c.version + 1)
+        )
+        await db.execute(stmt, [{"b_id": row["id"], "title": row["title"], "author": row["author"]} for row in rows])
+        after_commit(db, lambda: _index_books(rows))
+        invalidate_cached(db, (book_cache_key(row["id"]) for row in rows))
+    return [book.id in found for book in books]
+
+
+async def delete_books(db: AsyncSession, book_ids: List[str]) -> List[bool]:
+    found = await existing_ids(db, models.Book, book_ids)
+    if found:
+        review_keys = await _review_keys(db, found)
+        await db.execute(
+            sqlalchemy_delete(models.Book)
+            .where(models.Book.id.in_(found))
+            .execution_options(synchronize_session=False)
+        )
+        after_commit(db, lambda: _unindex_books(found))
+        invalidate_cached(db, [*(book_cache_key(book_id) for book_id in found), *review_keys])
+    return [book_id in found for book_id in book_ids]
+
+
+async def get_review(db: AsyncSession, review_id: str):
+    result = await db.execute(select(models.Review).join(models.Book).filter(models.Review.id == review_id))
     return result.scalars().first()
 
 
-def get_reviews(db):
-    result = db.execute(select(models.Review))
-    return result.scalars().all()
+async def get_reviews(db: AsyncSession, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    return await paginate(db, select(models.Review).join(models.Book), (models.Review.id,), cursor, limit)
+
+
+async def adjust_rating_stats(db: AsyncSession, book_id: str, rating: int, delta: int):
+    # Applied as a relative UPDATE in the caller's transaction, so concurrent
+    # review writes on the same book cannot lose each other's counts.
+    values = {
+        "review_count": models.Book.review_count + delta,
+        "rating_sum": models.Book.rating_sum + delta * rating,
+        "version": models.Book.version + 1,
+    }
+    if 1 <= rating <= 5:
+        column = getattr(models.Book, f"rating_{rating}")
+        values[column.key] = column + delta
+    stmt = (
+        sqlalchemy_update(models.Book)
+        .where(models.Book.id == book_id)
+        .values(**values)
+        .execution_options(synchronize_session="fetch")
+    )
+    await db.execute(stmt)
+    invalidate_cached(db, [book_cache_key(book_id)])
 
 
-def create_review(db, review: ReviewCreate, book_id: str):
-    db_review = models.Review(**review.dict(), book_id=book_id)
+async def adjust_rating_stats_bulk(db: AsyncSession, changes):
+    """Apply (book_id, rating, delta) changes as one executemany of relative UPDATEs, one row per book."""
+    deltas = {}
+    for book_id, rating, delta in changes:
+        row = deltas.setdefault(book_id, dict.fromkeys(RATING_COLUMNS, 0))
+        row["review_count"] += delta
+        row["rating_sum"] += delta * rating
+        if 1 <= rating <= 5:
+            row[f"rating_{rating}"] += delta
+    if not deltas:
+        return
+    table = models.Book.__table__
+    stmt = (
+        table.update()
+        .where(table.c.id == bindparam("b_id"))
+        .values({**{column: table.c[column] + bindparam(f"d_{column}") for column in RATING_COLUMNS},
+                 "version": table.c.version + 1})
+    )
+    await db.execute(stmt, [{"b_id": book_id, **{f"d_{column}": value for column, value in row.items()}}
+                            for book_id, row in deltas.items()])
+    invalidate_cached(db, (book_cache_key(book_id) for book_id in deltas))
+
+
+async def create_review(db: AsyncSession, review: ReviewCreate, book_id: str, user_id: Optional[str] = None):
+    db_review = models.Review(**review.dict(), book_id=book_id, user_id=user_id)
     db.add(db_review)
-    db.commit()
-    db.refresh(db_review)
+    await db.flush()
+    await adjust_rating_stats(db, book_id, db_review.rating, 1)
+    if user_id is not None:
+        after_commit(db, lambda: recommender.rate(user_id, book_id, db_review.rating))
     return db_review
 
 
-def update_review(db, review_id: str, review: ReviewCreate):
+async def update_review(db: AsyncSession, review_id: str, review: ReviewCreate):
+    previous = (await db.execute(
+        select(models.Review.book_id, models.Review.user_id, models.Review.rating).where(models.Review.id == review_id)
+    )).first()
     stmt = (
         sqlalchemy_update(models.Review)
         .where(models.Review.id == review_id)
-        .values(**review.dict())
+        .values(**review.dict(), version=models.Review.version + 1)
         .execution_options(synchronize_session="fetch")
     )
-    db.execute(stmt)
-    return get_review(db, review_id)
+    await db.execute(stmt)
+    invalidate_cached(db, [review_cache_key(review_id)])
+    if previous is not None and previous.rating != review.rating:
+        await adjust_rating_stats(db, previous.book_id, previous.rating, -1)
+        await adjust_rating_stats(db, previous.book_id, review.rating, 1)
+        if previous.user_id is not None:
+            after_commit(db, lambda: recommender.rate(previous.user_id, previous.book_id, review.rating))
+    elif previous is not None:
+        # The book's response embeds its reviews, so its version still moves.
+        await adjust_rating_stats(db, previous.book_id, review.rating, 0)
+    return await get_review(db, review_id)
 
 
-def delete_review(db, review_id: str):
+async def delete_review(db: AsyncSession, review_id: str):
+    previous = (await db.execute(
+        select(models.Review.book_id, models.Review.user_id, models.Review.rating).where(models.Review.id == review_id)
+    )).first()
     stmt = (
         sqlalchemy_delete(models.Review)
         .where(models.Review.id == review_id)
         .execution_options(synchronize_session="fetch")
     )
-    db.execute(stmt)
+    await db.execute(stmt)
+    invalidate_cached(db, [review_cache_key(review_id)])
+    if previous is not None:
+        await adjust_rating_stats(db, previous.book_id, previous.rating, -1)
+        if previous.user_id is not None:
+            after_commit(db, lambda: recommender.unrate(previous.user_id, previous.book_id))
+
+
+async def _previous_reviews(db: AsyncSession, review_ids):
+    if not review_ids:
+        return {}
+    result = await db.execute(
+        select(models.Review.id, models.Review.book_id, models.Review.user_id, models.Review.rating)
+        .where(models.Review.id.in_(set(review_ids)))
+    )
+    return {row.id: row for row in result}
+
+
+def _rate_all(ratings):
+    for user_id, book_id, rating in ratings:
+        if rating is None:
+            recommender.unrate(user_id, book_id)
+        else:
+            recommender.rate(user_id, book_id, rating)
+
+
+async def create_reviews(db: AsyncSession, reviews: List[ReviewBatchCreate],
+                         user_id: Optional[str] = None) -> List[Optional[str]]:
+    books = await existing_ids(db, models.Book, [review.book_id for review in reviews])
+    rows = [{"id": str(uuid4()), **review.dict(), "user_id": user_id} if review.book_id in books else None
+            for review in reviews]
+    created = [row for row in rows if row is not None]
+    if created:
+        await db.execute(insert(models.Review.__table__), created)
+        await adjust_rating_stats_bulk(db, ((row["book_id"], row["rating"], 1) for row in created))
+        if user_id is not None:
+            after_commit(db, lambda: _rate_all((user_id, row["book_id"], row["rating"]) for row in created))
+    return [row["id"] if row is not None else None for row in rows]
+
+
+async def update_reviews(db: AsyncSession, reviews: List[ReviewBatchUpdate]) -> List[bool]:
+    previous = await _previous_reviews(db, [review.id for review in reviews])
+    rows = [review.dict() for review in reviews if review.id in previous]
+    if rows:
+        table = models.Review.__table__
+        stmt = (
+            table.update()
+            .where(table.c.id == bindparam("r_id"))
+            .values(content=bindparam("content"), rating=bindparam("rating"), version=table.c.version + 1)
+        )
+        await db.execute(stmt, [{"r_id": row["id"], "content": row["content"], "rating": row["rating"]}
+                                for row in rows])
+        invalidate_cached(db, (review_cache_key(row["id"]) for row in rows))
+        # Net out repeated ids so only each review's final rating counts.
+        final = {row["id"]: row["rating"] for row in rows}
+        changes = []
+        for review_id, rating in final.items():
+            old = previous[review_id]
+            if old.rating != rating:
+                changes += [(old.book_id, old.rating, -1), (old.book_id, rating, 1)]
+            else:
+                changes.append((old.book_id, rating, 0))
+        await adjust_rating_stats_bulk(db, changes)
+        after_commit(db, lambda: _rate_all((previous[review_id].user_id, previous[review_id].book_id, rating)
+                                           for review_id, rating in final.items()
+                                           if previous[review_id].user_id is not None))
+    return [review.id in previous for review in reviews]
+
+
+async def delete_reviews(db: AsyncSession, review_ids: List[str]) -> List[bool]:
+    previous = await _previous_reviews(db, review_ids)
+    if previous:
+        await db.execute(
+            sqlalchemy_delete(models.Review)
+            .where(models.Review.id.in_(previous))
+            .execution_options(synchronize_session=False)
+        )
+        invalidate_cached(db, (review_cache_key(review_id) for review_id in previous))
+        await adjust_rating_stats_bulk(db, ((row.book_id, row.rating, -1) for row in previous.values()))
+        after_commit(db, lambda: _rate_all((row.user_id, row.book_id, None) for row in previous.values()
+                                           if row.user_id is not None))
+    return [review_id in previous for review_id in review_ids]
+
+
+async def reconcile_rating_stats(db: AsyncSession):
+    """Recompute every book's rating aggregates from the reviews table in two set-based statements."""
+    columns = RATING_COLUMNS
+    totals = (
+        select(
+            models.Review.book_id.label("book_id"),
+            func.count().label("review_count"),
+            func.coalesce(func.sum(models.Review.rating), 0).label("rating_sum"),
+            *(func.sum(case((models.Review.rating == star, 1), else_=0)).label(f"rating_{star}")
+              for star in range(1, 6)),
+        )
+        .group_by(models.Review.book_id)
+        .subquery()
+    )
+    await db.execute(
+        sqlalchemy_update(models.Book)
+        .values({**{column: 0 for column in columns}, "version": models.Book.version + 1})
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(
+        sqlalchemy_update(models.Book)
+        .where(models.Book.id == totals.c.book_id)
+        .values({column: totals.c[column] for column in columns})
+        .execution_options(synchronize_session=False)
+    )
+    after_commit_async(db, response_cache.clear)
+    return result.rowcount
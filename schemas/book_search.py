@@ -0,0 +1,82 @@
+import re
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import models
+from db.search_index import BOOK_VECTOR, REVIEW_VECTOR
+from schemas import book_schema
+from schemas.pagination import Page, clamp_limit, decode_cursor, encode_cursor
+
+SQLITE_SEARCH = """
+    SELECT id, score, key FROM (
+        SELECT books_fts_ids.book_id AS id, bm25(books_fts, 10.0, 5.0, 1.0) AS score, books_fts.rowid AS key
+        FROM books_fts JOIN books_fts_ids ON books_fts_ids.rowid = books_fts.rowid
+        WHERE books_fts MATCH :query
+    )
+    WHERE :after IS NULL OR score > :score OR (score = :score AND key > :key)
+    ORDER BY score, key
+    LIMIT :limit
+"""
+
+POSTGRES_SEARCH = f"""
+    SELECT id, score, key FROM (
+        SELECT books.id AS id, -ts_rank({BOOK_VECTOR}, q) AS score, books.id AS key
+        FROM books, to_tsquery('simple', :query) AS q
+        WHERE {BOOK_VECTOR} @@ q
+           OR EXISTS (SELECT 1 FROM reviews WHERE reviews.book_id = books.id AND {REVIEW_VECTOR} @@ q)
+    ) AS matches
+    WHERE CAST(:after AS boolean) IS NULL OR score > :score OR (score = :score AND key > :key)
+    ORDER BY score, key
+    LIMIT :limit
+"""
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(query: str) -> List[str]:
+    return _TERM.findall(query.lower())
+
+
+def match_expression(terms: List[str], dialect: str) -> str:
+    # Every term matches as a prefix so results follow the user as they type.
+    if dialect == "postgresql":
+        return " & ".join(f"{term}:*" for term in terms)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+async def search_books(db: AsyncSession, query: str, cursor: Optional[str] = None,
+                       limit: Optional[int] = None, with_reviews: bool = True, columns=None) -> Page:
+    limit = clamp_limit(limit)
+    terms = search_terms(query)
+    if not terms:
+        return Page([], None, None)
+    after = None
+    if cursor:
+        after, direction = decode_cursor(cursor)
+        if direction != "next" or len(after) != 2:
+            raise ValueError("Invalid cursor")
+
+    dialect = db.bind.dialect.name
+    stmt = text(POSTGRES_SEARCH if dialect == "postgresql" else SQLITE_SEARCH)
+    rows = (await db.execute(stmt, {
+        "query": match_expression(terms, dialect),
+        "after": None if after is None else True,
+        "score": None if after is None else after[0],
+        "key": None if after is None else after[1],
+        "limit": limit + 1,
+    })).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    books_by_id = {}
+    if rows:
+        stmt = book_schema.select_books(columns).where(models.Book.id.in_([row.id for row in rows]))
+        result = await db.execute(stmt)
+        books_by_id = {book.id: book for book in result.scalars()}
+    books = [books_by_id[row.id] for row in rows if row.id in books_by_id]
+    if with_reviews:
+        await book_schema.load_reviews(db, books)
+    next_cursor = encode_cursor((rows[-1].score, rows[-1].key), "next") if has_more else None
+    return Page(books, next_cursor, None)
@@ -0,0 +1,85 @@
+from functools import lru_cache
+from typing import FrozenSet, List, NamedTuple, Optional, Type
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+
+from db import models
+from schemas.pydantic_models.book_model import BookResponse
+
+# Columns each BookResponse field reads; id and version are always loaded
+# because every response and ETag needs them.
+BOOK_FIELD_COLUMNS = {
+    "id": [],
+    "title": [models.Book.title],
+    "author": [models.Book.author],
+    "review_count": [models.Book.review_count],
+    "average_rating": [models.Book.review_count, models.Book.rating_sum],
+    "rating_histogram": [getattr(models.Book, f"rating_{star}") for star in range(1, 6)],
+}
+INCLUDES = {"reviews"}
+
+
+class Fieldset(NamedTuple):
+    fields: Optional[FrozenSet[str]]
+    include_reviews: bool
+
+    @property
+    def is_full(self) -> bool:
+        return self.fields is None and self.include_reviews
+
+    @property
+    def variant(self) -> str:
+        if self.is_full:
+            return ""
+        return ",".join(sorted(self.fields or BOOK_FIELD_COLUMNS)) + ("+reviews" if self.include_reviews else "")
+
+    def columns(self, *required) -> List:
+        columns = {models.Book.version: None, **dict.fromkeys(required)}
+        for field in self.fields or BOOK_FIELD_COLUMNS:
+            columns.update(dict.fromkeys(BOOK_FIELD_COLUMNS[field]))
+        return list(columns)
+
+
+FULL = Fieldset(None, True)
+
+
+def parse_fieldset(fields: Optional[str], include: Optional[str]) -> Fieldset:
+    """``?fields=title,author&include=reviews``; neither parameter means the full response."""
+    if fields is None and include is None:
+        return FULL
+    requested = None
+    if fields is not None:
+        requested = frozenset(name.strip() for name in fields.split(",") if name.strip())
+        unknown = requested - BOOK_FIELD_COLUMNS.keys()
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    includes = {name.strip() for name in (include or "").split(",") if name.strip()}
+    if includes - INCLUDES:
+        raise ValueError(f"Unknown include: {', '.join(sorted(includes - INCLUDES))}")
+    return Fieldset(requested, "reviews" in includes)
+
+
+@lru_cache(maxsize=128)
+def book_projection(fieldset: Fieldset) -> Type[BaseModel]:
+    """BookResponse narrowed to the fieldset, so validation only touches loaded attributes."""
+    if fieldset.is_full:
+        return BookResponse
+    names = [name for name in BookResponse.model_fields
+             if name in (fieldset.fields or BOOK_FIELD_COLUMNS) or (name == "reviews" and fieldset.include_reviews)]
+    definitions = {name: (BookResponse.model_fields[name].annotation, BookResponse.model_fields[name])
+                   for name in names}
+    return create_model("BookProjection", __config__=ConfigDict(from_attributes=True), **definitions)
+
+
+@lru_cache(maxsize=128)
+def _list_adapter(fieldset: Fieldset) -> TypeAdapter:
+    return TypeAdapter(List[book_projection(fieldset)])
+
+
+def dump_book(fieldset: Fieldset, book) -> bytes:
+    return book_projection(fieldset).model_validate(book).model_dump_json().encode()
+
+
+def dump_books(fieldset: Fieldset, books) -> bytes:
+    adapter = _list_adapter(fieldset)
+    return adapter.dump_json(adapter.validate_python(books, from_attributes=True))
@@ -0,0 +1,62 @@
+from hashlib import blake2b
+from typing import Iterable
+
+from fastapi import Request, Response
+
+from config import settings
+from schemas.pagination import Page
+
+
+def make_etag(*parts) -> str:
+    digest = blake2b("\x1f".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def row_etag(kind: str, row, variant: str = "") -> str:
+    return make_etag(kind, row.id, row.version, variant)
+
+
+def collection_etag(kind: str, page: Page, variant: str = "") -> str:
+    # The collection version is the page's member (id, version) pairs plus
+    # its cursors: it changes exactly when the serialized page would.
+    members: Iterable = (f"{row.id}:{row.version}" for row in page.items)
+    return make_etag(kind, variant, page.next_cursor, page.prev_cursor, *members)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored.
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+
+def set_cache_headers(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = settings.HTTP_CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_cache_headers(response, etag)
+    return response
+
+
+def pack_response(etag: str, body: bytes) -> bytes:
+    # Cached as one value so the ETag and body can never disagree.
+    return etag.encode() + b"\n" + body
+
+
+def json_response(request: Request, etag: str, body: bytes) -> Response:
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response = Response(content=body, media_type="application/json")
+    set_cache_headers(response, etag)
+    return response
+
+
+def cached_response(request: Request, packed: bytes) -> Response:
+    etag, body = packed.split(b"\n", 1)
+    return json_response(request, etag.decode(), body)
@@ -0,0 +1,75 @@
+import base64
+import json
+from typing import Any, List, NamedTuple, Optional
+
+from sqlalchemy import tuple_
+
+from config import settings
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def encode_cursor(key: tuple, direction: str) -> str:
+    raw = json.dumps({"k": list(key), "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key, direction = tuple(data["k"]), data["d"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if direction not in ("next", "prev"):
+        raise ValueError("Invalid cursor")
+    # Key parts are bound straight into SQL, so only scalars get through.
+    if not all(isinstance(part, (str, int, float)) and not isinstance(part, bool) for part in key):
+        raise ValueError("Invalid cursor")
+    return key, direction
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if limit is None:
+        return settings.PAGE_SIZE_DEFAULT
+    return max(1, min(limit, settings.PAGE_SIZE_MAX))
+
+
+async def paginate(db, stmt, columns, cursor: Optional[str] = None, limit: Optional[int] = None,
+                   scalars: bool = True) -> Page:
+    """Keyset pagination over ``columns``; every page is a bounded index range scan.
+
+    With ``scalars=False`` the page holds Core rows instead of ORM objects.
+    """
+    limit = clamp_limit(limit)
+    key, direction = decode_cursor(cursor) if cursor else (None, "next")
+    if key is not None and len(key) != len(columns):
+        raise ValueError("Invalid cursor")
+
+    position = tuple_(*columns)
+    if direction == "next":
+        if key is not None:
+            stmt = stmt.where(position > tuple_(*key))
+        stmt = stmt.order_by(*columns)
+    else:
+        stmt = stmt.where(position < tuple_(*key)).order_by(*(column.desc() for column in columns))
+
+    result = await db.execute(stmt.limit(limit + 1))
+    rows = result.scalars().all() if scalars else result.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows.reverse()
+
+    def row_key(row):
+        return tuple(getattr(row, column.key) for column in columns)
+
+    has_next = has_more if direction == "next" else key is not None
+    has_prev = key is not None if direction == "next" else has_more
+    next_cursor = encode_cursor(row_key(rows[-1]), "next") if rows and has_next else None
+    prev_cursor = encode_cursor(row_key(rows[0]), "prev") if rows and has_prev else None
+    return Page(rows, next_cursor, prev_cursor)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import List,Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, List, Optional
 
 
 class ReviewBase(BaseModel):
@@ -8,7 +8,7 @@ class ReviewBase(BaseModel):
 
 
 class ReviewCreate(ReviewBase):
-    pass
+    rating: int = Field(ge=1, le=5)
 
 
 class ReviewResponse(ReviewBase):
@@ -27,8 +27,65 @@ class BookCreate(BookBase):
     pass
 
 
+class BookSuggestion(BookBase):
+    id: str
+
+
+class ReviewBatchCreate(ReviewCreate):
+    book_id: str
+
+
+class ReviewBatchUpdate(ReviewCreate):
+    id: str
+
+
+class ReviewBatch(BaseModel):
+    create: List[ReviewBatchCreate] = []
+    update: List[ReviewBatchUpdate] = []
+    delete: List[str] = []
+
+
+class BookBatchUpdate(BookBase):
+    id: str
+
+
+class BookBatch(BaseModel):
+    create: List[BookCreate] = []
+    update: List[BookBatchUpdate] = []
+    delete: List[str] = []
+
+
+class BatchItemResult(BaseModel):
+    op: str
+    index: int
+    id: Optional[str] = None
+    status: str
+
+
+class BookImportError(BaseModel):
+    row: int
+    error: str
+
+
+class BookImportReport(BaseModel):
+    rows: int = 0
+    imported: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    rows_per_second: float = 0.0
+    errors: List[BookImportError] = []
+
+
+class BookRecommendation(BookBase):
+    id: str
+    score: float
+
+
 class BookResponse(BookBase):
     id: str
+    review_count: int = 0
+    average_rating: Optional[float] = None
+    rating_histogram: Dict[int, int] = {}
     reviews: List[ReviewResponse] = []
 
     model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,327 @@
+import asyncio
+import heapq
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import settings
+from db import models
+
+
+class _Model:
+    """One built generation of the recommender; replaced as a whole, never edited after publishing."""
+
+    def __init__(self, matrix, popular, neighbour_idx, neighbour_sim, bound):
+        self.matrix = matrix
+        self.popular = popular
+        self.neighbour_idx = neighbour_idx
+        self.neighbour_sim = neighbour_sim
+        self.bound = bound
+
+
+class _Inputs(NamedTuple):
+    rows: np.ndarray
+    cols: np.ndarray
+    values: np.ndarray
+    removed: frozenset
+    users: int
+    items: int
+    dirty: np.ndarray
+    full: bool
+
+
+class Recommender:
+    """Item-item collaborative filter over the sparse user x book rating matrix.
+
+    Ratings are held as COO triplets so a review write is an O(1) append or
+    in-place update. Each book keeps its ``neighbours`` most cosine-similar
+    books in two dense ``(books, neighbours)`` arrays. Writes only mark the
+    book dirty; the next ``refresh`` recomputes the dirty books' lists, merges
+    their new similarities into everyone else's, and falls back to a full
+    rebuild when most of the catalog is dirty. A user rating the same
+    book twice counts once, with the latest rating.
+
+    A refresh builds a new model from copies of the ratings and swaps it in
+    when done, so ``refresh_async`` can run it on a worker thread while reads
+    keep using the previous model and writes keep landing.
+    """
+
+    def __init__(self, neighbours: int, block_size: int = 1024):
+        self.neighbours = neighbours
+        # Spare slots let most lists absorb a lowered entry without a recompute.
+        self.capacity = 2 * neighbours
+        self.block_size = block_size
+        self._refreshing: Optional[asyncio.Task] = None
+        self._generation = 0
+        self.clear()
+
+    def clear(self):
+        self._users: Dict[str, int] = {}
+        self._items: Dict[str, int] = {}
+        self._item_ids: List[str] = []
+        self._rows = array("i")
+        self._cols = array("i")
+        self._values = array("f")
+        self._positions: Dict[int, int] = {}
+        self._removed: set = set()
+        self._dirty_items: set = set()
+        self._generation += 1
+        self._model = _Model(sparse.csr_matrix((0, 0), dtype=np.float32), np.empty(0, dtype=np.int64),
+                             np.full((0, self.capacity), -1, dtype=np.int32),
+                             np.zeros((0, self.capacity), dtype=np.float32), np.zeros(0, dtype=np.float32))
+
+    def __len__(self):
+        return len(self._item_ids)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty_items)
+
+    def _user_index(self, user_id: str) -> int:
+        index = self._users.get(user_id)
+        if index is None:
+            index = self._users[user_id] = len(self._users)
+        return index
+
+    def _item_index(self, book_id: str) -> int:
+        index = self._items.get(book_id)
+        if index is None:
+            index = self._items[book_id] = len(self._item_ids)
+            self._item_ids.append(book_id)
+        return index
+
+    def rate(self, user_id: str, book_id: str, rating: float):
+        user, item = self._user_index(user_id), self._item_index(book_id)
+        key = (user << 32) | item
+        position = self._positions.get(key)
+        if position is None:
+            self._positions[key] = len(self._values)
+            self._rows.append(user)
+            self._cols.append(item)
+            self._values.append(rating)
+        else:
+            self._values[position] = rating
+        self._dirty_items.add(item)
+
+    def unrate(self, user_id: str, book_id: str):
+        user, item = self._users.get(user_id), self._items.get(book_id)
+        if user is None or item is None:
+            return
+        position = self._positions.get((user << 32) | item)
+        if position is not None:
+            # Zeroed triplets drop out when the matrix is rebuilt.
+            self._values[position] = 0
+            self._dirty_items.add(item)
+
+    def remove_book(self, book_id: str):
+        item = self._items.get(book_id)
+        if item is not None:
+            self._removed.add(item)
+            self._dirty_items.add(item)
+
+    def _take_inputs(self, full: bool) -> _Inputs:
+        # Copies, so later writes cannot touch a build in progress.
+        dirty = np.fromiter(sorted(self._dirty_items), dtype=np.int32)
+        self._dirty_items.clear()
+        return _Inputs(np.array(self._rows, dtype=np.int32), np.array(self._cols, dtype=np.int32),
+                       np.array(self._values, dtype=np.float32), frozenset(self._removed),
+                       len(self._users), len(self._item_ids), dirty, full)
+
+    @staticmethod
+    def _build_matrix(inputs: _Inputs):
+        values = inputs.values
+        if inputs.removed:
+            values = np.where(np.isin(inputs.cols, list(inputs.removed)), 0, values).astype(np.float32)
+        matrix = sparse.csr_matrix((values, (inputs.rows, inputs.cols)), shape=(inputs.users, inputs.items))
+        matrix.eliminate_zeros()
+        return matrix
+
+    def _normalized(self, matrix):
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+        norms[norms == 0] = 1
+        return sparse.csc_matrix(matrix @ sparse.diags(1 / norms).astype(np.float32))
+
+    @staticmethod
+    def _store(model: _Model, item: int, neighbours, scores, bound: float):
+        model.neighbour_idx[item] = -1
+        model.neighbour_sim[item] = 0
+        model.neighbour_idx[item, :len(neighbours)] = neighbours
+        model.neighbour_sim[item, :len(neighbours)] = scores
+        model.bound[item] = bound
+
+    def _compute_neighbours(self, model: _Model, normalized, items: np.ndarray):
+        capacity = self.capacity
+        for start in range(0, len(items), self.block_size):
+            block = items[start:start + self.block_size]
+            similarities = (normalized[:, block].T @ normalized).tocsr()
+            for row, item in enumerate(block):
+                lo, hi = similarities.indptr[row], similarities.indptr[row + 1]
+                candidates = similarities.indices[lo:hi]
+                scores = similarities.data[lo:hi]
+                keep = (candidates != item) & (scores > 0)
+                candidates, scores = candidates[keep], scores[keep]
+                bound = 0.0
+                if len(scores) > capacity:
+                    partition = np.argpartition(-scores, capacity)
+                    bound = scores[partition[capacity]]
+                    candidates, scores = candidates[partition[:capacity]], scores[partition[:capacity]]
+                order = np.argsort(-scores, kind="stable")
+                self._store(model, item, candidates[order], scores[order], bound)
+
+    def _merge_dirty(self, model: _Model, normalized, dirty: np.ndarray) -> List[int]:
+        """Fold the new similarities to ``dirty`` books into every other book's list.
+
+        A rating write only changes its own book's column, so for any other
+        book just the entries pointing at dirty books move. Each list holds
+        up to ``capacity`` entries plus ``bound``, an upper limit on every
+        similarity left out of it. Merged entries above the bound are exact;
+        only a book left with fewer than ``neighbours`` of them is returned
+        for a recompute.
+        """
+        dirty_set = set(dirty.tolist())
+        fresh_by_book = (normalized[:, dirty].T @ normalized).tocsc()
+        # Books whose list holds no dirty entry and whose new dirty similarities
+        # all stay under their bound are unaffected.
+        fresh_max = fresh_by_book.max(axis=0).toarray().ravel()
+        touched = np.isin(model.neighbour_idx, dirty).any(axis=1) | (fresh_max > model.bound)
+        candidates = set(np.flatnonzero(touched).tolist())
+        recompute = []
+        for book in candidates - dirty_set:
+            lo, hi = fresh_by_book.indptr[book], fresh_by_book.indptr[book + 1]
+            merged = {neighbour: score for neighbour, score
+                      in zip(model.neighbour_idx[book].tolist(), model.neighbour_sim[book].tolist())
+                      if neighbour >= 0 and neighbour not in dirty_set}
+            merged.update((neighbour, score) for neighbour, score
+                          in zip(dirty[fresh_by_book.indices[lo:hi]].tolist(), fresh_by_book.data[lo:hi].tolist())
+                          if score > 0)
+            bound = float(model.bound[book])
+            ranked = sorted(merged.items(), key=lambda entry: -entry[1])
+            if len(ranked) > self.capacity:
+                bound = max(bound, ranked[self.capacity][1])
+                ranked = ranked[:self.capacity]
+            exact = [(neighbour, score) for neighbour, score in ranked if score > bound]
+            if bound > 0 and len(exact) < self.neighbours:
+                recompute.append(book)
+                continue
+            self._store(model, book, [neighbour for neighbour, _ in exact], [score for _, score in exact], bound)
+        return recompute
+
+    def _build(self, inputs: _Inputs, previous: _Model) -> Tuple[_Model, int]:
+        """A new model from ``inputs`` and ``previous``; touches no shared state, so it may run on any thread."""
+        matrix = self._build_matrix(inputs)
+        grown = inputs.items - len(previous.neighbour_idx)
+        model = _Model(
+            matrix, None,
+            np.vstack([previous.neighbour_idx, np.full((grown, self.capacity), -1, dtype=np.int32)]),
+            np.vstack([previous.neighbour_sim, np.zeros((grown, self.capacity), dtype=np.float32)]),
+            np.concatenate([previous.bound, np.zeros(grown, dtype=np.float32)]),
+        )
+        counts = np.diff(sparse.csc_matrix(matrix).indptr)
+        model.popular = np.flatnonzero(counts)[np.argsort(-counts[counts > 0], kind="stable")]
+        normalized = self._normalized(matrix)
+        dirty = inputs.dirty
+        if inputs.full or len(dirty) * 2 > inputs.items:
+            self._compute_neighbours(model, normalized, np.arange(inputs.items, dtype=np.int32))
+            return model, inputs.items
+        if not len(dirty):
+            return model, 0
+        self._compute_neighbours(model, normalized, dirty)
+        recompute = np.array(self._merge_dirty(model, normalized, dirty), dtype=np.int32)
+        self._compute_neighbours(model, normalized, recompute)
+        return model, len(dirty) + len(recompute)
+
+    def refresh(self, full: bool = False) -> int:
+        """Bring the neighbour lists up to date; returns how many were recomputed from scratch."""
+        self._generation += 1
+        self._model, recomputed = self._build(self._take_inputs(full), self._model)
+        return recomputed
+
+    async def refresh_async(self, full: bool = False) -> int:
+        """``refresh`` with the build on a worker thread, so the event loop keeps serving."""
+        generation = self._generation
+        inputs = self._take_inputs(full)
+        model, recomputed = await run_in_threadpool(self._build, inputs, self._model)
+        if generation != self._generation:
+            # Cleared or rebuilt meanwhile; the dirty books still need this refresh.
+            self._dirty_items.update(item for item in inputs.dirty.tolist() if item < len(self._item_ids))
+            return 0
+        self._generation += 1
+        self._model = model
+        return recomputed
+
+    async def ensure_fresh(self):
+        """Apply pending writes off the event loop; concurrent callers share one refresh."""
+        if self._refreshing is None:
+            if not self.dirty:
+                return
+            self._refreshing = asyncio.get_running_loop().create_task(self.refresh_async())
+            self._refreshing.add_done_callback(self._refresh_done)
+        await asyncio.shield(self._refreshing)
+
+    def _refresh_done(self, task: asyncio.Task):
+        self._refreshing = None
+
+    def neighbours_of(self, book_id: str) -> List[Tuple[str, float]]:
+        item, model = self._items.get(book_id), self._model
+        if item is None or item >= len(model.neighbour_idx):
+            return []
+        return [(self._item_ids[neighbour], float(score))
+                for neighbour, score in zip(model.neighbour_idx[item, :self.neighbours], model.neighbour_sim[item, :self.neighbours])
+                if neighbour >= 0]
+
+    def recommend(self, user_id: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Top ``limit`` unrated books for the user, scored by similarity-weighted ratings.
+
+        Users without enough history are topped up with the most-rated books.
+        Reads the last built model; call ``refresh`` or ``ensure_fresh`` first
+        to include pending writes.
+        """
+        model = self._model
+        user = self._users.get(user_id)
+        rated = np.empty(0, dtype=np.int32)
+        ranked: List[Tuple[str, float]] = []
+        if user is not None and user < model.matrix.shape[0]:
+            lo, hi = model.matrix.indptr[user], model.matrix.indptr[user + 1]
+            rated = model.matrix.indices[lo:hi]
+            neighbours = model.neighbour_idx[rated, :self.neighbours]
+            weights = model.neighbour_sim[rated, :self.neighbours] * model.matrix.data[lo:hi, None]
+            valid = neighbours >= 0
+            scores = np.bincount(neighbours[valid], weights=weights[valid], minlength=model.matrix.shape[1])
+            scores[rated] = 0
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            ranked = [(self._item_ids[item], float(scores[item])) for item in candidates]
+        if len(ranked) < limit:
+            seen = set(rated.tolist()) | {self._items[book_id] for book_id, _ in ranked}
+            for item in model.popular[:limit + len(seen)]:
+                if len(ranked) >= limit:
+                    break
+                if item not in seen:
+                    ranked.append((self._item_ids[item], 0.0))
+        return ranked
+
+    def load_ratings(self, ratings: Iterable[Tuple[str, str, float]]):
+        self.clear()
+        for user_id, book_id, rating in ratings:
+            self.rate(user_id, book_id, rating)
+        return self.refresh(full=True)
+
+    async def load(self, db: AsyncSession):
+        self.clear()
+        result = await db.stream(
+            select(models.Review.user_id, models.Review.book_id, models.Review.rating)
+            .where(models.Review.user_id.is_not(None), models.Review.rating.is_not(None))
+        )
+        async for user_id, book_id, rating in result:
+            self.rate(user_id, book_id, rating)
+        await self.refresh_async(full=True)
+
+
+recommender = Recommender(neighbours=settings.RECOMMENDER_NEIGHBOURS)
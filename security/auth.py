@@ -1,47 +1,92 @@
-from datetime import datetime, timedelta
+import hashlib
+import time
+from datetime import timedelta
 from typing import Optional
 from pydantic import BaseModel
-from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import event, inspect
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
+from config import settings
 from db.models import User
-from db.database import get_session, get_db
-
-SECRET_KEY = "T%L9:moDI6jv--Ol$(ug8X}Lt5EkwgD,"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+from db.database import after_commit, get_session
+from security.passwords import password_hasher
+from security.tokens import TokenError, token_service
+from utilities.cache import TTLCache
+from utilities.metrics import CallbackCounter, registry
+from utilities.request_stats import current_request_stats
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Verified token claims keyed by a digest of the raw token.
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_TTL_SECONDS)
+
+# Authenticated users by token subject; entries are detached ORM objects.
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAX_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+
+def cache_counters(counter):
+    return lambda: [((name,), getattr(cache, counter)) for name, cache in (("user", user_cache), ("token", token_cache))]
+
+
+registry.register(CallbackCounter("auth_cache_hits_total", "Auth cache hits.", cache_counters("hits"), ("cache",)))
+registry.register(CallbackCounter("auth_cache_misses_total", "Auth cache misses.", cache_counters("misses"), ("cache",)))
 
-def get_user(db: AsyncSession, username: str):
+
+@event.listens_for(Session, "after_flush")
+def invalidate_cached_user(session, flush_context):
+    # Evicted on commit rather than at flush: a request reading the user in
+    # between would otherwise put the old row straight back in the cache.
+    usernames = set()
+    for target in (*session.dirty, *session.deleted):
+        if isinstance(target, User):
+            usernames.add(target.username)
+            usernames.update(inspect(target).attrs.username.history.deleted)
+    if usernames:
+        after_commit(session, lambda: user_cache.invalidate(*usernames))
+
+
+async def get_user(db: AsyncSession, username: str):
     query = select(User).filter(User.username == username)
-    result = db.execute(query)
+    result = await db.execute(query)
     return result.scalars().first()
 
 
-def authenticate_user(db: AsyncSession, username: str, password: str):
-    user = get_user(db, username)
-    if not user or user.password != password:
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user(db, username)
+    if not await password_hasher.verify(password, user.password if user else None):
         return False
+    if password_hasher.needs_rehash(user.password):
+        # Committed with the request; picks up new cost settings and legacy rows.
+        user.password = await password_hasher.hash(password)
     return user
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
+    return token_service.encode(data, expires_delta)
+
+
+def decode_token(token: str) -> dict:
+    # Signature verification runs once per token; later requests carrying the
+    # same cookie reuse the verified claims until the cache entry or exp lapses.
+    # Entries are keyed on the key set too, so rotating out a key stops its
+    # tokens being served from the cache. Callers get a copy of the flat claims.
+    key = (token_service.key_version, hashlib.blake2b(token.encode(), digest_size=16).digest())
+    payload = token_cache.get(key, None)
+    if payload is not None:
+        return dict(payload)
+    payload = token_service.decode(token)
+    ttl = settings.TOKEN_CACHE_TTL_SECONDS
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(key, payload, ttl=ttl)
+    return dict(payload)
+
+
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_session)) -> User:
     token = request.cookies.get("access_token")
     # print(token)
     if token is None:
@@ -51,22 +96,25 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
             headers={"WWW-Authenticate": "Bearer"},
         )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         user_id: str = payload.get("sub")
-        print(user_id)
         if user_id is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials1",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-    except JWTError:
+    except TokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials2",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.query(User).filter(User.username == user_id).first()
+    user = user_cache.get(user_id, None)
+    if user is None:
+        user = await get_user(db, user_id)
+        if user is not None:
+            user_cache.set(user_id, user)
     # print(type(user))
     if user is None:
         raise HTTPException(
@@ -74,6 +122,9 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
             detail="Could not validate credentials3",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.user_id = user.id
     return user
 
 
@@ -93,9 +144,9 @@ def get_current_active_admin_user(current_user: User = Depends(get_current_user)
 
 def verify_token(token: str) -> dict:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         return payload
-    except JWTError:
+    except TokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
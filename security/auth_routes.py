@@ -1,78 +1,41 @@
-import os
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from typing import Dict
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
 
 load_dotenv()
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from jose import jwt
 from datetime import timedelta
 import logging
 from db.models import User
 from schemas.pydantic_models.user_schema import UserCreate
 from db.database import get_session
-from security.auth import authenticate_user, Token
-from utilities.utils import create_access_token
-
-auth_router = APIRouter()
-
-def get_email_config() -> Dict[str, str]:
-    return {
-        "MAIL_USERNAME": os.getenv("MAIL_USERNAME"),
-        "MAIL_PASSWORD": os.getenv("MAIL_PASSWORD"),
-        "MAIL_FROM": os.getenv("MAIL_FROM"),
-        "MAIL_PORT": int(os.getenv("MAIL_PORT")),
-        "MAIL_SERVER": os.getenv("MAIL_SERVER"),
-    }
-
-def send_email(recipient: str, subject: str, html: str):
-    email_config = get_email_config()
-    try:
-        # Setup the MIME
-        message = MIMEMultipart()
-        message["From"] = email_config["MAIL_FROM"]
-        message["To"] = recipient
-        message["Subject"] = subject
-
-        # Attach HTML body
-        message.attach(MIMEText(html, "html"))
-
-        # Connect to SMTP server
-        with smtplib.SMTP(email_config["MAIL_SERVER"], email_config["MAIL_PORT"]) as server:
-            server.starttls()
-            server.login(email_config["MAIL_USERNAME"], email_config["MAIL_PASSWORD"])
-            server.send_message(message)
-    except Exception as e:
-        logging.error(f"Error sending email: {e}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
+from security.auth import authenticate_user, user_cache, Token
+from security.passwords import password_hasher
+from security.tokens import TokenError, token_service
+from utilities.mailer import mail_queue
+from utilities.metrics import MetricsRoute
+
+auth_router = APIRouter(route_class=MetricsRoute)
 
 @auth_router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-def register(user: UserCreate, session=Depends(get_session)):
+async def register(user: UserCreate, session: AsyncSession = Depends(get_session)):
     try:
-        existing_user = session.execute(select(User).filter(User.username == user.username))
+        existing_user = await session.execute(select(User).filter(User.username == user.username))
         if existing_user.scalars().first():
             raise HTTPException(status_code=400, detail="Username already registered")
 
-        password = user.password
+        password = await password_hasher.hash(user.password)
         new_user = User(username=user.username, email=user.email, password=password, is_active=False)
         session.add(new_user)
-        session.commit()
-        session.refresh(new_user)
+        await session.commit()
+        await session.refresh(new_user)
 
         # Create verification token
-        verification_token = create_access_token(
-            data={"sub": user.email},
-            expires_delta=timedelta(hours=24)
-        )
+        verification_token = token_service.encode({"sub": user.email}, expires_delta=timedelta(hours=24))
 
-        # Create and send verification email
+        # Queue the verification email; it is delivered in the background
         verification_link = f"http://127.0.0.1:8080/verify?token={verification_token}"
         html = f"""
         <p>Hi {user.username},</p>
@@ -80,29 +43,29 @@ def register(user: UserCreate, session=Depends(get_session)):
         <p><a href="{verification_link}">{verification_link}</a></p>
         <p>This link will expire in 24 hours.</p>
         """
-        send_email(user.email, "Verify Your Email", html)
+        mail_queue.send_email(user.email, "Verify Your Email", html)
 
         # Create JWT token for further actions
-        access_token = create_access_token(data={"sub": user.username, "role": "user"})
+        access_token = token_service.encode({"sub": user.username, "role": "user"})
         return {"access_token": access_token, "token_type": "bearer"}
 
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         logging.error(f"Registration error: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @auth_router.get("/verify")
-def verify_email(token: str, session=Depends(get_session)):
+async def verify_email(token: str, session: AsyncSession = Depends(get_session)):
     try:
-        payload = jwt.decode(token, os.getenv("SECRET_KEY"), algorithms=[os.getenv("ALGORITHM")])
+        payload = token_service.decode(token)
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=400, detail="Invalid verification token")
-    except jwt.JWTError:
+    except TokenError:
         raise HTTPException(status_code=400, detail="Invalid verification token")
 
-    user = session.execute(select(User).filter(User.email == email))
+    user = await session.execute(select(User).filter(User.email == email))
     user = user.scalars().first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -111,18 +74,23 @@ def verify_email(token: str, session=Depends(get_session)):
         return {"message": "Email already verified"}
 
     user.is_active = True
-    session.commit()
+    await session.commit()
     return {"message": "Email verified successfully"}
 
 
 
 
 
+@auth_router.get("/cache/stats")
+def user_cache_stats():
+    return user_cache.stats()
+
+
 @auth_router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_session)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_session)):
     try:
-        # Authenticate user with plain text password
-        user = authenticate_user(db, form_data.username, form_data.password)
+        # Verify the password hash; outdated hashes are upgraded in passing
+        user = await authenticate_user(db, form_data.username, form_data.password)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -131,7 +99,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
             )
 
         # Create JWT token
-        access_token = create_access_token(data={"sub": user.username, "role": "admin" if user.is_admin else "user"})
+        access_token = token_service.encode({"sub": user.username, "role": "admin" if user.is_admin else "user"})
 
         # Set the token in a cookie
         response = JSONResponse(content={"message": "Login successful"})
@@ -0,0 +1,106 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import sqlalchemy as sa
+
+from config import settings
+
+PREFIX = "scrypt"
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+class PasswordHasher:
+    """scrypt password hashes stored as ``scrypt$n$r$p$salt$hash``.
+
+    Each hash carries its own cost parameters, so changing ``n``/``r``/``p``
+    only affects new hashes; ``needs_rehash`` tells callers which stored
+    hashes to upgrade. hashlib.scrypt releases the GIL, so the async methods
+    run it on a bounded thread pool and the event loop keeps serving requests.
+    """
+
+    def __init__(self, n: int, r: int, p: int, workers: int, salt_bytes: int = 16, key_bytes: int = 32,
+                 accept_plaintext: bool = False):
+        if n < 2 or n & (n - 1):
+            raise ValueError("scrypt n must be a power of two greater than 1")
+        self.n, self.r, self.p = n, r, p
+        self.workers = workers
+        self.salt_bytes = salt_bytes
+        self.key_bytes = key_bytes
+        self.accept_plaintext = accept_plaintext
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _derive(self, password: str, salt: bytes, n: int, r: int, p: int, key_bytes: int) -> bytes:
+        # OpenSSL refuses to allocate past maxmem, which defaults to 32 MiB.
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=key_bytes,
+                              maxmem=128 * r * (n + p + 2) + (1 << 20))
+
+    def hash_sync(self, password: str) -> str:
+        salt = os.urandom(self.salt_bytes)
+        key = self._derive(password, salt, self.n, self.r, self.p, self.key_bytes)
+        return f"{PREFIX}${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(key)}"
+
+    def verify_sync(self, password: str, encoded: Optional[str]) -> bool:
+        if not encoded:
+            # Spend as long as a real check, so timing does not reveal which users exist.
+            self._derive(password, bytes(self.salt_bytes), self.n, self.r, self.p, self.key_bytes)
+            return False
+        if not encoded.startswith(PREFIX + "$"):
+            # The hash_passwords migration hashes legacy plaintext rows; only
+            # a database that has not run it yet needs accept_plaintext, and
+            # such rows are then upgraded on login through needs_rehash.
+            return self.accept_plaintext and hmac.compare_digest(password.encode(), encoded.encode())
+        try:
+            _, n, r, p, salt, key = encoded.split("$")
+            expected = _b64decode(key)
+            actual = self._derive(password, _b64decode(salt), int(n), int(r), int(p), len(expected))
+        except ValueError:
+            return False
+        return hmac.compare_digest(actual, expected)
+
+    def needs_rehash(self, encoded: Optional[str]) -> bool:
+        return not encoded or not encoded.startswith(f"{PREFIX}${self.n}${self.r}${self.p}$")
+
+    def _run(self, function, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.hash_sync, password)
+
+    async def verify(self, password: str, encoded: Optional[str]) -> bool:
+        return await self._run(self.verify_sync, password, encoded)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(n=settings.PASSWORD_SCRYPT_N, r=settings.PASSWORD_SCRYPT_R,
+                                 p=settings.PASSWORD_SCRYPT_P, workers=settings.PASSWORD_HASH_WORKERS,
+                                 accept_plaintext=settings.PASSWORD_ACCEPT_PLAINTEXT)
+
+
+def hash_plaintext_passwords(connection, hasher: PasswordHasher = password_hasher) -> int:
+    """Hash user rows still holding plaintext from before registration hashed them; used by a migration."""
+    users = sa.table("users", sa.column("id", sa.String), sa.column("password", sa.String))
+    plaintext = connection.execute(
+        sa.select(users.c.id, users.c.password)
+        .where(users.c.password.is_not(None), sa.not_(users.c.password.startswith(PREFIX + "$")))
+    ).all()
+    for user_id, password in plaintext:
+        connection.execute(users.update().where(users.c.id == user_id).values(password=hasher.hash_sync(password)))
+    return len(plaintext)
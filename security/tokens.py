@@ -0,0 +1,127 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from datetime import timedelta
+from typing import Dict, Optional
+
+from config import settings
+
+_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+
+class TokenError(Exception):
+    pass
+
+
+class ExpiredTokenError(TokenError):
+    pass
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _dumps(data: dict) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+class TokenService:
+    """HMAC JWT encoder/decoder with keys prepared once and optional ``kid`` rotation.
+
+    ``keys`` maps key ids to secrets; tokens are signed with ``active_kid`` and
+    any listed key is accepted when decoding. ``rotate`` replaces the key set
+    and bumps ``key_version``, which callers caching decoded tokens key on.
+    """
+
+    def __init__(self, keys: Dict[str, str], active_kid: str, algorithm: str = "HS256",
+                 expire_minutes: int = 30):
+        if algorithm not in _DIGESTS:
+            raise ValueError(f"Unsupported algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.expire_minutes = expire_minutes
+        self.key_version = 0
+        self.rotate(keys, active_kid)
+
+    def rotate(self, keys: Dict[str, str], active_kid: str):
+        if active_kid not in keys:
+            raise ValueError(f"Unknown active key id: {active_kid}")
+        digest = _DIGESTS[self.algorithm]
+        signers = {kid: hmac.new(secret.encode(), digestmod=digest) for kid, secret in keys.items()}
+        # The header segment is fixed per key, so it is encoded once and doubles
+        # as a lookup key for the verifier on decode.
+        headers = {kid: _b64encode(_dumps({"alg": self.algorithm, "typ": "JWT", "kid": kid})) for kid in keys}
+        # Swapped in whole, so a concurrent encode or decode sees one key set or the other.
+        self._signers, self._headers = signers, headers
+        self._verifiers = {header: signers[kid] for kid, header in headers.items()}
+        self.active_kid = active_kid
+        self.key_version += 1
+
+    def _sign(self, signer, signing_input: bytes) -> bytes:
+        mac = signer.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, claims: dict, expires_delta: Optional[timedelta] = None) -> str:
+        if expires_delta is None:
+            expires_delta = timedelta(minutes=self.expire_minutes)
+        payload = dict(claims, exp=int(time.time() + expires_delta.total_seconds()))
+        signing_input = self._headers[self.active_kid] + b"." + _b64encode(_dumps(payload))
+        signature = self._sign(self._signers[self.active_kid], signing_input)
+        return (signing_input + b"." + _b64encode(signature)).decode()
+
+    def _verifier_for(self, header_segment: bytes):
+        signer = self._verifiers.get(header_segment)
+        if signer is not None:
+            return signer
+        # Tokens without a kid (or with a differently serialised header) fall
+        # back to a parsed header; only the configured algorithm is accepted.
+        try:
+            header = json.loads(_b64decode(header_segment))
+        except ValueError:
+            raise TokenError("Invalid token header")
+        if not isinstance(header, dict) or header.get("alg") != self.algorithm:
+            raise TokenError("Invalid token algorithm")
+        kid = header.get("kid", self.active_kid)
+        signer = self._signers.get(kid) if isinstance(kid, str) else None
+        if signer is None:
+            raise TokenError("Unknown signing key")
+        return signer
+
+    def decode(self, token: str) -> dict:
+        try:
+            raw = token.encode("ascii")
+            signing_input, signature = raw.rsplit(b".", 1)
+            header_segment, payload_segment = signing_input.split(b".")
+            signature = _b64decode(signature)
+        except ValueError:
+            raise TokenError("Malformed token")
+        signer = self._verifier_for(header_segment)
+        if not hmac.compare_digest(self._sign(signer, signing_input), signature):
+            raise TokenError("Signature verification failed")
+        try:
+            payload = json.loads(_b64decode(payload_segment))
+        except ValueError:
+            raise TokenError("Invalid token payload")
+        if not isinstance(payload, dict):
+            raise TokenError("Invalid token payload")
+        exp = payload.get("exp")
+        if exp is not None:
+            if not isinstance(exp, (int, float)):
+                raise TokenError("Invalid exp claim")
+            if exp <= time.time():
+                raise ExpiredTokenError("Token has expired")
+        return payload
+
+
+token_service = TokenService(
+    keys={settings.JWT_ACTIVE_KID: settings.SECRET_KEY, **settings.JWT_PREVIOUS_KEYS},
+    active_kid=settings.JWT_ACTIVE_KID,
+    algorithm=settings.ALGORITHM,
+    expire_minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES,
+)
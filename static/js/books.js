@@ -2,6 +2,19 @@ document.addEventListener("DOMContentLoaded", function () {
     // Load books when the page loads
     loadBooks();
 
+    // The listing is paginated; fetch the next page on demand
+    document.getElementById("loadMoreBooks").addEventListener("click", function () {
+        loadBooks(nextBooksCursor);
+    });
+
+    // Suggest titles as the user types in the search box
+    const searchInput = document.getElementById("bookSearch");
+    let suggestTimer = null;
+    searchInput.addEventListener("input", function () {
+        clearTimeout(suggestTimer);
+        suggestTimer = setTimeout(() => loadSuggestions(searchInput.value), 100);
+    });
+
     // Handle book form submission
     document.getElementById("bookForm").addEventListener("submit", async function (event) {
         event.preventDefault();
@@ -34,13 +47,22 @@ document.addEventListener("DOMContentLoaded", function () {
     });
 });
 
-async function loadBooks() {
+// Cursor for the next page of books, from the X-Next-Cursor header; null on the last page
+let nextBooksCursor = null;
+
+async function loadBooks(cursor = null) {
     try {
-        const response = await fetch("/books/books/books/");
+        const params = new URLSearchParams({ fields: "id,title,author" });
+        if (cursor) {
+            params.set("cursor", cursor);
+        }
+        const response = await fetch(`/books/books/books/?${params}`);
         if (response.ok) {
             const books = await response.json();
             const bookList = document.getElementById("bookList");
-            bookList.innerHTML = "";  // Clear the list
+            if (!cursor) {
+                bookList.innerHTML = "";  // Clear the list when starting from the first page
+            }
 
             books.forEach(book => {
                 const li = document.createElement("li");
@@ -57,6 +79,9 @@ async function loadBooks() {
                 li.appendChild(viewLink);
                 bookList.appendChild(li);
             });
+
+            nextBooksCursor = response.headers.get("X-Next-Cursor");
+            document.getElementById("loadMoreBooks").hidden = !nextBooksCursor;
         } else {
             console.error("Failed to load books");
         }
@@ -65,6 +90,29 @@ async function loadBooks() {
     }
 }
 
+async function loadSuggestions(query) {
+    const datalist = document.getElementById("bookSuggestions");
+    if (!query.trim()) {
+        datalist.innerHTML = "";
+        return;
+    }
+    try {
+        const response = await fetch(`/books/autocomplete?q=${encodeURIComponent(query)}`);
+        if (response.ok) {
+            const suggestions = await response.json();
+            datalist.innerHTML = "";
+            suggestions.forEach(book => {
+                const option = document.createElement("option");
+                option.value = book.title;
+                option.label = book.author;
+                datalist.appendChild(option);
+            });
+        }
+    } catch (error) {
+        console.error("Error loading suggestions:", error);
+    }
+}
+
 async function viewBookDetails(bookId) {
     try {
         const response = await fetch(`/books/books/${bookId}`);
@@ -151,34 +199,3 @@ async function deleteBook(bookId) {
         }
     }
 }
-
-async function loadBooks() {
-    try {
-        const response = await fetch("/books/read/books/");
-        if (response.ok) {
-            const books = await response.json();
-            const bookList = document.getElementById("bookList");
-            bookList.innerHTML = "";  // Clear the list
-
-            books.forEach(book => {
-                const li = document.createElement("li");
-                li.textContent = `${book.title} by ${book.author}`;
-
-                // Add a link to view book details
-                const viewLink = document.createElement("a");
-                viewLink.href = "#";
-                viewLink.textContent = " View Details";
-                viewLink.addEventListener("click", function () {
-                    viewBookDetails(book.id);
-                });
-
-                li.appendChild(viewLink);
-                bookList.appendChild(li);
-            });
-        } else {
-            console.error("Failed to load books");
-        }
-    } catch (error) {
-        console.error("Error loading books:", error);
-    }
-}
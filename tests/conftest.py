@@ -0,0 +1,99 @@
+import asyncio
+import os
+
+os.environ.setdefault("MAIL_TRANSPORT", "memory")
+# Cheap scrypt parameters keep the suite fast; tests/test_passwords.py covers the real ones.
+os.environ.setdefault("PASSWORD_SCRYPT_N", "1024")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from db import database
+from db.models import Base, Book, Review, User
+from db.search_index import create_search_index
+import middleware
+from main import app
+from schemas.autocomplete import autocomplete_index
+from schemas.recommender import recommender
+from utilities.response_cache import response_cache
+from security.auth import create_access_token, token_cache, user_cache
+from security.passwords import password_hasher
+
+
+@pytest.fixture(autouse=True, scope="session")
+def log_files(tmp_path_factory):
+    # Keep the request and access logs out of the working tree.
+    directory = tmp_path_factory.mktemp("logs")
+    for handler, name in ((middleware._file_handler, "api_requests.log"), (middleware._access_handler, "access.log")):
+        handler.close()
+        handler.baseFilename = str(directory / name)
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'test.db'}"
+
+
+@pytest.fixture
+def session_factory(database_url):
+    # Synchronous sessions on the same file, for seeding and assertions.
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        create_search_index(conn)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def seed_catalog(session_factory):
+    """``seed_catalog(books, reviews_per_book)``; reviews bypass the rating aggregates."""
+    def seed(books, reviews_per_book):
+        with session_factory() as db:
+            for i in range(books):
+                book = Book(title=f"Book {i:05d}", author=f"Author {i % 7}")
+                book.reviews = [Review(content=f"Review {j}", rating=j % 5 + 1) for j in range(reviews_per_book)]
+                db.add(book)
+            db.commit()
+    return seed
+
+
+@pytest.fixture
+def engine(database_url, session_factory):
+    engine = create_async_engine(database_url.replace("sqlite://", "sqlite+aiosqlite://"), poolclass=NullPool)
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def statements(engine):
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def api_client(engine, session_factory, monkeypatch):
+    database.instrument_engine(engine)
+    user_cache.clear()
+    token_cache.clear()
+    autocomplete_index.clear()
+    recommender.clear()
+    asyncio.run(response_cache.clear())
+    monkeypatch.setattr(database, "SessionLocal", async_sessionmaker(engine, class_=database.CommitHookSession,
+                                                                      autoflush=False, expire_on_commit=False))
+    with session_factory() as db:
+        db.add(User(username="tester", email="tester@example.com", password=password_hasher.hash_sync("secret"), is_active=True))
+        db.commit()
+    client = TestClient(app)
+    client.cookies.set("access_token", create_access_token(data={"sub": "tester"}))
+    yield client
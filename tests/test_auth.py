@@ -0,0 +1,91 @@
+import time
+from datetime import timedelta
+
+import pytest
+
+from db.models import User
+from security.auth import create_access_token, decode_token, token_cache, user_cache
+from security.tokens import TokenError, TokenService
+
+
+def user_lookups(statements):
+    return [statement for statement in statements if "FROM users" in statement]
+
+
+def test_current_user_is_cached_between_requests(api_client, statements):
+    api_client.get("/books/reviews/")
+    api_client.get("/books/reviews/")
+    assert len(user_lookups(statements)) == 1
+    assert user_cache.stats()["hits"] == 1
+
+
+def test_user_update_invalidates_cache(api_client, session_factory, statements):
+    api_client.get("/books/reviews/")
+    with session_factory() as db:
+        db.query(User).filter_by(username="tester").one().is_active = False
+        db.commit()
+    assert len(user_cache) == 0
+
+    api_client.get("/books/reviews/")
+    assert len(user_lookups(statements)) == 2
+
+
+def test_read_between_flush_and_commit_does_not_outlive_the_commit(api_client, session_factory):
+    with session_factory() as db:
+        db.query(User).filter_by(username="tester").one().is_active = False
+        db.flush()
+        # Another request still sees the committed row and caches it.
+        assert api_client.get("/books/reviews/").status_code == 200
+        assert len(user_cache) == 1
+        db.commit()
+    assert len(user_cache) == 0
+    api_client.get("/books/reviews/")
+    assert user_cache.get("tester").is_active is False
+
+
+def test_unknown_subject_is_not_cached(api_client):
+    api_client.cookies.set("access_token", create_access_token(data={"sub": "ghost"}))
+    misses = token_cache.misses
+    assert api_client.get("/books/reviews/").status_code == 401
+    assert token_cache.misses == misses + 1
+    assert len(user_cache) == 0
+
+
+def test_decode_cache_entry_expires_with_token(api_client, monkeypatch):
+    api_client.cookies.set("access_token", create_access_token(data={"sub": "tester"}, expires_delta=timedelta(seconds=2)))
+    assert api_client.get("/books/reviews/").status_code == 200
+    assert len(token_cache) == 1
+
+    later = time.monotonic() + 5
+    monkeypatch.setattr("utilities.cache.time.monotonic", lambda: later)
+    misses = token_cache.misses
+    api_client.get("/books/reviews/")
+    assert token_cache.misses == misses + 1
+
+
+def test_repeated_decodes_hit_the_cache():
+    token = create_access_token(data={"sub": "tester"})
+    token_cache.clear()
+    hits, misses = token_cache.hits, token_cache.misses
+    for _ in range(5):
+        assert decode_token(token)["sub"] == "tester"
+    assert token_cache.misses - misses == 1
+    assert token_cache.hits - hits == 4
+
+
+def test_cached_claims_cannot_be_modified_by_callers():
+    token = create_access_token(data={"sub": "tester"})
+    decode_token(token)["sub"] = "admin"
+    assert decode_token(token)["sub"] == "tester"
+
+
+def test_rotating_keys_stops_serving_cached_tokens(monkeypatch):
+    service = TokenService({"old": "old-secret-old-secret-old-secret"}, active_kid="old")
+    monkeypatch.setattr("security.auth.token_service", service)
+    token = create_access_token(data={"sub": "tester"})
+    assert decode_token(token)["sub"] == "tester"
+
+    service.rotate({"new": "new-secret-new-secret-new-secret"}, active_kid="new")
+    with pytest.raises(TokenError):
+        decode_token(token)
+    assert decode_token(create_access_token(data={"sub": "tester"}))["sub"] == "tester"
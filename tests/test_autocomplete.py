@@ -0,0 +1,67 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from db.models import Book
+from schemas.autocomplete import AutocompleteIndex, autocomplete_index
+
+
+def build_index(**kwargs):
+    index = AutocompleteIndex(max_books=100, **kwargs)
+    index.add("1", "Dune", "Frank Herbert")
+    index.add("2", "Dune Messiah", "Frank Herbert")
+    index.add("3", "Neuromancer", "William Gibson")
+    index.add("4", "The Left Hand of Darkness", "Ursula K. Le Guin")
+    return index
+
+
+def ids(suggestions):
+    return [book_id for book_id, _, _ in suggestions]
+
+
+def test_prefix_and_multi_word_suggestions():
+    index = build_index()
+    assert ids(index.suggest("du")) == ["1", "2"]
+    assert ids(index.suggest("dune mes")) == ["2"]
+    assert ids(index.suggest("gibs")) == ["3"]
+    assert index.suggest("   ") == []
+
+
+def test_typo_tolerance():
+    index = build_index()
+    assert ids(index.suggest("nueromancer")) == ["3"]
+    assert ids(index.suggest("darknes")) == ["4"]
+    assert ids(index.suggest("herbret")) == ["1", "2"]
+    assert index.suggest("zzzzzz") == []
+
+
+def test_updates_removals_and_capacity():
+    index = build_index()
+    index.add("1", "Children of Dune", "Frank Herbert")
+    assert ids(index.suggest("children")) == ["1"]
+    for book_id in ("1", "2", "3"):
+        index.remove(book_id)
+    assert len(index) == 1 and index.suggest("dune") == []
+    assert ids(index.suggest("left")) == ["4"]
+
+    small = AutocompleteIndex(max_books=1)
+    assert small.add("1", "One", "A") and not small.add("2", "Two", "B")
+
+
+def test_autocomplete_endpoint_follows_committed_writes(api_client, session_factory, engine):
+    with session_factory() as db:
+        db.add(Book(title="Foundation", author="Isaac Asimov"))
+        db.commit()
+
+    async def load():
+        async with async_sessionmaker(engine)() as db:
+            await autocomplete_index.load(db)
+
+    asyncio.run(load())
+    api_client.post("/books/books/", json={"title": "Foundation and Empire", "author": "Isaac Asimov"})
+    titles = [s["title"] for s in api_client.get("/books/autocomplete", params={"q": "foundat"}).json()]
+    assert titles == ["Foundation", "Foundation and Empire"]
+
+    book_id = api_client.get("/books/autocomplete", params={"q": "empire"}).json()[0]["id"]
+    api_client.delete(f"/books/books/{book_id}")
+    assert api_client.get("/books/autocomplete", params={"q": "empire"}).json() == []
@@ -0,0 +1,197 @@
+from db import database
+from db.models import Book, Review
+from schemas.pagination import encode_cursor
+
+
+def test_read_books_returns_reviews(api_client, seed_catalog):
+    seed_catalog(books=3, reviews_per_book=2)
+    response = api_client.get("/books/books/books/")
+    assert response.status_code == 200
+    books = response.json()
+    assert len(books) == 3
+    assert all(len(book["reviews"]) == 2 for book in books)
+    assert all(review["book_id"] == book["id"] for book in books for review in book["reviews"])
+
+
+def test_read_books_query_count_is_constant(api_client, seed_catalog, statements):
+    seed_catalog(books=5, reviews_per_book=1)
+    api_client.get("/books/reviews/")
+    statements.clear()
+    api_client.get("/books/books/books/", params={"limit": 500})
+    small = len(statements)
+
+    seed_catalog(books=200, reviews_per_book=3)
+    statements.clear()
+    response = api_client.get("/books/books/books/", params={"limit": 500})
+    assert len(response.json()) == 205
+    assert len(statements) == small
+
+
+def test_read_books_keyset_pages(api_client, seed_catalog):
+    seed_catalog(books=7, reviews_per_book=0)
+    first = api_client.get("/books/books/books/", params={"limit": 3})
+    assert [book["title"] for book in first.json()] == ["Book 00000", "Book 00001", "Book 00002"]
+    assert "X-Prev-Cursor" not in first.headers
+
+    second = api_client.get("/books/books/books/", params={"limit": 3, "cursor": first.headers["X-Next-Cursor"]})
+    assert [book["title"] for book in second.json()] == ["Book 00003", "Book 00004", "Book 00005"]
+
+    last = api_client.get("/books/books/books/", params={"limit": 3, "cursor": second.headers["X-Next-Cursor"]})
+    assert [book["title"] for book in last.json()] == ["Book 00006"]
+    assert "X-Next-Cursor" not in last.headers
+
+    back = api_client.get("/books/books/books/", params={"limit": 3, "cursor": last.headers["X-Prev-Cursor"]})
+    assert back.json() == second.json()
+
+
+def test_read_reviews_pages_and_rejects_bad_cursor(api_client, seed_catalog):
+    seed_catalog(books=1, reviews_per_book=5)
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = api_client.get("/books/reviews/", params=params)
+        seen.extend(review["id"] for review in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert len(seen) == 5 and seen == sorted(seen)
+
+    response = api_client.get("/books/reviews/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    for key in ([{"a": 1}, "x"], [["nested"], "x"]):
+        cursor = encode_cursor(tuple(key), "next")
+        assert api_client.get("/books/books/books/", params={"cursor": cursor}).status_code == 400
+    assert api_client.get("/books/reviews/", params={"cursor": encode_cursor(([1],), "next")}).status_code == 400
+
+
+def test_book_and_review_crud(api_client):
+    created = api_client.post("/books/books/", json={"title": "Dune", "author": "Herbert"})
+    assert created.status_code == 200
+    book_id = api_client.get("/books/books/books/").json()[0]["id"]
+
+    review = api_client.post(f"/books/books/{book_id}/reviews/", json={"content": "Great", "rating": 5})
+    assert review.status_code == 200
+    review_id = review.json()["id"]
+
+    updated = api_client.put(f"/books/books/{book_id}", json={"title": "Dune Messiah", "author": "Herbert"})
+    assert updated.json()["title"] == "Dune Messiah"
+    assert [r["id"] for r in updated.json()["reviews"]] == [review_id]
+
+    assert api_client.put(f"/books/reviews/{review_id}", json={"content": "Fine", "rating": 3}).json()["rating"] == 3
+    assert api_client.delete(f"/books/reviews/{review_id}").status_code == 200
+    assert api_client.get(f"/books/reviews/{review_id}").status_code == 404
+
+    assert api_client.delete(f"/books/books/{book_id}").status_code == 200
+    assert api_client.get(f"/books/books/{book_id}").status_code == 404
+
+
+def test_request_uses_one_session_and_one_checkout(api_client, seed_catalog):
+    seed_catalog(books=1, reviews_per_book=1)
+    book_id = api_client.get("/books/books/books/").json()[0]["id"]
+
+    database.pool_metrics.reset()
+    api_client.get(f"/books/books/{book_id}")
+    api_client.put(f"/books/books/{book_id}", json={"title": "Renamed", "author": "Someone"})
+    assert database.pool_metrics.checkouts_per_request == {1: 2}
+
+
+def test_failed_request_rolls_back(api_client, session_factory):
+    response = api_client.post("/books/books/missing/reviews/", json={"content": "Orphan", "rating": 1})
+    assert response.status_code == 404
+    with session_factory() as db:
+        assert db.query(Review).count() == 0
+
+
+def test_rating_aggregates_follow_review_writes(api_client):
+    api_client.post("/books/books/", json={"title": "Dune", "author": "Herbert"})
+    book_id = api_client.get("/books/books/books/").json()[0]["id"]
+
+    first = api_client.post(f"/books/books/{book_id}/reviews/", json={"content": "Great", "rating": 5}).json()
+    api_client.post(f"/books/books/{book_id}/reviews/", json={"content": "Meh", "rating": 2})
+    book = api_client.get(f"/books/books/{book_id}").json()
+    assert (book["review_count"], book["average_rating"]) == (2, 3.5)
+    assert book["rating_histogram"] == {"1": 0, "2": 1, "3": 0, "4": 0, "5": 1}
+
+    api_client.put(f"/books/reviews/{first['id']}", json={"content": "Fine", "rating": 3})
+    assert api_client.get(f"/books/books/{book_id}").json()["rating_histogram"]["3"] == 1
+
+    api_client.delete(f"/books/reviews/{first['id']}")
+    book = api_client.get(f"/books/books/{book_id}").json()
+    assert (book["review_count"], book["average_rating"]) == (1, 2.0)
+    assert book["rating_histogram"] == {"1": 0, "2": 1, "3": 0, "4": 0, "5": 0}
+
+    invalid = api_client.post(f"/books/books/{book_id}/reviews/", json={"content": "Wow", "rating": 6})
+    assert invalid.status_code == 422
+
+
+def test_reconcile_ratings_repairs_drift(api_client, session_factory, seed_catalog):
+    from db.models import User
+    from security.auth import user_cache
+
+    # seed_catalog writes reviews directly, so the aggregates start out stale.
+    seed_catalog(books=2, reviews_per_book=5)
+    assert api_client.get("/books/books/books/").json()[0]["review_count"] == 0
+    assert api_client.post("/books/admin/reconcile-ratings").status_code == 403
+
+    with session_factory() as db:
+        db.query(User).filter_by(username="tester").update({"is_admin": True})
+        db.commit()
+    user_cache.clear()
+
+    response = api_client.post("/books/admin/reconcile-ratings")
+    assert response.json() == {"books_with_reviews": 2}
+    for book in api_client.get("/books/books/books/").json():
+        assert (book["review_count"], book["average_rating"]) == (5, 3.0)
+        assert book["rating_histogram"] == {str(star): 1 for star in range(1, 6)}
+
+
+def test_book_batch_runs_in_one_transaction(api_client, session_factory, seed_catalog, statements):
+    seed_catalog(books=3, reviews_per_book=0)
+    existing = [book["id"] for book in api_client.get("/books/books/books/").json()]
+
+    statements.clear()
+    response = api_client.post("/books/books/batch", json={
+        "create": [{"title": f"New {i}", "author": "Batch"} for i in range(50)],
+        "update": [{"id": existing[0], "title": "Renamed", "author": "Batch"},
+                   {"id": "missing", "title": "Nope", "author": "Nobody"}],
+        "delete": [existing[1], "missing"],
+    })
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["status"] for result in results[50:]] == ["updated", "not_found", "deleted", "not_found"]
+    assert all(result["status"] == "created" for result in results[:50])
+    writes = [s for s in statements if s.split()[0] in ("INSERT", "UPDATE", "DELETE")]
+    assert len(writes) == 3
+    assert sum(s.startswith("COMMIT") for s in statements) <= 1
+
+    with session_factory() as db:
+        assert db.query(Book).count() == 52
+        assert db.get(Book, existing[0]).title == "Renamed"
+
+    too_many = {"delete": ["x"] * 1001}
+    assert api_client.post("/books/books/batch", json=too_many).status_code == 413
+
+
+def test_review_batch_keeps_rating_aggregates(api_client, seed_catalog):
+    seed_catalog(books=2, reviews_per_book=0)
+    first, second = [book["id"] for book in api_client.get("/books/books/books/").json()]
+
+    created = api_client.post("/books/reviews/batch", json={"create": [
+        {"book_id": first, "content": "A", "rating": 5},
+        {"book_id": first, "content": "B", "rating": 3},
+        {"book_id": second, "content": "C", "rating": 1},
+        {"book_id": "missing", "content": "D", "rating": 4},
+    ]}).json()
+    assert [result["status"] for result in created] == ["created"] * 3 + ["not_found"]
+    review_ids = [result["id"] for result in created]
+
+    response = api_client.post("/books/reviews/batch", json={
+        "update": [{"id": review_ids[1], "content": "B+", "rating": 4}],
+        "delete": [review_ids[2]],
+    })
+    assert [result["status"] for result in response.json()] == ["updated", "deleted"]
+
+    books = {book["id"]: book for book in api_client.get("/books/books/books/").json()}
+    assert (books[first]["review_count"], books[first]["average_rating"]) == (2, 4.5)
+    assert books[first]["rating_histogram"] == {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1}
+    assert (books[second]["review_count"], books[second]["average_rating"]) == (0, None)
@@ -0,0 +1,120 @@
+import gzip
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.testclient import TestClient
+
+from compression_middleware import CompressionMiddleware
+from utilities.compression import negotiate_encoding
+from utilities import static_assets
+from utilities.static_assets import AssetFiles, precompress_directory
+
+
+def raw_get(client, url, **headers):
+    # Read the body as sent, without httpx transparently decoding it.
+    with client.stream("GET", url, headers=headers) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, deflate", ("br", "gzip")) == "gzip"
+    assert negotiate_encoding("br;q=0.5, gzip", ("br", "gzip")) == "br"
+    assert negotiate_encoding("br;q=0, *", ("br", "gzip")) == "gzip"
+    assert negotiate_encoding("identity", ("br", "gzip")) is None
+
+
+def test_middleware_threshold_allowlist_and_streaming():
+    async def chunks():
+        for _ in range(50):
+            yield b'{"line": "repeated ndjson line"}\n'
+
+    app = Starlette(routes=[
+        Route("/big", lambda request: Response(b"x" * 2000, media_type="application/json",
+                                               headers={"ETag": '"abc"'})),
+        Route("/small", lambda request: PlainTextResponse("tiny")),
+        Route("/binary", lambda request: Response(b"x" * 2000, media_type="application/octet-stream")),
+        Route("/stream", lambda request: StreamingResponse(chunks(), media_type="application/x-ndjson")),
+    ])
+    client = TestClient(CompressionMiddleware(app, minimum_size=1000))
+
+    response, body = raw_get(client, "/big", **{"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"abc"'
+    assert int(response.headers["content-length"]) == len(body)
+    assert gzip.decompress(body) == b"x" * 2000
+
+    response, body = raw_get(client, "/small", **{"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers and body == b"tiny"
+    response, _ = raw_get(client, "/binary", **{"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    response, _ = raw_get(client, "/big", **{"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+    response, body = raw_get(client, "/stream", **{"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip" and "content-length" not in response.headers
+    assert gzip.decompress(body).count(b"\n") == 50
+
+
+def test_book_listing_is_compressed(api_client, seed_catalog):
+    seed_catalog(books=20, reviews_per_book=2)
+    response = api_client.get("/books/books/books/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 20
+    etag = response.headers["etag"]
+    assert api_client.get("/books/books/books/", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_hashed_assets_are_precompressed_and_immutable(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "site.css").write_text("body { color: black; }\n" * 100)
+    files = AssetFiles(directory=str(tmp_path), precompress_assets=True)
+    assert (tmp_path / "css" / "site.css.gz").exists()
+
+    hashed = files.asset_path("/css/site.css")
+    assert hashed.startswith("css/site.") and hashed.endswith(".css") and hashed != "css/site.css"
+    assert files.asset_path("js/missing.js") == "js/missing.js"
+
+    client = TestClient(Starlette(routes=[Mount("/static", files)]))
+    response, body = raw_get(client, f"/static/{hashed}", **{"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/css")
+    assert "immutable" in response.headers["cache-control"]
+    assert gzip.decompress(body) == (tmp_path / "css" / "site.css").read_bytes()
+
+    response, body = raw_get(client, f"/static/{hashed}", **{"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert body == (tmp_path / "css" / "site.css").read_bytes()
+    assert "immutable" not in client.get("/static/css/site.css").headers.get("cache-control", "")
+
+
+def test_assets_are_compressed_on_the_fly_without_siblings(tmp_path, monkeypatch):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "site.css").write_text("body { color: black; }\n" * 100)
+
+    def read_only(path):
+        raise PermissionError(f"read-only file system: {path}")
+
+    monkeypatch.setattr(static_assets, "precompress", read_only)
+    files = AssetFiles(directory=str(tmp_path), precompress_assets=True)
+    assert AssetFiles(directory=str(tmp_path)).manifest == files.manifest
+    assert not (tmp_path / "css" / "site.css.gz").exists()
+
+    client = TestClient(CompressionMiddleware(Starlette(routes=[Mount("/static", files)]), minimum_size=1000))
+    response, body = raw_get(client, f"/static/{files.asset_path('css/site.css')}", **{"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body) == (tmp_path / "css" / "site.css").read_bytes()
+
+
+def test_precompress_directory_is_a_build_step(tmp_path):
+    (tmp_path / "js").mkdir()
+    (tmp_path / "js" / "app.js").write_text("console.log('hi');\n" * 100)
+    assert precompress_directory(str(tmp_path)) == 1
+    assert gzip.decompress((tmp_path / "js" / "app.js.gz").read_bytes()) == (tmp_path / "js" / "app.js").read_bytes()
+    assert precompress_directory(str(tmp_path)) == 1
+
+
+def test_pages_link_hashed_assets(api_client):
+    from main import static_files
+    assert static_files.asset_path("css/styles.css") in api_client.get("/login").text
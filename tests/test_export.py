@@ -0,0 +1,32 @@
+import csv
+import gzip
+import io
+import json
+
+
+def test_ndjson_export_groups_reviews_by_book(api_client, seed_catalog, monkeypatch):
+    from config import settings
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "EXPORT_FLUSH_BYTES", 100)
+    seed_catalog(books=5, reviews_per_book=3)
+    seed_catalog(books=1, reviews_per_book=0)
+
+    response = api_client.get("/books/books/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    books = [json.loads(line) for line in response.text.splitlines()]
+    assert len(books) == 6
+    assert len({book["id"] for book in books}) == 6
+    assert sorted(len(book["reviews"]) for book in books) == [0, 3, 3, 3, 3, 3]
+
+
+def test_gzipped_csv_export(api_client, seed_catalog):
+    seed_catalog(books=2, reviews_per_book=2)
+    response = api_client.get("/books/books/export", params={"format": "csv", "gzip": "true"})
+    assert response.headers["content-type"] == "application/gzip"
+    assert 'filename="catalog.csv.gz"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.content).decode())))
+    assert len(rows) == 4
+    assert {row["title"] for row in rows} == {"Book 00000", "Book 00001"}
+
+    assert api_client.get("/books/books/export", params={"format": "xml"}).status_code == 400
@@ -0,0 +1,64 @@
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import selectinload
+from sqlalchemy.future import select
+
+from db.models import Book
+from schemas import fast_json
+from schemas.fieldsets import FULL, parse_fieldset
+from schemas.pydantic_models.book_model import BookResponse
+
+
+def test_list_fields_drive_projection_and_payload(api_client, seed_catalog, statements):
+    seed_catalog(books=3, reviews_per_book=2)
+    api_client.get("/books/books/books/")
+
+    statements.clear()
+    response = api_client.get("/books/books/books/", params={"fields": "id,title"})
+    assert response.status_code == 200
+    assert all(set(book) == {"id", "title"} for book in response.json())
+    select_books = [s for s in statements if "FROM books" in s]
+    assert len(select_books) == 1
+    assert "books.author" not in select_books[0] and "rating_1" not in select_books[0]
+    assert not any("FROM reviews" in s for s in statements)
+    assert response.headers["etag"] != api_client.get("/books/books/books/").headers["etag"]
+
+    with_reviews = api_client.get("/books/books/books/", params={"fields": "title", "include": "reviews"}).json()
+    assert all(set(book) == {"title", "reviews"} and len(book["reviews"]) == 2 for book in with_reviews)
+
+    stats = api_client.get("/books/books/books/", params={"fields": "average_rating,rating_histogram"}).json()
+    assert set(stats[0]) == {"average_rating", "rating_histogram"}
+
+
+def test_single_book_and_search_fieldsets(api_client, seed_catalog):
+    seed_catalog(books=1, reviews_per_book=1)
+    book_id = api_client.get("/books/books/books/").json()[0]["id"]
+
+    response = api_client.get(f"/books/books/{book_id}", params={"fields": "author"})
+    assert response.json() == {"author": "Author 0"}
+    etag = response.headers["etag"]
+    assert api_client.get(f"/books/books/{book_id}", params={"fields": "author"},
+                          headers={"If-None-Match": etag}).status_code == 304
+    assert api_client.get(f"/books/books/{book_id}", headers={"If-None-Match": etag}).status_code == 200
+    assert api_client.get(f"/books/books/{book_id}", params={"include": "reviews"}).json()["reviews"]
+
+    found = api_client.get("/books/search", params={"q": "book", "fields": "id,title"}).json()
+    assert found == [{"id": book_id, "title": "Book 00000"}]
+
+    assert api_client.get("/books/books/books/", params={"fields": "password"}).status_code == 400
+    assert api_client.get(f"/books/books/{book_id}", params={"include": "author"}).status_code == 400
+
+
+def test_fast_json_matches_pydantic_serialization(session_factory, seed_catalog):
+    seed_catalog(books=3, reviews_per_book=2)
+    with session_factory() as db:
+        books = db.execute(select(Book).options(selectinload(Book.reviews)).order_by(Book.title)).scalars().all()
+        books[0].review_count, books[0].rating_sum, books[0].rating_4 = 2, 7, 1
+        reviews = {book.id: book.reviews for book in books}
+        adapter = TypeAdapter(List[BookResponse])
+        expected = adapter.dump_json(adapter.validate_python(books, from_attributes=True))
+        assert fast_json.encode_books(books, FULL, reviews) == expected
+
+        narrowed = fast_json.encode_books(books, parse_fieldset("author,id", None))
+        assert narrowed.startswith(f'[{{"author":"Author 0","id":"{books[0].id}"}}'.encode())
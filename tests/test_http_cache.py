@@ -0,0 +1,55 @@
+def test_read_book_conditional_get(api_client, seed_catalog, statements):
+    seed_catalog(books=1, reviews_per_book=1)
+    book_id = api_client.get("/books/books/books/").json()[0]["id"]
+
+    first = api_client.get(f"/books/books/{book_id}")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, max-age=0, must-revalidate"
+
+    statements.clear()
+    cached = api_client.get(f"/books/books/{book_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    # The 304 path skips loading the reviews.
+    assert not any("FROM reviews" in statement for statement in statements)
+    assert api_client.get(f"/books/books/{book_id}", headers={"If-None-Match": f'W/{etag}, "x"'}).status_code == 304
+
+    api_client.post(f"/books/books/{book_id}/reviews/", json={"content": "New", "rating": 4})
+    changed = api_client.get(f"/books/books/{book_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(changed.json()["reviews"]) == 2
+
+
+def test_review_edits_change_book_and_review_etags(api_client, seed_catalog):
+    seed_catalog(books=1, reviews_per_book=1)
+    book_id = api_client.get("/books/books/books/").json()[0]["id"]
+    review_id = api_client.get("/books/reviews/").json()[0]["id"]
+    book_etag = api_client.get(f"/books/books/{book_id}").headers["etag"]
+    review_etag = api_client.get(f"/books/reviews/{review_id}").headers["etag"]
+
+    # Same rating, new text: only the content changes, but both ETags must move.
+    rating = api_client.get(f"/books/reviews/{review_id}").json()["rating"]
+    api_client.put(f"/books/reviews/{review_id}", json={"content": "Edited", "rating": rating})
+    assert api_client.get(f"/books/reviews/{review_id}", headers={"If-None-Match": review_etag}).status_code == 200
+    assert api_client.get(f"/books/books/{book_id}", headers={"If-None-Match": book_etag}).status_code == 200
+
+
+def test_collection_etags_follow_page_contents(api_client, seed_catalog):
+    seed_catalog(books=3, reviews_per_book=1)
+    listing = api_client.get("/books/books/books/", params={"limit": 2})
+    etag = listing.headers["etag"]
+    assert api_client.get("/books/books/books/", params={"limit": 2},
+                          headers={"If-None-Match": etag}).status_code == 304
+    # A different page of the same collection has its own version.
+    assert api_client.get("/books/books/books/", params={"limit": 3},
+                          headers={"If-None-Match": etag}).status_code == 200
+
+    reviews_etag = api_client.get("/books/reviews/").headers["etag"]
+    assert api_client.get("/books/reviews/", headers={"If-None-Match": reviews_etag}).status_code == 304
+
+    book_id = listing.json()[0]["id"]
+    api_client.put(f"/books/books/{book_id}", json={"title": "Book 00000", "author": "Changed"})
+    assert api_client.get("/books/books/books/", params={"limit": 2},
+                          headers={"If-None-Match": etag}).status_code == 200
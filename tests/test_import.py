@@ -0,0 +1,59 @@
+import json
+
+from db.models import Book
+from schemas.autocomplete import autocomplete_index
+
+
+def test_csv_import_reports_bad_rows(api_client, session_factory):
+    body = (
+        "title,author\n"
+        "Dune,Frank Herbert\n"
+        '"Good Omens, A Novel","Pratchett\nGaiman"\n'
+        "Missing author\n"
+        "Too,many,columns\n"
+        "Emma,Jane Austen\n"
+    )
+    response = api_client.post("/books/books/import", params={"format": "csv"}, content=body.encode())
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["rows"], report["imported"], report["failed"]) == (5, 3, 2)
+    assert [error["row"] for error in report["errors"]] == [3, 4]
+    assert report["rows_per_second"] > 0
+
+    with session_factory() as db:
+        titles = sorted(title for title, in db.query(Book.title))
+    assert titles == ["Dune", "Emma", "Good Omens, A Novel"]
+    assert autocomplete_index.suggest("omens")[0][1] == "Good Omens, A Novel"
+
+
+def test_ndjson_import_commits_in_chunks(api_client, session_factory, statements, monkeypatch):
+    from config import settings
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 10)
+
+    lines = [json.dumps({"title": f"Book {i}", "author": "Someone"}) for i in range(25)]
+    lines.insert(7, "{not json")
+    lines.insert(12, json.dumps({"title": "No author"}))
+    api_client.get("/books/books/books/")
+    statements.clear()
+    response = api_client.post("/books/books/import", content="\n".join(lines).encode(),
+                               headers={"content-type": "application/x-ndjson"})
+    report = response.json()
+    assert (report["rows"], report["imported"], report["failed"]) == (27, 25, 2)
+    assert [error["row"] for error in report["errors"]] == [8, 13]
+    assert sum(statement.startswith("INSERT INTO books") for statement in statements) == 3
+    with session_factory() as db:
+        assert db.query(Book).count() == 25
+
+    assert api_client.post("/books/books/import", params={"format": "xml"}, content=b"").status_code == 400
+
+
+def test_undecodable_rows_are_reported_not_fatal(api_client, session_factory):
+    body = b'{"title": "Dune", "author": "Frank Herbert"}\n{"title": "\xff"}\n{"title": "Emma", "author": "Austen"}\n'
+    report = api_client.post("/books/books/import", params={"format": "ndjson"}, content=body).json()
+    assert (report["rows"], report["imported"], report["failed"]) == (3, 2, 1)
+    assert report["errors"][0]["row"] == 2 and "UTF-8" in report["errors"][0]["error"]
+
+    body = b"title,author\nUlysses,Joyce\n\xff,Nobody\nEmma,Austen\n"
+    report = api_client.post("/books/books/import", params={"format": "csv"}, content=body).json()
+    assert (report["imported"], report["failed"]) == (2, 1)
+    assert autocomplete_index.suggest("ulys")[0][1] == "Ulysses"
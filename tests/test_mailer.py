@@ -0,0 +1,158 @@
+import smtplib
+import threading
+import time
+
+import pytest
+
+from utilities.mailer import MailQueue, MemoryTransport, SMTPTransport, build_message, mail_queue
+
+
+class FlakyTransport(MemoryTransport):
+    def __init__(self, failures, error=ConnectionResetError):
+        super().__init__()
+        self.failures = failures
+        self.error = error
+        self.attempts = 0
+
+    def send(self, message):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise self.error("boom")
+        super().send(message)
+
+
+def test_register_queues_verification_email(api_client):
+    response = api_client.post("/auth/register",
+                               json={"username": "newbie", "email": "newbie@example.com", "password": "pw"})
+    assert response.status_code == 201
+    mail_queue.join()
+    message = mail_queue.transport.outbox[-1]
+    assert message["To"] == "newbie@example.com"
+    assert "/verify?token=" in message.get_payload()[0].get_payload()
+
+
+def test_transient_failures_are_retried_with_backoff():
+    transport = FlakyTransport(failures=2)
+    queue = MailQueue(transport, max_retries=3, backoff=0)
+    queue.send_email("a@example.com", "Hi", "<p>hi</p>")
+    queue.join()
+    queue.stop()
+    assert transport.attempts == 3
+    assert queue.stats() == {"queued": 0, "retrying": 0, "sent": 1, "failed": 0}
+
+
+class RefusingTransport(MemoryTransport):
+    """Fails transiently for one recipient and delivers everything else."""
+
+    def __init__(self, recipient):
+        super().__init__()
+        self.recipient = recipient
+
+    def send(self, message):
+        if message["To"] == self.recipient:
+            raise ConnectionResetError("boom")
+        super().send(message)
+
+
+def test_retries_wait_on_a_delay_queue_not_the_worker():
+    transport = RefusingTransport("bad@example.com")
+    queue = MailQueue(transport, batch_size=1, max_retries=3, backoff=60)
+    for recipient in ("bad@example.com", "a@example.com", "b@example.com"):
+        queue.send_email(recipient, "Hi", "<p>hi</p>")
+    deadline = time.monotonic() + 5
+    while len(transport.outbox) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [message["To"] for message in transport.outbox] == ["a@example.com", "b@example.com"]
+    assert queue.stats()["retrying"] == 1
+
+    queue.stop()
+    assert queue.stats() == {"queued": 0, "retrying": 0, "sent": 2, "failed": 1}
+
+
+def test_permanent_failures_and_exhausted_retries_are_dropped():
+    refused = FlakyTransport(failures=1, error=lambda msg: smtplib.SMTPRecipientsRefused({}))
+    queue = MailQueue(refused, max_retries=3, backoff=0)
+    queue.send_email("a@example.com", "Hi", "<p>hi</p>")
+    queue.join()
+    queue.stop()
+    assert refused.attempts == 1 and queue.failed == 1
+
+    down = FlakyTransport(failures=10)
+    queue = MailQueue(down, max_retries=2, backoff=0)
+    queue.enqueue(build_message("b@example.com", "Hi", "<p>hi</p>", sender="noreply@example.com"))
+    queue.join()
+    queue.stop()
+    assert down.attempts == 3 and queue.failed == 1
+
+
+def test_data_errors_are_retried_unless_permanent():
+    busy = FlakyTransport(failures=1, error=lambda msg: smtplib.SMTPDataError(451, msg))
+    queue = MailQueue(busy, max_retries=2, backoff=0)
+    queue.send_email("a@example.com", "Hi", "<p>hi</p>")
+    queue.join()
+    queue.stop()
+    assert busy.attempts == 2 and queue.sent == 1
+
+    rejected = FlakyTransport(failures=1, error=lambda msg: smtplib.SMTPDataError(554, msg))
+    queue = MailQueue(rejected, max_retries=2, backoff=0)
+    queue.send_email("a@example.com", "Hi", "<p>hi</p>")
+    queue.join()
+    queue.stop()
+    assert rejected.attempts == 1 and queue.failed == 1
+
+
+class FakeSMTP:
+    def __init__(self, error):
+        self.error = error
+        self.closed = False
+
+    def send_message(self, message):
+        raise self.error
+
+    def quit(self):
+        self.closed = True
+
+
+def test_smtp_connection_is_kept_after_a_permanent_refusal():
+    transport = SMTPTransport("localhost", 25, "", "", use_tls=False, use_ssl=False)
+    for error, kept in ((smtplib.SMTPRecipientsRefused({}), True), (smtplib.SMTPDataError(550, b"no"), True),
+                        (smtplib.SMTPDataError(451, b"later"), False), (smtplib.SMTPServerDisconnected(), False)):
+        server = transport._server = FakeSMTP(error)
+        with pytest.raises(type(error)):
+            transport.send(build_message("a@example.com", "Hi", "<p>hi</p>", sender="noreply@example.com"))
+        assert (transport._server is server) == kept and server.closed != kept
+
+
+class BlockedTransport(MemoryTransport):
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def send(self, message):
+        self.release.wait(5)
+        super().send(message)
+
+
+def test_full_queue_drops_instead_of_raising():
+    transport = BlockedTransport()
+    queue = MailQueue(transport, batch_size=1, maxsize=1, backoff=0)
+    accepted = [queue.send_email(f"{i}@example.com", "Hi", "<p>hi</p>") for i in range(4)]
+    transport.release.set()
+    queue.join()
+    queue.stop()
+    assert False in accepted
+    assert queue.sent == accepted.count(True) and queue.failed == accepted.count(False)
+
+
+def test_stop_does_not_block_on_a_full_queue():
+    transport = BlockedTransport()
+    queue = MailQueue(transport, batch_size=1, maxsize=1, backoff=0)
+    for i in range(3):
+        queue.send_email(f"{i}@example.com", "Hi", "<p>hi</p>")
+    start = time.monotonic()
+    assert queue.stop(timeout=0.1) is False
+    assert time.monotonic() - start < 1
+
+    transport.release.set()
+    queue.join()
+    assert queue.sent == len(transport.outbox)
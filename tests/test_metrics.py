@@ -0,0 +1,35 @@
+from utilities.metrics import Histogram, http_requests_total
+
+
+def sample(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_metrics_endpoint_reports_routes_pool_and_caches(api_client):
+    before = http_requests_total.value("GET", "/books/reviews/{review_id}", 404)
+    api_client.get("/books/reviews/")
+    api_client.get("/books/reviews/missing")
+
+    text = api_client.get("/metrics").text
+    assert sample(text, 'http_requests_total{method="GET",handler="/books/reviews/{review_id}",status="404"}') == before + 1
+    assert sample(text, 'http_request_duration_seconds_count{method="GET",handler="/books/reviews/"}') >= 1
+    assert sample(text, 'http_requests_in_progress{method="GET",handler="/books/reviews/"}') == 0
+    assert "# TYPE db_pool_checkouts_total counter" in text
+    assert 'db_pool_connections{state="checkedout"}' in text
+    assert sample(text, 'auth_cache_hits_total{cache="user"}') >= 1
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, "/x")
+    assert histogram.render().splitlines()[2:] == [
+        'latency_seconds_bucket{route="/x",le="0.1"} 1',
+        'latency_seconds_bucket{route="/x",le="1.0"} 3',
+        'latency_seconds_bucket{route="/x",le="+Inf"} 4',
+        'latency_seconds_sum{route="/x"} 4.05',
+        'latency_seconds_count{route="/x"} 4',
+    ]
@@ -0,0 +1,51 @@
+import asyncio
+import json
+import logging
+
+from db.models import User
+from middleware import LoggingMiddleware
+
+
+def access_records(caplog):
+    return [json.loads(record.getMessage()) for record in caplog.records if record.name == "access"]
+
+
+def test_session_cookie_is_set(api_client):
+    response = api_client.get("/")
+    assert response.status_code == 200
+    assert response.headers["set-cookie"] == "session_id=unique_session_id; Path=/; SameSite=lax"
+
+
+def test_cookie_added_alongside_route_cookies(api_client):
+    response = api_client.post("/auth/login", data={"username": "tester", "password": "secret"})
+    assert response.status_code == 200
+    cookies = response.headers.get_list("set-cookie")
+    assert any(cookie.startswith("access_token=") for cookie in cookies)
+    assert any(cookie.startswith("session_id=") for cookie in cookies)
+
+
+def test_access_log_records_timing_db_usage_and_user(api_client, session_factory, caplog):
+    with caplog.at_level(logging.INFO, logger="access"):
+        response = api_client.get("/books/reviews/")
+    [record] = access_records(caplog)
+    assert record["method"] == "GET" and record["path"] == "/books/reviews/" and record["status"] == 200
+    assert record["db_statements"] == 2
+    assert record["db_ms"] <= record["duration_ms"]
+    assert record["response_bytes"] == len(response.content)
+    with session_factory() as db:
+        assert record["user_id"] == db.query(User).filter_by(username="tester").one().id
+
+
+def test_access_log_sampling_keeps_errors(caplog):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 503 if scope["path"] == "/down" else 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def noop(message):
+        pass
+
+    middleware = LoggingMiddleware(app, sample_rate=0.0, slow_ms=10_000)
+    with caplog.at_level(logging.INFO, logger="access"):
+        for path in ("/up", "/down"):
+            asyncio.run(middleware({"type": "http", "method": "GET", "path": path}, None, noop))
+    assert [record["path"] for record in access_records(caplog)] == ["/down"]
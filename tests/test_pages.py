@@ -0,0 +1,32 @@
+import os
+
+from utilities.pages import PageCache, create_environment
+
+
+def test_pages_are_served_with_etags(api_client):
+    response = api_client.get("/login")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    assert 'href="/static/css/styles.' in response.text
+    etag = response.headers["etag"]
+    assert api_client.get("/login", headers={"If-None-Match": etag}).status_code == 304
+    assert api_client.get("/register").headers["etag"] != etag
+
+
+def test_page_cache_renders_once_unless_reloading(tmp_path):
+    templates, bytecode = tmp_path / "templates", tmp_path / "bytecode"
+    templates.mkdir()
+    bytecode.mkdir()
+    page = templates / "page.html"
+    page.write_text("<p>{{ 'one' }}</p>")
+
+    cached = PageCache(create_environment(str(templates), auto_reload=False, bytecode_cache_dir=str(bytecode)))
+    reloading = PageCache(create_environment(str(templates), auto_reload=True, bytecode_cache_dir=str(bytecode)))
+    assert cached.get("page.html").body == reloading.get("page.html").body == b"<p>one</p>"
+    assert os.listdir(bytecode)
+
+    page.write_text("<p>{{ 'two' }}</p>")
+    os.utime(page, (page.stat().st_atime, page.stat().st_mtime + 5))
+    assert cached.get("page.html").body == b"<p>one</p>"
+    assert reloading.get("page.html").body == b"<p>two</p>"
+    assert reloading.get("page.html").etag != cached.get("page.html").etag
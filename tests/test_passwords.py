@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from db.models import User
+from security.passwords import PasswordHasher, hash_plaintext_passwords, password_hasher
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(n=2 ** 10, r=8, p=1, workers=2)
+    encoded = hasher.hash_sync("correct horse")
+    assert encoded.startswith("scrypt$1024$8$1$")
+    assert encoded != hasher.hash_sync("correct horse")
+    assert hasher.verify_sync("correct horse", encoded)
+    assert not hasher.verify_sync("wrong", encoded)
+    assert not hasher.verify_sync("correct horse", None)
+    assert not hasher.verify_sync("correct horse", "scrypt$garbage")
+    with pytest.raises(ValueError):
+        PasswordHasher(n=1000, r=8, p=1, workers=1)
+
+
+def test_needs_rehash_tracks_cost_parameters():
+    old = PasswordHasher(n=2 ** 10, r=8, p=1, workers=1)
+    new = PasswordHasher(n=2 ** 11, r=8, p=1, workers=1)
+    encoded = old.hash_sync("pw")
+    assert not old.needs_rehash(encoded)
+    assert new.needs_rehash(encoded) and new.verify_sync("pw", encoded)
+    assert new.needs_rehash("plaintext")
+
+
+def test_async_hashing_runs_off_the_event_loop():
+    hasher = PasswordHasher(n=2 ** 10, r=8, p=1, workers=2)
+
+    async def check():
+        encoded = await hasher.hash("pw")
+        return await asyncio.gather(*(hasher.verify(password, encoded) for password in ("pw", "nope")))
+
+    try:
+        assert asyncio.run(check()) == [True, False]
+    finally:
+        hasher.shutdown()
+
+
+def test_plaintext_is_only_accepted_when_enabled():
+    strict = PasswordHasher(n=2 ** 10, r=8, p=1, workers=1)
+    lenient = PasswordHasher(n=2 ** 10, r=8, p=1, workers=1, accept_plaintext=True)
+    assert not strict.verify_sync("plaintext", "plaintext")
+    assert lenient.verify_sync("plaintext", "plaintext") and lenient.needs_rehash("plaintext")
+    assert not lenient.verify_sync("other", "plaintext")
+
+
+def test_register_hashes_and_login_upgrades_outdated_hashes(api_client, session_factory):
+    response = api_client.post("/auth/register",
+                               json={"username": "reader", "email": "reader@example.com", "password": "pw"})
+    assert response.status_code == 201
+    with session_factory() as db:
+        stored = db.query(User).filter_by(username="reader").one().password
+        assert stored != "pw" and password_hasher.verify_sync("pw", stored)
+
+        tester = db.query(User).filter_by(username="tester").one()
+        tester.password = PasswordHasher(n=password_hasher.n * 2, r=8, p=1, workers=1).hash_sync("secret")
+        db.commit()
+    assert api_client.post("/auth/login", data={"username": "tester", "password": "secret"}).status_code == 200
+    with session_factory() as db:
+        stored = db.query(User).filter_by(username="tester").one().password
+        assert not password_hasher.needs_rehash(stored)
+    assert api_client.post("/auth/login", data={"username": "tester", "password": "secret"}).status_code == 200
+    assert api_client.post("/auth/login", data={"username": "tester", "password": "wrong"}).status_code != 200
+
+
+def test_migration_hashes_plaintext_rows(session_factory):
+    hashed = password_hasher.hash_sync("kept")
+    with session_factory() as db:
+        db.add_all([User(username="legacy", email="legacy@example.com", password="hunter2"),
+                    User(username="hashed", email="hashed@example.com", password=hashed),
+                    User(username="empty", email="empty@example.com", password=None)])
+        db.commit()
+        assert hash_plaintext_passwords(db.connection()) == 1
+        db.commit()
+        passwords = {user.username: user.password for user in db.query(User)}
+    assert password_hasher.verify_sync("hunter2", passwords["legacy"])
+    assert passwords["hashed"] == hashed and passwords["empty"] is None
@@ -0,0 +1,106 @@
+import asyncio
+import random
+
+import numpy as np
+
+from schemas.recommender import Recommender
+
+RATINGS = [
+    ("ann", "dune", 5), ("ann", "messiah", 4), ("ann", "emma", 1),
+    ("bob", "dune", 4), ("bob", "messiah", 5),
+    ("cat", "emma", 5), ("cat", "persuasion", 4),
+    ("dan", "dune", 5),
+]
+
+
+def build(neighbours=5):
+    recommender = Recommender(neighbours=neighbours)
+    recommender.load_ratings(RATINGS)
+    return recommender
+
+
+def test_neighbours_rank_co_rated_books_first():
+    recommender = build()
+    assert recommender.neighbours_of("dune")[0][0] == "messiah"
+    assert [book for book, _ in recommender.neighbours_of("persuasion")] == ["emma"]
+    assert recommender.neighbours_of("unknown") == []
+
+
+def test_recommend_skips_rated_books_and_falls_back_to_popular():
+    recommender = build()
+    assert recommender.recommend("dan", limit=1)[0][0] == "messiah"
+    assert all(book != "dune" for book, _ in recommender.recommend("dan", limit=3))
+    # Unknown users get the most-rated books.
+    assert [book for book, _ in recommender.recommend("eve", limit=2)] == ["dune", "messiah"]
+
+
+def test_incremental_refresh_matches_full_rebuild():
+    rng = random.Random(7)
+    incremental = Recommender(neighbours=3, block_size=4)
+    ratings = {(f"u{rng.randrange(30)}", f"b{rng.randrange(40)}"): rng.randint(1, 5) for _ in range(300)}
+    incremental.load_ratings((user, book, rating) for (user, book), rating in ratings.items())
+
+    for _ in range(5):
+        user, book = f"u{rng.randrange(30)}", f"b{rng.randrange(40)}"
+        ratings[user, book] = rating = rng.randint(1, 5)
+        incremental.rate(user, book, rating)
+        removed = rng.choice(sorted(ratings))
+        del ratings[removed]
+        incremental.unrate(*removed)
+        incremental.refresh()
+
+        full = Recommender(neighbours=3)
+        full.load_ratings((user, book, rating) for (user, book), rating in ratings.items())
+        for book_id in full._items:
+            expected = dict(full.neighbours_of(book_id))
+            actual = dict(incremental.neighbours_of(book_id))
+            assert np.allclose(sorted(expected.values()), sorted(actual.values()), atol=1e-5)
+
+
+def test_refresh_only_touches_affected_books():
+    recommender = build()
+    recommender.rate("fay", "ulysses", 4)
+    recommender.rate("fay", "dubliners", 5)
+    recommender.rate("gus", "dubliners", 3)
+    assert recommender.refresh() == 2
+    assert [book for book, _ in recommender.neighbours_of("ulysses")] == ["dubliners"]
+
+
+def test_removed_books_drop_out():
+    recommender = build()
+    recommender.remove_book("messiah")
+    recommender.refresh()
+    assert all(book != "messiah" for book, _ in recommender.recommend("dan", limit=5))
+    assert recommender.neighbours_of("messiah") == []
+
+
+def test_reads_use_the_last_built_model_until_refreshed():
+    recommender = build()
+    before = recommender.recommend("dan", limit=3)
+    recommender.rate("dan", "messiah", 5)
+    assert recommender.recommend("dan", limit=3) == before
+
+    async def refresh_concurrently():
+        await asyncio.gather(recommender.ensure_fresh(), recommender.ensure_fresh())
+
+    asyncio.run(refresh_concurrently())
+    assert not recommender.dirty
+    assert all(book != "messiah" for book, _ in recommender.recommend("dan", limit=3))
+
+
+def test_recommendations_endpoint(api_client):
+    for title in ("Dune", "Dune Messiah", "Emma"):
+        api_client.post("/books/books/", json={"title": title, "author": "Someone"})
+    book_ids = {book["title"]: book["id"] for book in api_client.get("/books/books/books/").json()}
+
+    api_client.post(f"/books/books/{book_ids['Dune']}/reviews/", json={"content": "Great", "rating": 5})
+    response = api_client.get("/recommendations", params={"limit": 2})
+    assert response.status_code == 200
+    assert [book["title"] for book in response.json()] == []
+
+    from schemas.recommender import recommender
+    recommender.rate("someone-else", book_ids["Dune"], 5)
+    recommender.rate("someone-else", book_ids["Dune Messiah"], 4)
+    response = api_client.get("/recommendations", params={"limit": 2})
+    assert response.json()[0]["title"] == "Dune Messiah"
+    assert response.json()[0]["score"] > 0
@@ -0,0 +1,204 @@
+import asyncio
+import time
+
+from utilities.response_cache import MemoryBackend, RedisBackend, ResponseCache, response_cache
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio for the response cache."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    async def mget(self, *keys):
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None):
+        if not isinstance(value, bytes):
+            value = str(value).encode()
+        self.data[key] = (value, time.monotonic() + ex if ex else None)
+
+    async def incr(self, key):
+        value = int(await self.get(key) or 0) + 1
+        self.data[key] = (str(value).encode(), None)
+        return value
+
+    async def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.commands.clear()
+
+    def set(self, *args, **kwargs):
+        self.commands.append(self.client.set(*args, **kwargs))
+
+    def delete(self, *keys):
+        self.commands.append(self.client.delete(*keys))
+
+    async def execute(self):
+        return [await command for command in self.commands]
+
+
+def bodies(client, prefix):
+    return {key for key in client.data if key.startswith(prefix + "book:")}
+
+
+def test_read_book_is_served_from_cache_until_written(api_client, seed_catalog, statements):
+    seed_catalog(books=1, reviews_per_book=1)
+    book_id = api_client.get("/books/books/books/").json()[0]["id"]
+    first = api_client.get(f"/books/books/{book_id}")
+
+    statements.clear()
+    second = api_client.get(f"/books/books/{book_id}")
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+    assert not any("FROM books" in statement for statement in statements)
+
+    api_client.post(f"/books/books/{book_id}/reviews/", json={"content": "Fresh", "rating": 2})
+    assert len(api_client.get(f"/books/books/{book_id}").json()["reviews"]) == 2
+    api_client.put(f"/books/books/{book_id}", json={"title": "Renamed", "author": "Someone"})
+    assert api_client.get(f"/books/books/{book_id}").json()["title"] == "Renamed"
+    assert api_client.get("/books/books/missing").status_code == 404
+
+
+def test_deleting_a_book_evicts_its_cached_reviews(api_client, seed_catalog):
+    seed_catalog(books=2, reviews_per_book=1)
+    reviews = api_client.get("/books/reviews/").json()
+    for review in reviews:
+        assert api_client.get(f"/books/reviews/{review['id']}").status_code == 200
+
+    assert api_client.delete(f"/books/books/{reviews[0]['book_id']}").status_code == 200
+    assert api_client.get(f"/books/reviews/{reviews[0]['id']}").status_code == 404
+
+    assert api_client.post("/books/books/batch", json={"delete": [reviews[1]["book_id"]]}).status_code == 200
+    assert api_client.get(f"/books/reviews/{reviews[1]['id']}").status_code == 404
+
+
+def test_concurrent_misses_share_one_load():
+    cache = ResponseCache(MemoryBackend(maxsize=10, ttl=60), ttl=60)
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return b"body"
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load("book:1", load) for _ in range(10)))
+
+    assert asyncio.run(main()) == [b"body"] * 10
+    assert len(loads) == 1
+    assert cache.stats() == {"hits": 0, "misses": 1, "coalesced": 9}
+
+
+def test_invalidation_during_load_is_not_written_back():
+    cache = ResponseCache(MemoryBackend(maxsize=10, ttl=60), ttl=60)
+
+    async def stale_load():
+        await cache.invalidate("book:1")
+        return b"stale"
+
+    async def main():
+        assert await cache.get_or_load("book:1", stale_load) == b"stale"
+        return await cache.get_or_load("book:1", lambda: asyncio.sleep(0, b"fresh"))
+
+    assert asyncio.run(main()) == b"fresh"
+
+
+def test_waiters_retry_when_the_leader_fails():
+    cache = ResponseCache(MemoryBackend(maxsize=10, ttl=60), ttl=60)
+    attempts = []
+
+    async def load():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError("database went away")
+        return b"body"
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load("book:1", load) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert isinstance(results[0], RuntimeError)
+    assert results[1:] == [b"body", b"body"]
+    assert len(attempts) == 2
+
+
+def test_redis_backend():
+    client = FakeRedis()
+    cache = ResponseCache(RedisBackend(client, ttl=60, prefix="test:"), ttl=60)
+
+    async def main():
+        await cache.get_or_load("book:1", lambda: asyncio.sleep(0, b"one"))
+        await cache.get_or_load("book:2", lambda: asyncio.sleep(0, b"two"))
+        assert bodies(client, "test:") == {"test:book:1", "test:book:2"}
+        assert await cache.get_or_load("book:1", lambda: asyncio.sleep(0, b"unused")) == b"one"
+
+        await cache.invalidate("book:1")
+        assert bodies(client, "test:") == {"test:book:2"}
+        await cache.clear()
+        return await cache.get_or_load("book:2", lambda: asyncio.sleep(0, b"fresh"))
+
+    assert asyncio.run(main()) == b"fresh"
+    assert cache.stats()["hits"] == 1
+
+
+def test_stale_load_in_another_worker_is_never_served():
+    client = FakeRedis()
+    writer = ResponseCache(RedisBackend(client, ttl=60), ttl=60)
+    reader = ResponseCache(RedisBackend(client, ttl=60), ttl=60)
+
+    async def main():
+        async def stale_load():
+            # The write commits and invalidates in another worker mid-load.
+            await writer.invalidate("book:1")
+            return b"stale"
+
+        assert await reader.get_or_load("book:1", stale_load) == b"stale"
+        assert await writer.get_or_load("book:1", lambda: asyncio.sleep(0, b"fresh")) == b"fresh"
+        return await reader.get_or_load("book:1", lambda: asyncio.sleep(0, b"unused"))
+
+    assert asyncio.run(main()) == b"fresh"
+
+
+def test_writes_are_visible_to_the_next_read_with_redis(api_client, seed_catalog, monkeypatch):
+    monkeypatch.setattr(response_cache, "backend", RedisBackend(FakeRedis(), ttl=60))
+    seed_catalog(books=1, reviews_per_book=0)
+    book_id = api_client.get("/books/books/books/").json()[0]["id"]
+    assert api_client.get(f"/books/books/{book_id}").json()["title"] == "Book 00000"
+    api_client.put(f"/books/books/{book_id}", json={"title": "Renamed", "author": "Someone"})
+    assert api_client.get(f"/books/books/{book_id}").json()["title"] == "Renamed"
+    api_client.delete(f"/books/books/{book_id}")
+    assert api_client.get(f"/books/books/{book_id}").status_code == 404
+
+
+def test_review_reads_are_cached_and_invalidated(api_client, seed_catalog):
+    seed_catalog(books=1, reviews_per_book=1)
+    review = api_client.get("/books/reviews/").json()[0]
+    url = f"/books/reviews/{review['id']}"
+    assert api_client.get(url).json()["content"] == review["content"]
+    api_client.put(url, json={"content": "Edited", "rating": review["rating"]})
+    assert api_client.get(url).json()["content"] == "Edited"
+    api_client.delete(url)
+    assert api_client.get(url).status_code == 404
@@ -0,0 +1,117 @@
+from types import SimpleNamespace
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from db.models import Book, Review
+from db.search_index import POSTGRES_SEARCH_DDL, create_search_index, drop_search_index
+from schemas.book_search import POSTGRES_SEARCH, match_expression
+
+
+def add_book(session_factory, title, author, reviews=()):
+    with session_factory() as db:
+        book = Book(title=title, author=author, reviews=[Review(content=text, rating=4) for text in reviews])
+        db.add(book)
+        db.commit()
+        return book.id
+
+
+def titles(response):
+    return [book["title"] for book in response.json()]
+
+
+def test_search_ranks_title_matches_and_supports_prefixes(api_client, session_factory):
+    add_book(session_factory, "Dune", "Frank Herbert", ["A desert epic"])
+    add_book(session_factory, "Children of Dune", "Frank Herbert")
+    add_book(session_factory, "Arrakis Notes", "Someone Else", ["Better than Dune itself"])
+    add_book(session_factory, "Neuromancer", "William Gibson")
+
+    ranked = titles(api_client.get("/books/search", params={"q": "dune"}))
+    assert sorted(ranked[:2]) == ["Children of Dune", "Dune"] and ranked[2] == "Arrakis Notes"
+    assert sorted(titles(api_client.get("/books/search", params={"q": "herb"}))) == ["Children of Dune", "Dune"]
+    assert titles(api_client.get("/books/search", params={"q": "desert"})) == ["Dune"]
+    assert api_client.get("/books/search", params={"q": "!!"}).json() == []
+
+
+def test_search_index_follows_updates_and_deletes(api_client, session_factory):
+    book_id = add_book(session_factory, "Old Title", "Author")
+    api_client.put(f"/books/books/{book_id}", json={"title": "Fresh Title", "author": "Author"})
+    assert titles(api_client.get("/books/search", params={"q": "old"})) == []
+    assert titles(api_client.get("/books/search", params={"q": "fresh"})) == ["Fresh Title"]
+
+    review = api_client.post(f"/books/books/{book_id}/reviews/", json={"content": "zanzibar", "rating": 5})
+    assert titles(api_client.get("/books/search", params={"q": "zanzibar"})) == ["Fresh Title"]
+    api_client.delete(f"/books/reviews/{review.json()['id']}")
+    assert titles(api_client.get("/books/search", params={"q": "zanzibar"})) == []
+
+    api_client.delete(f"/books/books/{book_id}")
+    assert titles(api_client.get("/books/search", params={"q": "fresh"})) == []
+
+
+def test_search_pages_with_cursor(api_client, session_factory):
+    for i in range(5):
+        add_book(session_factory, f"Saga volume {i}", "Author")
+    seen, cursor = [], None
+    while True:
+        params = {"q": "saga", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = api_client.get("/books/search", params=params)
+        seen.extend(titles(response))
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert sorted(seen) == [f"Saga volume {i}" for i in range(5)]
+
+
+def test_search_index_survives_recreating_books(api_client, session_factory):
+    book_ids = [add_book(session_factory, title, "Author") for title in ("Alpha", "Beta", "Gamma")]
+    with session_factory() as db:
+        conn = db.connection()
+        # What batch_alter_table does on SQLite: copy, drop (taking the triggers along) and rename.
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'books'").scalar()
+        conn.exec_driver_sql(ddl.replace("books", "_alembic_tmp_books", 1))
+        conn.exec_driver_sql("INSERT INTO _alembic_tmp_books SELECT * FROM books ORDER BY title DESC")
+        conn.exec_driver_sql("DROP TABLE books")
+        conn.exec_driver_sql("ALTER TABLE _alembic_tmp_books RENAME TO books")
+        conn.exec_driver_sql("UPDATE books SET title = 'Delta' WHERE id = :id", {"id": book_ids[0]})
+        create_search_index(conn)
+        db.commit()
+
+    assert titles(api_client.get("/books/search", params={"q": "alpha"})) == []
+    assert titles(api_client.get("/books/search", params={"q": "delta"})) == ["Delta"]
+    assert titles(api_client.get("/books/search", params={"q": "beta"})) == ["Beta"]
+    api_client.put(f"/books/books/{book_ids[2]}", json={"title": "Epsilon", "author": "Author"})
+    assert titles(api_client.get("/books/search", params={"q": "epsilon"})) == ["Epsilon"]
+
+
+def test_rowid_keyed_search_index_is_replaced(api_client, session_factory):
+    add_book(session_factory, "Dune", "Frank Herbert")
+    with session_factory() as db:
+        conn = db.connection()
+        drop_search_index(conn)
+        conn.exec_driver_sql("CREATE VIRTUAL TABLE books_fts USING fts5(title, author, reviews)")
+        create_search_index(conn)
+        db.commit()
+    assert titles(api_client.get("/books/search", params={"q": "dune"})) == ["Dune"]
+
+
+class RecordingConnection:
+    dialect = SimpleNamespace(name="postgresql")
+
+    def __init__(self):
+        self.statements = []
+
+    def exec_driver_sql(self, statement, parameters=None):
+        self.statements.append(statement)
+
+
+def test_postgres_search_uses_gin_indexes_and_prefix_queries():
+    conn = RecordingConnection()
+    create_search_index(conn)
+    assert conn.statements == POSTGRES_SEARCH_DDL
+    drop_search_index(conn)
+    assert conn.statements[-2:] == ["DROP INDEX IF EXISTS ix_reviews_search", "DROP INDEX IF EXISTS ix_books_search"]
+
+    assert match_expression(["dune", "herb"], "postgresql") == "dune:* & herb:*"
+    compiled = text(POSTGRES_SEARCH).compile(dialect=postgresql.dialect())
+    assert set(compiled.params) == {"query", "after", "score", "key", "limit"}
+    assert "to_tsquery('simple', %(query)s)" in str(compiled)
@@ -0,0 +1,75 @@
+import base64
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+
+import pytest
+
+from security.tokens import ExpiredTokenError, TokenError, TokenService
+
+KEYS = {"current": "current-secret", "old": "old-secret"}
+
+
+def segment(data) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).rstrip(b"=").decode()
+
+
+def make_token(header: dict, payload: dict, secret=None) -> str:
+    # Built by hand as RFC 7519 describes, independently of TokenService.
+    signing_input = f"{segment(header)}.{segment(payload)}"
+    signature = b""
+    if secret is not None:
+        signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{base64.urlsafe_b64encode(signature).rstrip(b'=').decode()}"
+
+
+def unverified_header(token: str) -> dict:
+    header = token.split(".")[0]
+    return json.loads(base64.urlsafe_b64decode(header + "=" * (-len(header) % 4)))
+
+
+def test_round_trip_sets_exp_and_kid():
+    service = TokenService(KEYS, active_kid="current")
+    token = service.encode({"sub": "alice", "role": "user"})
+    payload = service.decode(token)
+    assert payload["sub"] == "alice" and payload["role"] == "user" and "exp" in payload
+    assert unverified_header(token) == {"alg": "HS256", "typ": "JWT", "kid": "current"}
+    assert token == make_token(unverified_header(token), payload, "current-secret")
+
+
+def test_rotated_key_still_verifies():
+    old_token = TokenService({"old": "old-secret"}, active_kid="old").encode({"sub": "alice"})
+    assert TokenService(KEYS, active_kid="current").decode(old_token)["sub"] == "alice"
+    with pytest.raises(TokenError):
+        TokenService({"current": "current-secret"}, active_kid="current").decode(old_token)
+
+
+def test_accepts_tokens_issued_without_kid():
+    legacy = make_token({"alg": "HS256", "typ": "JWT"}, {"sub": "alice"}, "current-secret")
+    assert TokenService(KEYS, active_kid="current").decode(legacy)["sub"] == "alice"
+
+
+def test_rejects_tampering_expiry_and_alg_none():
+    service = TokenService(KEYS, active_kid="current")
+    header, payload, signature = service.encode({"sub": "alice"}).split(".")
+    with pytest.raises(TokenError):
+        service.decode(f"{header}.{segment({'sub': 'mallory'})}.{signature}")
+
+    with pytest.raises(ExpiredTokenError):
+        service.decode(service.encode({"sub": "alice"}, expires_delta=timedelta(seconds=-1)))
+
+    unsigned = make_token({"alg": "none", "typ": "JWT"}, {"sub": "alice"})
+    with pytest.raises(TokenError):
+        service.decode(unsigned)
+
+    with pytest.raises(TokenError):
+        service.decode("not-a-token")
+
+
+def test_rejects_non_string_kid():
+    service = TokenService(KEYS, active_kid="current")
+    _, payload, signature = service.encode({"sub": "alice"}).split(".")
+    for kid in ([1], {"a": 1}, 7):
+        with pytest.raises(TokenError):
+            service.decode(f"{segment({'alg': 'HS256', 'kid': kid})}.{payload}.{signature}")
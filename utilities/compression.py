@@ -0,0 +1,72 @@
+import zlib
+from typing import Iterable, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is an optional dependency
+    brotli = None
+
+# Preferred first; "br" is only offered when the brotli package is installed.
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+EXTENSIONS = {"br": ".br", "gzip": ".gz"}
+
+
+def negotiate_encoding(accept_encoding: str, available: Iterable[str] = ENCODINGS) -> Optional[str]:
+    """The first of ``available`` the client accepts with a non-zero q-value."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        key, _, value = params.strip().partition("=")
+        if key.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    for encoding in available:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        # Emit everything so far without ending the stream.
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def compressor(encoding: str, level: int):
+    """``level`` is a brotli quality (0-11) or a gzip level (1-9) depending on ``encoding``."""
+    if encoding == "br":
+        return BrotliCompressor(level)
+    return GzipCompressor(level)
+
+
+def compress(encoding: str, data: bytes, level: int) -> bytes:
+    codec = compressor(encoding, level)
+    return codec.compress(data) + codec.finish()
@@ -0,0 +1,279 @@
+import heapq
+import itertools
+import logging
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from pathlib import Path
+from typing import List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def is_permanent(error: Exception) -> bool:
+    # Failures that retrying the same message will not fix: refused recipients
+    # and 5xx replies. 4xx replies (mailbox busy, try later) are transient.
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+def build_message(recipient: str, subject: str, html: str, sender: Optional[str] = None) -> MIMEMultipart:
+    message = MIMEMultipart()
+    message["From"] = sender or settings.MAIL_FROM
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.attach(MIMEText(html, "html"))
+    return message
+
+
+class SMTPTransport:
+    """Keeps one authenticated SMTP connection open and reuses it across batches."""
+
+    def __init__(self, host: str, port: int, username: str, password: str, use_tls: bool, use_ssl: bool,
+                 timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self._server: Optional[smtplib.SMTP] = None
+
+    def _connect(self) -> smtplib.SMTP:
+        if self._server is None:
+            smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+            server = smtp_class(self.host, self.port, timeout=self.timeout)
+            if self.use_tls and not self.use_ssl:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+            self._server = server
+        return self._server
+
+    def send(self, message):
+        try:
+            self._connect().send_message(message)
+        except OSError as e:
+            # smtplib errors are OSErrors too; a permanent refusal is a reply
+            # on a healthy connection, so keep it for the next message.
+            if not is_permanent(e):
+                self.close()
+            raise
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+class FileTransport:
+    """Writes each message to ``directory`` as an .eml file."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def send(self, message):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{time.time_ns()}-{uuid.uuid4().hex}.eml").write_bytes(message.as_bytes())
+
+    def close(self):
+        pass
+
+
+class MemoryTransport:
+    def __init__(self):
+        self.outbox: List = []
+
+    def send(self, message):
+        self.outbox.append(message)
+
+    def close(self):
+        pass
+
+
+def create_transport():
+    if settings.MAIL_TRANSPORT == "memory":
+        return MemoryTransport()
+    if settings.MAIL_TRANSPORT == "file":
+        return FileTransport(settings.MAIL_FILE_DIR)
+    return SMTPTransport(settings.MAIL_SERVER, settings.MAIL_PORT, settings.MAIL_USERNAME, settings.MAIL_PASSWORD,
+                         use_tls=settings.MAIL_TLS, use_ssl=settings.MAIL_SSL)
+
+
+class MailQueue:
+    """Outbound mail sent from a background thread so requests never wait on SMTP.
+
+    Messages are taken off the queue in batches over one transport connection.
+    A transient failure puts the message on a delay queue, due again after an
+    exponential backoff, so one failing message never holds up the rest; the
+    connection is closed once the queue has been idle for ``idle_timeout`` seconds.
+    """
+
+    def __init__(self, transport, batch_size: int = 20, max_retries: int = 5, backoff: float = 1.0,
+                 idle_timeout: float = 30, maxsize: int = 10000):
+        self.transport = transport
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.sent = 0
+        self.failed = 0
+        # Guards sent/failed, updated from the worker and from enqueue, read by stats().
+        self._counts_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        # Messages awaiting a retry as (due, sequence, attempt, message); worker thread only.
+        self._retries: List = []
+        self._sequence = itertools.count()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def enqueue(self, message) -> bool:
+        # Callers have usually committed already (e.g. a new user), so a full
+        # queue drops the email rather than failing the request.
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            logger.error(f"Mail queue full, dropping email to {message['To']}")
+            self._count(failed=1)
+            return False
+        return True
+
+    def send_email(self, recipient: str, subject: str, html: str) -> bool:
+        return self.enqueue(build_message(recipient, subject, html))
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopping.clear()
+                self._worker = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+                self._worker.start()
+
+    def join(self):
+        self._queue.join()
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """Let the worker send what is queued, waiting at most ``timeout`` seconds.
+
+        Returns False if the worker is still busy; it is a daemon thread, so
+        whatever it has not sent by then is lost when the process exits.
+        """
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is None:
+            return True
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass  # The worker sees _stopping once it has drained the queue.
+        worker.join(timeout)
+        if worker.is_alive():
+            logger.error(f"Mail queue still busy after {timeout}s, abandoning {self._queue.qsize()} queued emails")
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            timeout = self.idle_timeout
+            if self._stopping.is_set():
+                timeout = 0
+            elif self._retries:
+                timeout = max(0.0, self._retries[0][0] - time.monotonic())
+            try:
+                message = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    self._shut_down()
+                    return
+                if self._retries:
+                    self._send_batch(self._due_retries())
+                else:
+                    self.transport.close()
+                continue
+            if message is None:
+                self._queue.task_done()
+                self._shut_down()
+                return
+            batch = [(0, message)]
+            while len(batch) < self.batch_size:
+                try:
+                    message = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if message is None:
+                    # Stop after this batch; _stopping is already set.
+                    self._queue.task_done()
+                    break
+                batch.append((0, message))
+            self._send_batch(batch + self._due_retries())
+
+    def _shut_down(self):
+        self._drop_retries()
+        self.transport.close()
+
+    def _due_retries(self):
+        due = []
+        now = time.monotonic()
+        while self._retries and self._retries[0][0] <= now:
+            _, _, attempt, message = heapq.heappop(self._retries)
+            due.append((attempt, message))
+        return due
+
+    def _drop_retries(self):
+        for _, _, attempt, message in self._retries:
+            logger.error(f"Dropping email to {message['To']} on shutdown after {attempt} attempts")
+            self._count(failed=1)
+            self._queue.task_done()
+        self._retries.clear()
+
+    def _send_batch(self, batch):
+        # A message counts as done for join() once it is sent or given up on.
+        for attempt, message in batch:
+            try:
+                self.transport.send(message)
+                self._count(sent=1)
+            except Exception as e:
+                if is_permanent(e):
+                    logger.error(f"Error sending email to {message['To']}: {e}")
+                    self._count(failed=1)
+                elif attempt < self.max_retries:
+                    due = time.monotonic() + self.backoff * 2 ** attempt
+                    heapq.heappush(self._retries, (due, next(self._sequence), attempt + 1, message))
+                    continue
+                else:
+                    logger.error(f"Giving up on email to {message['To']} after {attempt + 1} attempts: {e}")
+                    self._count(failed=1)
+            self._queue.task_done()
+
+    def _count(self, sent: int = 0, failed: int = 0):
+        with self._counts_lock:
+            self.sent += sent
+            self.failed += failed
+
+    def stats(self) -> dict:
+        with self._counts_lock:
+            sent, failed = self.sent, self.failed
+        return {"queued": self._queue.qsize(), "retrying": len(self._retries), "sent": sent, "failed": failed}
+
+
+mail_queue = MailQueue(
+    create_transport(),
+    batch_size=settings.MAIL_BATCH_SIZE,
+    max_retries=settings.MAIL_MAX_RETRIES,
+    backoff=settings.MAIL_RETRY_BACKOFF_SECONDS,
+    idle_timeout=settings.MAIL_IDLE_TIMEOUT_SECONDS,
+    maxsize=settings.MAIL_QUEUE_MAX_SIZE,
+)
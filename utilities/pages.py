@@ -0,0 +1,60 @@
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, select_autoescape
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, Response
+
+from schemas.http_cache import etag_matches, make_etag, not_modified, set_cache_headers
+
+
+class Page(NamedTuple):
+    template: Template
+    body: bytes
+    etag: str
+
+
+def create_environment(directory: str, auto_reload: bool, bytecode_cache_dir: Optional[str] = None) -> Environment:
+    # Compiled templates are kept on disk, so a restart skips re-parsing them.
+    return Environment(
+        loader=FileSystemLoader(directory),
+        autoescape=select_autoescape(),
+        auto_reload=auto_reload,
+        bytecode_cache=FileSystemBytecodeCache(bytecode_cache_dir),
+    )
+
+
+class PageCache:
+    """Request-independent templates rendered once into bytes with an ETag.
+
+    With ``env.auto_reload`` on, Jinja hands back a new Template object when
+    the file changes on disk, which is what triggers a re-render here.
+    """
+
+    def __init__(self, env: Environment):
+        self.env = env
+        self._pages: Dict[str, Page] = {}
+
+    def get(self, name: str) -> Page:
+        page = self._pages.get(name)
+        if page is not None and not self.env.auto_reload:
+            return page
+        template = self.env.get_template(name)
+        if page is None or page.template is not template:
+            body = template.render().encode()
+            page = self._pages[name] = Page(template, body, make_etag("page", name, body))
+        return page
+
+    def warm(self, names: Iterable[str]):
+        for name in names:
+            self.get(name)
+
+    def clear(self):
+        self._pages.clear()
+
+    def response(self, request: Request, name: str) -> Response:
+        page = self.get(name)
+        if etag_matches(request, page.etag):
+            return not_modified(page.etag)
+        response = HTMLResponse(page.body)
+        set_cache_headers(response, page.etag)
+        return response
@@ -0,0 +1,15 @@
+from contextvars import ContextVar
+from typing import Optional
+
+
+class RequestStats:
+    __slots__ = ("user_id", "db_time", "db_statements")
+
+    def __init__(self):
+        self.user_id: Optional[str] = None
+        self.db_time = 0.0
+        self.db_statements = 0
+
+
+# Set by the logging middleware for the duration of each HTTP request.
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
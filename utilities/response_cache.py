@@ -0,0 +1,167 @@
+import asyncio
+import math
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from config import settings
+from utilities.cache import TTLCache
+from utilities.metrics import CallbackCounter, registry
+
+_RETRY = object()
+
+
+class MemoryBackend:
+    """In-process LRU with TTL.
+
+    Only correct with a single worker process: other workers keep their own
+    copy and would serve it until the TTL lapses. Use Redis for more.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Outlive the bodies, so a write-back tagged before an invalidation never matches.
+        self._versions = TTLCache(maxsize=maxsize, ttl=2 * ttl)
+        self._generation = 0
+        self._epoch = 0
+
+    def _token(self, key: str) -> str:
+        return f"{self._epoch}.{self._versions.get(key, 0)}"
+
+    async def get(self, key: str) -> Tuple[Optional[bytes], str]:
+        token = self._token(key)
+        entry = self._cache.get(key, None)
+        return (entry[1] if entry is not None and entry[0] == token else None), token
+
+    async def set(self, key: str, value: bytes, ttl: float, token: str):
+        self._cache.set(key, (token, value), ttl)
+
+    async def delete(self, *keys: str):
+        self._generation += 1
+        for key in keys:
+            self._versions.set(key, self._generation)
+        self._cache.invalidate(*keys)
+
+    async def clear(self):
+        self._epoch += 1
+        self._cache.clear()
+
+
+class RedisBackend:
+    """Any client with the redis.asyncio ``get``/``mget``/``set``/``incr``/``delete``/``pipeline`` API.
+
+    Bodies are stored tagged with the key's version and the cache epoch, both
+    kept in Redis, and only served while the tag is current. Invalidating
+    bumps them, so a load that started earlier, in any worker, writes back a
+    body that is never served.
+    """
+
+    def __init__(self, client, ttl: float, prefix: str = "response:"):
+        self.client = client
+        self.prefix = prefix
+        self.version_ttl = max(1, math.ceil(2 * ttl))
+
+    async def get(self, key: str) -> Tuple[Optional[bytes], str]:
+        epoch, version, entry = await self.client.mget(self.prefix + "epoch", self.prefix + "version:" + key,
+                                                       self.prefix + key)
+        token = f"{int(epoch or 0)}.{int(version or 0)}"
+        if entry is not None:
+            tag, _, value = entry.partition(b"\n")
+            if tag.decode() == token:
+                return value, token
+        return None, token
+
+    async def set(self, key: str, value: bytes, ttl: float, token: str):
+        await self.client.set(self.prefix + key, token.encode() + b"\n" + value, ex=max(1, math.ceil(ttl)))
+
+    async def delete(self, *keys: str):
+        if not keys:
+            return
+        generation = await self.client.incr(self.prefix + "generation")
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(self.prefix + "version:" + key, generation, ex=self.version_ttl)
+            pipe.delete(*(self.prefix + key for key in keys))
+            await pipe.execute()
+
+    async def clear(self):
+        # Stale bodies stop matching at once and expire with their TTL.
+        await self.client.incr(self.prefix + "epoch")
+
+
+def create_backend(kind: str):
+    if kind == "none":
+        return None
+    if kind == "redis":
+        # Optional dependency: only needed when the Redis backend is selected.
+        import redis.asyncio as redis
+        return RedisBackend(redis.from_url(settings.RESPONSE_CACHE_REDIS_URL), ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
+    return MemoryBackend(maxsize=settings.RESPONSE_CACHE_MAX_ENTRIES, ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
+
+
+class ResponseCache:
+    """Pre-serialized response bodies in a pluggable backend.
+
+    Concurrent misses on one key share a single load (request coalescing).
+    Each load writes back under the version token read before it started, so
+    a load racing an invalidation cannot resurrect the stale body; requests
+    arriving after an invalidation never join a load that started before it.
+    """
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        if self.backend is None:
+            return await loader()
+        cached, token = await self.backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        while key in self._inflight:
+            self.coalesced += 1
+            result = await asyncio.shield(self._inflight[key])
+            if result is not _RETRY:
+                return result
+        self.misses += 1
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await loader()
+            if value is not None:
+                await self.backend.set(key, value, self.ttl, token)
+        except BaseException:
+            # Waiters retry with their own load instead of sharing the failure.
+            future.set_result(_RETRY)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        return value
+
+    async def invalidate(self, *keys: str):
+        if self.backend is None:
+            return
+        for key in keys:
+            self._inflight.pop(key, None)
+        await self.backend.delete(*keys)
+
+    async def clear(self):
+        if self.backend is None:
+            return
+        self._inflight.clear()
+        await self.backend.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+
+response_cache = ResponseCache(create_backend(settings.RESPONSE_CACHE_BACKEND), ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
+
+registry.register(CallbackCounter("response_cache_lookups_total", "Response cache lookups by outcome.",
+                                  lambda: [((outcome,), count) for outcome, count in response_cache.stats().items()],
+                                  ("outcome",)))
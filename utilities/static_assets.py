@@ -0,0 +1,120 @@
+import logging
+import mimetypes
+import os
+import stat
+import sys
+from hashlib import blake2b
+from pathlib import Path
+from typing import Dict, Iterable
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from config import settings
+from utilities.compression import ENCODINGS, EXTENSIONS, compress, negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+# Strongest settings: assets are compressed once, not per request.
+STATIC_LEVELS = {"br": 11, "gzip": 9}
+ASSET_DIRS = ("css", "js")
+
+
+def precompress(path: Path, encodings: Iterable[str] = ENCODINGS):
+    """Write ``.br``/``.gz`` siblings of ``path`` unless they are already up to date."""
+    data = None
+    for encoding in encodings:
+        sibling = path.with_name(path.name + EXTENSIONS[encoding])
+        if sibling.exists() and sibling.stat().st_mtime >= path.stat().st_mtime:
+            continue
+        data = path.read_bytes() if data is None else data
+        sibling.write_bytes(compress(encoding, data, STATIC_LEVELS[encoding]))
+
+
+def asset_files(root: Path, asset_dirs: Iterable[str] = ASSET_DIRS):
+    for asset_dir in asset_dirs:
+        for path in sorted((root / asset_dir).rglob("*")):
+            if path.is_file() and path.suffix not in EXTENSIONS.values():
+                yield path
+
+
+def precompress_directory(directory: str, asset_dirs: Iterable[str] = ASSET_DIRS) -> int:
+    """Precompress every asset under ``directory``; a build step, see the ``__main__`` block."""
+    paths = list(asset_files(Path(directory), asset_dirs))
+    for path in paths:
+        precompress(path)
+    return len(paths)
+
+
+class AssetFiles(StaticFiles):
+    """StaticFiles that also serves css/js under content-hashed names.
+
+    ``asset_path("css/styles.css")`` returns e.g. ``css/styles.3f2a9c1b0d4e.css``.
+    Hashed URLs change whenever the file does, so they are cached as immutable
+    and served from precompressed siblings when the client accepts them;
+    without siblings, CompressionMiddleware compresses them on the fly.
+    Plain URLs keep the default StaticFiles behaviour.
+    """
+
+    def __init__(self, *, directory: str, asset_dirs: Iterable[str] = ASSET_DIRS,
+                 precompress_assets: bool = None, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.manifest: Dict[str, str] = {}
+        self.assets: Dict[str, str] = {}
+        if precompress_assets is None:
+            precompress_assets = settings.STATIC_PRECOMPRESS
+        root = Path(directory)
+        for path in asset_files(root, asset_dirs):
+            name = path.relative_to(root).as_posix()
+            digest = blake2b(path.read_bytes(), digest_size=6).hexdigest()
+            hashed = f"{name[:len(name) - len(path.suffix)]}.{digest}{path.suffix}"
+            self.manifest[name] = hashed
+            self.assets[os.path.normpath(hashed)] = name
+            if precompress_assets:
+                try:
+                    precompress(path)
+                except OSError as e:
+                    # e.g. a read-only image; such assets are compressed per request instead.
+                    logger.warning(f"Could not precompress {path}: {e}")
+
+    def asset_path(self, path: str) -> str:
+        path = path.lstrip("/")
+        return self.manifest.get(path, path)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        name = self.assets.get(path)
+        if name is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+
+        request_headers = Headers(scope=scope)
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, name)
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            raise HTTPException(status_code=404)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is not None:
+            compressed_path, compressed_stat = await anyio.to_thread.run_sync(
+                self.lookup_path, name + EXTENSIONS[encoding])
+            if compressed_stat is not None:
+                full_path, stat_result = compressed_path, compressed_stat
+            else:
+                encoding = None
+
+        headers = {"Cache-Control": f"public, max-age={settings.STATIC_MAX_AGE_SECONDS}, immutable",
+                   "Vary": "Accept-Encoding"}
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        response = FileResponse(full_path, stat_result=stat_result, headers=headers,
+                                media_type=mimetypes.guess_type(name)[0])
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+if __name__ == "__main__":
+    # Build step: python -m utilities.static_assets [directory]
+    directory = sys.argv[1] if len(sys.argv) > 1 else settings.STATIC_DIRECTORY
+    print(f"Precompressed {precompress_directory(directory)} assets in {directory}")
@@ -1,14 +1,9 @@
 # apis/utils.py
-from datetime import datetime, timedelta
-
-import jwt
 from fastapi.security import OAuth2
 from fastapi import Request, HTTPException
 from typing import Optional
 from starlette.status import HTTP_401_UNAUTHORIZED
 
-from config import settings
-
 
 class OAuth2PasswordBearerWithCookie(OAuth2):
     def __init__(self, tokenUrl: str, scheme_name: Optional[str] = None, scopes: Optional[dict] = None,
@@ -31,13 +26,3 @@ class OAuth2PasswordBearerWithCookie(OAuth2):
                 return None
         return token
 
-
-def create_access_token(data: dict, expires_delta: timedelta | None = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt